@@ -0,0 +1,111 @@
+""" Benchmark for answering repeated document requests with ResponseCache.
+
+A simulated session, where the user switches between a few files, and the editor
+asks for documentSymbol, foldingRange and hover of the focused file every time.
+Sometimes the user edits the file.  Handlers really scan the document.
+
+Usage:
+    python -m benchmarks.bench_cache
+"""
+
+import random
+import re
+import time
+
+from lsp._cache import ResponseCache
+from lsp._jsonrpc import JsonRpcConnection
+from lsp._scheduler import RequestScheduler
+
+FILES = 4
+LINES = 5000
+SWITCHES = 500
+_DEF = re.compile(r"^def (\w+)", re.M)
+
+
+def _text(index: int) -> str:
+    return "".join(
+        f"def function_{index}_{line}(value):\n    return value\n"
+        for line in range(LINES // 2)
+    )
+
+
+def _symbols(text: str) -> list:
+    return [
+        {"name": match.group(1), "kind": 12, "offset": match.start()}
+        for match in _DEF.finditer(text)
+    ]
+
+
+def _folding(text: str) -> list:
+    return [
+        {"startLine": line, "endLine": line + 1}
+        for line in range(0, text.count("\n"), 2)
+    ]
+
+
+def _session(client: JsonRpcConnection):
+    rng = random.Random(0)
+    texts = {f"file:///module_{index}.py": _text(index) for index in range(FILES)}
+    versions = dict.fromkeys(texts, 1)
+    for uri, text in texts.items():
+        item = {"uri": uri, "languageId": "python", "version": 1, "text": text}
+        yield client.send_notification("textDocument/didOpen", {"textDocument": item})
+    uris = list(texts)
+    for _ in range(SWITCHES):
+        uri = rng.choice(uris)
+        data = b""
+        if rng.random() < 0.2:
+            versions[uri] += 1
+            document = {"uri": uri, "version": versions[uri]}
+            changes = [{"text": texts[uri]}]
+            params = {"textDocument": document, "contentChanges": changes}
+            data += client.send_notification("textDocument/didChange", params)
+        params = {"textDocument": {"uri": uri}}
+        data += client.send_request("textDocument/documentSymbol", params)[1]
+        data += client.send_request("textDocument/foldingRange", params)[1]
+        hover = dict(params, position={"line": rng.randrange(4), "character": 4})
+        data += client.send_request("textDocument/hover", hover)[1]
+        yield data
+
+
+def _run(cache) -> float:
+    client = JsonRpcConnection("client")
+    scheduler = RequestScheduler(JsonRpcConnection("server"), cache=cache)
+    texts = {}
+    started = time.perf_counter()
+    for data in _session(client):
+        scheduler.receive(data)
+        message = scheduler.next_message()
+        while message is not None:
+            method, params = message["method"], message["params"]
+            uri = params["textDocument"]["uri"]
+            if method == "textDocument/didOpen":
+                texts[uri] = params["textDocument"]["text"]
+            elif method == "textDocument/didChange":
+                texts[uri] = params["contentChanges"][-1]["text"]
+            elif method == "textDocument/documentSymbol":
+                scheduler.respond(message["id"], _symbols(texts[uri]))
+            elif method == "textDocument/foldingRange":
+                scheduler.respond(message["id"], _folding(texts[uri]))
+            else:
+                scheduler.respond(message["id"], {"contents": uri})
+            message = scheduler.next_message()
+        scheduler.data_to_send()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    print(f"{FILES} files of {LINES} lines, {SWITCHES} focus switches")
+    uncached = _run(None)
+    cache = ResponseCache()
+    cached = _run(cache)
+    total = cache.hits + cache.misses
+    print(f"no cache   {uncached * 1000:>8.1f} ms")
+    print(
+        f"cache      {cached * 1000:>8.1f} ms  hits {cache.hits}/{total}  "
+        f"{cache.size / 1024:.0f} KiB in {len(cache)} entries"
+    )
+
+
+if __name__ == "__main__":
+    main()
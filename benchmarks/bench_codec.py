@@ -0,0 +1,76 @@
+""" Benchmark for available json codecs on lsp-shaped payloads.
+
+Usage:
+    python -m benchmarks.bench_codec
+"""
+
+import timeit
+from typing import Dict
+
+from lsp._codec import available_codecs, get_codec
+
+
+def _completion_list(count: int) -> Dict:
+    items = [
+        {
+            "label": f"symbol_{index}",
+            "kind": 3,
+            "detail": f"def symbol_{index}(arg: int, *args, **kwargs) -> None",
+            "documentation": {"kind": "markdown", "value": "Some docs.\n" * 3},
+            "sortText": f"{index:08d}",
+            "textEdit": {
+                "range": {
+                    "start": {"line": 10, "character": 4},
+                    "end": {"line": 10, "character": 8},
+                },
+                "newText": f"symbol_{index}",
+            },
+        }
+        for index in range(count)
+    ]
+    result = {"isIncomplete": False, "items": items}
+    return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+def _publish_diagnostics(count: int) -> Dict:
+    diagnostics = [
+        {
+            "range": {
+                "start": {"line": index, "character": 0},
+                "end": {"line": index, "character": 80},
+            },
+            "severity": 2,
+            "code": "W0612",
+            "source": "pylint",
+            "message": f"Unused variable 'value_{index}'",
+        }
+        for index in range(count)
+    ]
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/publishDiagnostics",
+        "params": {"uri": "file:///project/module.py", "diagnostics": diagnostics},
+    }
+
+
+def main() -> None:
+    payloads = {
+        "completion(1000)": _completion_list(1000),
+        "diagnostics(500)": _publish_diagnostics(500),
+    }
+    for payload_name, payload in payloads.items():
+        for name in available_codecs():
+            codec = get_codec(name)
+            data = codec.encode(payload)
+            number = 50
+            encode = timeit.timeit(lambda: codec.encode(payload), number=number)
+            decode = timeit.timeit(lambda: codec.decode(data), number=number)
+            print(
+                f"{payload_name:<18} {name:<8} {len(data):>8} bytes  "
+                f"encode {encode / number * 1e3:>7.3f} ms  "
+                f"decode {decode / number * 1e3:>7.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
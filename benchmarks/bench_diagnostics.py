@@ -0,0 +1,91 @@
+""" Benchmark for publishing diagnostics while the user types.
+
+A simulated session, where the server computes diagnostics of the edited document
+after every keystroke, and most of them don't change.  The naive server sends a
+notification every time, DiagnosticsPublisher skips identical ones and limits the
+rate.  Time is virtual, a keystroke comes every 30 milliseconds.
+
+Usage:
+    python -m benchmarks.bench_diagnostics
+"""
+
+import random
+import time
+
+from lsp._diagnostics import DiagnosticsPublisher
+from lsp._jsonrpc import JsonRpcConnection
+
+FILES = 20
+KEYSTROKES = 5000
+INTERVAL = 0.03
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _diagnostics(rng: random.Random, count: int) -> list:
+    return [
+        {
+            "range": {
+                "start": {"line": line, "character": 4},
+                "end": {"line": line, "character": 12},
+            },
+            "severity": 2,
+            "source": "lint",
+            "message": f"unused variable 'value_{line}'",
+        }
+        for line in sorted(rng.sample(range(2000), count))
+    ]
+
+
+def _session():
+    """ yield (uri, diagnostics) of every keystroke. """
+    rng = random.Random(0)
+    current = {
+        f"file:///module_{index}.py": _diagnostics(rng, 50) for index in range(FILES)
+    }
+    uri = rng.choice(list(current))
+    for _ in range(KEYSTROKES):
+        if rng.random() < 0.01:
+            uri = rng.choice(list(current))
+        if rng.random() < 0.1:
+            current[uri] = _diagnostics(rng, 50)
+        yield uri, current[uri]
+
+
+def main() -> None:
+    print(f"{FILES} files, {KEYSTROKES} keystrokes")
+    rpc = JsonRpcConnection("server")
+    size = writes = 0
+    started = time.perf_counter()
+    for uri, diagnostics in _session():
+        params = {"uri": uri, "diagnostics": diagnostics}
+        size += len(rpc.send_notification("textDocument/publishDiagnostics", params))
+        writes += 1
+    naive_time = time.perf_counter() - started
+    print(f"naive      {naive_time * 1000:>8.1f} ms  {size:>9} bytes  {writes} writes")
+
+    clock = Clock()
+    publisher = DiagnosticsPublisher(JsonRpcConnection("server"), 0.1, clock)
+    size = writes = 0
+    started = time.perf_counter()
+    for uri, diagnostics in _session():
+        clock.now += INTERVAL
+        publisher.publish(uri, diagnostics)
+        if publisher.flush():
+            size += sum(map(len, publisher.data_to_send()))
+            writes += 1
+    publisher_time = time.perf_counter() - started
+    print(
+        f"publisher  {publisher_time * 1000:>8.1f} ms  {size:>9} bytes  "
+        f"{writes} writes, {publisher.skipped} skipped"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+""" Benchmark for applying didChange edits to a large document.
+
+Replays small edits, like typing and deleting, on a 50k-line file.  The naive
+store keeps the whole text in a str, and rebuilds it for every edit, like many
+servers do.
+
+Usage:
+    python -m benchmarks.bench_documents
+"""
+
+import random
+import time
+
+from lsp._documents import TextDocument
+
+LINES = 50000
+EDITS = 5000
+
+
+def _document() -> str:
+    return "".join(
+        f"def function_{index}(value):  # comment\n" for index in range(LINES)
+    )
+
+
+def _edits(count: int) -> list:
+    """ typing bursts at random places, with some deletions. """
+    rng = random.Random(0)
+    edits = []
+    while len(edits) < count:
+        line, character = rng.randrange(LINES), rng.randrange(20)
+        for _ in range(rng.randrange(1, 20)):
+            position = {"line": line, "character": character}
+            if rng.random() < 0.1 and character > 0:
+                start = {"line": line, "character": character - 1}
+                edits.append({"range": {"start": start, "end": position}, "text": ""})
+                character -= 1
+            else:
+                edit_range = {"start": position, "end": position}
+                edits.append({"range": edit_range, "text": "x"})
+                character += 1
+    return edits[:count]
+
+
+class NaiveDocument:
+    """ keep text in str, convert positions by splitting lines. """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def apply_change(self, change: dict) -> None:
+        lines = self.text.splitlines(keepends=True)
+        start, end = change["range"]["start"], change["range"]["end"]
+        start_offset = sum(map(len, lines[: start["line"]])) + start["character"]
+        end_offset = sum(map(len, lines[: end["line"]])) + end["character"]
+        self.text = self.text[:start_offset] + change["text"] + self.text[end_offset:]
+
+
+def main() -> None:
+    text = _document()
+    edits = _edits(EDITS)
+    print(f"document {LINES} lines, {len(text)} chars, {EDITS} edits")
+
+    naive = NaiveDocument(text)
+    naive_edits = edits[:200]
+    started = time.perf_counter()
+    for change in naive_edits:
+        naive.apply_change(change)
+    naive_time = (time.perf_counter() - started) / len(naive_edits)
+
+    # lower bound of str based stores: offsets are known, only rebuild the text.
+    spliced = text
+    started = time.perf_counter()
+    for offset in range(len(edits)):
+        spliced = spliced[:offset] + "x" + spliced[offset:]
+    splice_time = (time.perf_counter() - started) / len(edits)
+
+    document = TextDocument("file:///bench.py", text, 0)
+    started = time.perf_counter()
+    for version, change in enumerate(edits, 1):
+        document.apply_changes([change], version)
+    rope_time = (time.perf_counter() - started) / len(edits)
+
+    print(f"naive str  {naive_time * 1e6:>10.1f} us per edit")
+    print(f"str splice {splice_time * 1e6:>10.1f} us per edit")
+    print(f"rope       {rope_time * 1e6:>10.1f} us per edit")
+
+    checked = TextDocument("file:///bench.py", text, 0)
+    checked.apply_changes(naive_edits, 1)
+    assert checked.text == naive.text
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+""" Benchmark for event construction time and allocation size.
+
+DictEvent below is how events were implemented before slotted classes, it's kept
+here for comparison.
+
+Usage:
+    python -m benchmarks.bench_events
+"""
+
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from lsp._events import DataReceived
+
+
+class DictEvent:
+    _fields = {"data"}
+    _required = {"data"}
+    _defaults: List = []
+
+    def __init__(self, kwargs: Dict) -> None:
+        keys = set(kwargs.keys())
+        if self._required - keys:
+            raise ValueError()
+        if keys - self._fields:
+            raise ValueError()
+        self.__dict__.update(self._defaults)
+        self.__dict__.update(kwargs)
+
+
+def _allocated(factory: Callable[[], Any], count: int = 10000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    events = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # exclude the list which holds the events.
+    return (after - before - len(events) * 8) / count
+
+
+def main() -> None:
+    data = b"x" * 64
+    cases = {
+        "dict based event": lambda: DictEvent({"data": data}),
+        "DataReceived(dict)": lambda: DataReceived({"data": data}),
+        "DataReceived.make": lambda: DataReceived.make(data),
+    }
+    number = 200000
+    for name, factory in cases.items():
+        seconds = timeit.timeit(factory, number=number)
+        print(
+            f"{name:<20} {seconds / number * 1e9:>8.0f} ns/event  "
+            f"{_allocated(factory):>6.0f} bytes/event"
+        )
+
+
+if __name__ == "__main__":
+    main()
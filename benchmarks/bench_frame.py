@@ -0,0 +1,32 @@
+""" Benchmark for encoding message header on the send path.
+
+Usage:
+    python -m benchmarks.bench_frame
+"""
+
+import timeit
+
+from lsp._events import ResponseSent
+from lsp._frame import FrameEncoder
+
+
+def main() -> None:
+    number = 200000
+    encoder = FrameEncoder()
+    no_content_type = FrameEncoder(None)
+    cases = {
+        "ResponseSent.to_data": (
+            lambda: ResponseSent({"Content-Length": 1234}).to_data()
+        ),
+        "FrameEncoder.encode_header": lambda: encoder.encode_header(1234),
+        "FrameEncoder(None).encode_header": (
+            lambda: no_content_type.encode_header(1234)
+        ),
+    }
+    for name, func in cases.items():
+        seconds = timeit.timeit(func, number=number)
+        print(f"{name:<34} {seconds / number * 1e9:>8.0f} ns/header")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+""" Microbenchmark for ReceiveBuffer header scanning.
+
+Feed one framed message into ReceiveBuffer in 1-byte, 64-byte and 64 KiB chunks,
+and extract header and body out while data arrives.
+
+Usage:
+    python -m benchmarks.bench_header
+"""
+
+import json
+import timeit
+
+from lsp._buffer import ReceiveBuffer
+
+
+def _make_message(body_size: int) -> bytes:
+    body = json.dumps({"method": "textDocument/didOpen", "text": "x" * body_size})
+    data = body.encode("utf-8")
+    header = (
+        f"Content-Length: {len(data)}\r\n"
+        "Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n\r\n"
+    )
+    return header.encode("ascii") + data
+
+
+def _feed(message: bytes, chunk_size: int) -> None:
+    buffer = ReceiveBuffer()
+    for start in range(0, len(message), chunk_size):
+        # fmt: off
+        buffer.append(message[start:start + chunk_size])
+        # fmt: on
+        if buffer.try_extract_header() is not None:
+            buffer.try_extract_data()
+
+
+def main() -> None:
+    for body_size in (1024, 256 * 1024):
+        message = _make_message(body_size)
+        for chunk_size in (1, 64, 64 * 1024):
+            number = max(1, 2000000 // (len(message) + len(message) // chunk_size * 20))
+            seconds = timeit.timeit(lambda: _feed(message, chunk_size), number=number)
+            print(
+                f"message {len(message):>8} bytes, chunk {chunk_size:>6} bytes: "
+                f"{seconds / number * 1e6:>12.1f} us/message"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+""" Benchmark for routing messages by id and method with LazyMessage.
+
+Usage:
+    python -m benchmarks.bench_lazy
+"""
+
+import json
+import timeit
+
+from lsp._codec import available_codecs, get_codec
+from lsp._lazy import LazyMessage
+
+
+def _completion_request(count: int) -> bytes:
+    # a completion request which carries the whole document, like some clients do
+    # on every keystroke.
+    lines = [f"    value_{index} = compute({index}, 'text')" for index in range(count)]
+    document = {"uri": "file:///project/module.py", "text": "\n".join(lines)}
+    message = {
+        "jsonrpc": "2.0",
+        "id": 42,
+        "method": "textDocument/completion",
+        "params": {
+            "textDocument": document,
+            "position": {"line": count, "character": 4},
+            "context": {"triggerKind": 1},
+        },
+    }
+    return json.dumps(message).encode("utf-8")
+
+
+def main() -> None:
+    body = _completion_request(5000)
+    number = 200
+    print(f"body {len(body)} bytes")
+    for name in available_codecs():
+        codec = get_codec(name)
+        full = timeit.timeit(lambda: codec.decode(body)["method"], number=number)
+        lazy = timeit.timeit(lambda: LazyMessage(body, codec)["method"], number=number)
+        print(
+            f"{name:<8} full decode {full / number * 1e6:>8.1f} us  "
+            f"lazy route {lazy / number * 1e6:>8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+""" Benchmark for converting LSP positions and offsets on a large document.
+
+Usage:
+    python -m benchmarks.bench_positions
+"""
+
+import random
+import time
+
+from lsp._rope import Rope
+
+LINES = 50000
+COUNT = 10000
+
+
+def _document() -> str:
+    # some lines have characters out of the basic multilingual plane.
+    values = ["\U0001f600" if index % 7 == 0 else "text" for index in range(LINES)]
+    return "".join(
+        f"value_{index} = '{value}'  # café\n" for index, value in enumerate(values)
+    )
+
+
+def _naive_offset(text: str, line: int, character: int) -> int:
+    """ split lines, and count UTF-16 code units of the line. """
+    lines = text.split("\n")
+    start = sum(len(item) + 1 for item in lines[:line])
+    units = 0
+    for index, char in enumerate(lines[line]):
+        units += 2 if ord(char) > 0xFFFF else 1
+        if units > character:
+            return start + index
+    return start + len(lines[line])
+
+
+def _measure(function, count: int) -> float:
+    started = time.perf_counter()
+    function()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main() -> None:
+    text = _document()
+    rope = Rope(text)
+    rng = random.Random(0)
+    positions = [(rng.randrange(LINES), rng.randrange(30)) for _ in range(COUNT)]
+    offsets = sorted(rng.randrange(len(text)) for _ in range(COUNT))
+    print(f"document {LINES} lines, {len(text)} chars, {COUNT} conversions")
+
+    naive = _measure(
+        lambda: [_naive_offset(text, *position) for position in positions[:20]], 20
+    )
+    single = _measure(
+        lambda: [rope.offset_at(*position) for position in positions], COUNT
+    )
+    bulk = _measure(lambda: rope.offsets_at(positions), COUNT)
+    print(
+        f"position -> offset  naive {naive:>9.1f} us  rope {single:>6.1f} us  "
+        f"bulk {bulk:>6.1f} us"
+    )
+
+    single = _measure(lambda: [rope.position_at(offset) for offset in offsets], COUNT)
+    bulk = _measure(lambda: rope.positions_at(offsets), COUNT)
+    print(f"offset -> position  rope {single:>6.1f} us  bulk {bulk:>6.1f} us")
+
+    # offsets of tokens in a region, like semantic tokens of the visible range.
+    tokens = list(range(len(text) // 2, len(text) // 2 + 8 * COUNT, 8))
+    single = _measure(lambda: [rope.position_at(offset) for offset in tokens], COUNT)
+    bulk = _measure(lambda: rope.positions_at(tokens), COUNT)
+    print(f"token -> position   rope {single:>6.1f} us  bulk {bulk:>6.1f} us")
+
+    single = _measure(lambda: [rope.byte_offset(offset) for offset in offsets], COUNT)
+    print(f"offset -> byte      rope {single:>6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
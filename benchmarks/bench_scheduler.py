@@ -0,0 +1,96 @@
+""" Benchmark for completion latency with FIFO and priority dispatch.
+
+A simulated editor session, where completion requests of the edited document
+arrive together with expensive requests, and semantic tokens of old versions are
+cancelled.  Handlers don't really run, each method has a fixed cost in virtual
+milliseconds, so the result only shows head-of-line blocking.
+
+Usage:
+    python -m benchmarks.bench_scheduler
+"""
+
+import random
+
+from lsp._jsonrpc import JsonRpcConnection, Request
+from lsp._scheduler import RequestScheduler, FifoQueue, PriorityQueue
+
+# method -> cost in virtual milliseconds.
+COSTS = {
+    "textDocument/didChange": 0.2,
+    "textDocument/completion": 2.0,
+    "textDocument/hover": 1.0,
+    "textDocument/references": 40.0,
+    "workspace/symbol": 60.0,
+    "textDocument/semanticTokens/full": 15.0,
+}
+# a keystroke every 30 virtual milliseconds.
+INTERVAL = 30.0
+
+
+def _session(client: JsonRpcConnection, keystrokes: int):
+    """ yield (arrival time, data) of a session. """
+    rng = random.Random(0)
+    document = {"textDocument": {"uri": "file:///edited.py"}}
+    tokens_id = None
+    for index in range(keystrokes):
+        data = b""
+        if tokens_id is not None:
+            # editors cancel semantic tokens of the old version, like vscode.
+            data += client.send_notification("$/cancelRequest", {"id": tokens_id})
+        change = {"textDocument": {"uri": "file:///edited.py", "version": index}}
+        data += client.send_notification("textDocument/didChange", change)
+        tokens_id, request = client.send_request(
+            "textDocument/semanticTokens/full", document
+        )
+        data += request
+        if rng.random() < 0.2:
+            # references of a symbol which is defined in another file.
+            other = {"textDocument": {"uri": "file:///other.py"}}
+            method, params = rng.choice(
+                [("textDocument/references", other), ("workspace/symbol", {})]
+            )
+            data += client.send_request(method, params)[1]
+        data += client.send_request("textDocument/completion", document)[1]
+        if rng.random() < 0.3:
+            data += client.send_request("textDocument/hover", document)[1]
+        yield index * INTERVAL, data
+
+
+def _completion_latencies(queue) -> list:
+    client = JsonRpcConnection("client")
+    scheduler = RequestScheduler(JsonRpcConnection("server"), queue)
+    arrivals = {}
+    latencies = []
+    now = 0.0
+    for arrival, data in _session(client, 2000):
+        # handle queued messages until the next data arrives.
+        while now < arrival:
+            message = scheduler.next_message()
+            if message is None:
+                now = arrival
+                break
+            now += COSTS[message["method"]]
+            if isinstance(message, Request):
+                if message["method"] == "textDocument/completion":
+                    latencies.append(now - arrivals.pop(message["id"]))
+                scheduler.respond(message["id"], None)
+        scheduler.receive(data)
+        for message in scheduler.pending.values():
+            arrivals.setdefault(message["id"], arrival)
+        scheduler.data_to_send()
+    return sorted(latencies)
+
+
+def main() -> None:
+    for name, queue in [("fifo", FifoQueue()), ("priority", PriorityQueue())]:
+        latencies = _completion_latencies(queue)
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(
+            f"{name:<8} completion p50 {p50:>10.1f} ms  p99 {p99:>10.1f} ms  "
+            f"({len(latencies)} answered)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+""" Benchmark for state machine transitions.
+
+`next_state` looks up the table of role in every call, `transition` is how
+Connection uses a cached compiled table.
+
+Usage:
+    python -m benchmarks.bench_state
+"""
+
+import timeit
+
+from lsp._events import RequestSent, DataSent, MessageEnd
+from lsp._role import Role
+from lsp._state import IDLE, SEND_BODY, next_state, state_table, transition
+
+
+def main() -> None:
+    # one request with a body of two chunks: 4 events.
+    events = [(IDLE, RequestSent), (SEND_BODY, DataSent)] + [
+        (SEND_BODY, DataSent),
+        (SEND_BODY, MessageEnd),
+    ]
+    table = state_table(Role.CLIENT)
+
+    def by_next_state() -> None:
+        for state, event in events:
+            next_state(Role.CLIENT, state, event)
+
+    def by_transition() -> None:
+        for state, event in events:
+            transition(table, state, event)
+
+    number = 250000
+    for name, func in [("next_state", by_next_state), ("transition", by_transition)]:
+        seconds = timeit.timeit(func, number=number)
+        count = number * len(events)
+        print(
+            f"{name:<12} {count} events  {seconds:>6.3f} s  "
+            f"{seconds / count * 1e9:>6.0f} ns/event"
+        )
+
+
+if __name__ == "__main__":
+    main()
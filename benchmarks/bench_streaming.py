@@ -0,0 +1,96 @@
+""" Benchmark for streaming decode of a large body which arrives in chunks.
+
+It compares the time spent after the last chunk is received: decoding the whole
+body at the end, and feeding the last chunk into StreamingDecoder.  The time until
+`method` is known is reported too.
+
+Usage:
+    python -m benchmarks.bench_streaming
+"""
+
+import json
+import time
+from typing import Callable, List
+
+from lsp._codec import get_codec
+from lsp._streaming import StreamingDecoder
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _did_change(count: int) -> bytes:
+    changes = [
+        {
+            "range": {
+                "start": {"line": index, "character": 0},
+                "end": {"line": index, "character": 10},
+            },
+            "text": f"value_{index} = compute({index})\n",
+        }
+        for index in range(count)
+    ]
+    message = {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didChange",
+        "params": {
+            "textDocument": {"uri": "file:///project/module.py", "version": 2},
+            "contentChanges": changes,
+        },
+    }
+    return json.dumps(message).encode("utf-8")
+
+
+def _best(func: Callable[[], float], repeat: int = 20) -> float:
+    return min(func() for _ in range(repeat))
+
+
+def main() -> None:
+    body = _did_change(20000)
+    # fmt: off
+    chunks: List[bytes] = [
+        body[index:index + CHUNK_SIZE] for index in range(0, len(body), CHUNK_SIZE)
+    ]
+    # fmt: on
+    codec = get_codec("json")
+
+    def decode_at_end() -> float:
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+        start = time.perf_counter()
+        codec.decode(buffer)
+        return time.perf_counter() - start
+
+    def streaming() -> float:
+        decoder = StreamingDecoder()
+        for chunk in chunks[:-1]:
+            decoder.feed(chunk)
+        start = time.perf_counter()
+        decoder.feed(chunks[-1])
+        decoder.result()
+        return time.perf_counter() - start
+
+    def streaming_total() -> float:
+        start = time.perf_counter()
+        decoder = StreamingDecoder()
+        for chunk in chunks:
+            decoder.feed(chunk)
+        return time.perf_counter() - start
+
+    def method_known() -> float:
+        start = time.perf_counter()
+        decoder = StreamingDecoder()
+        for chunk in chunks:
+            if "method" in decoder.feed(chunk):
+                break
+        return time.perf_counter() - start
+
+    print(f"body {len(body)} bytes in {len(chunks)} chunks")
+    print(f"decode after last chunk     {_best(decode_at_end) * 1e3:>8.3f} ms")
+    print(f"streaming after last chunk  {_best(streaming) * 1e3:>8.3f} ms")
+    print(f"streaming all chunks        {_best(streaming_total) * 1e3:>8.3f} ms")
+    print(f"streaming until method      {_best(method_known) * 1e3:>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
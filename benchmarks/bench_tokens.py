@@ -0,0 +1,65 @@
+""" Benchmark for semantic tokens responses of a large document.
+
+Compares answering `semanticTokens/full/delta` with the whole token array encoded
+by json, and with SemanticTokensEncoder, after a one line edit.
+
+Usage:
+    python -m benchmarks.bench_tokens
+"""
+
+import json
+import random
+import time
+
+from lsp._tokens import SemanticTokensEncoder
+
+LINES = 50000
+TOKENS_PER_LINE = 5
+ROUNDS = 20
+
+
+def _tokens(rng: random.Random) -> list:
+    data = []
+    for _ in range(LINES):
+        data.extend((1, 0, rng.randrange(1, 10), rng.randrange(20), 0))
+        for _ in range(TOKENS_PER_LINE - 1):
+            data.extend((0, rng.randrange(1, 8), rng.randrange(1, 10), 0, 0))
+    return data
+
+
+def main() -> None:
+    rng = random.Random(0)
+    tokens = _tokens(rng)
+    uri = "file:///bench.py"
+    print(f"document {LINES} lines, {len(tokens)} integers of tokens")
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        full = json.dumps({"resultId": "1", "data": tokens}).encode("utf-8")
+    json_time = (time.perf_counter() - started) / ROUNDS
+
+    encoder = SemanticTokensEncoder()
+    result_id = json.loads(encoder.full(uri, tokens))["resultId"]
+    delta_time = 0.0
+    for _ in range(ROUNDS):
+        # the user edits a line, which changes one token.
+        index = rng.randrange(LINES * TOKENS_PER_LINE) * 5 + 2
+        tokens[index] += 1
+        started = time.perf_counter()
+        delta = encoder.delta(uri, result_id, tokens)
+        delta_time += time.perf_counter() - started
+        result_id = json.loads(delta)["resultId"]
+    delta_time /= ROUNDS
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        encoded = encoder.full(uri, tokens)
+    full_time = (time.perf_counter() - started) / ROUNDS
+
+    print(f"json full  {json_time * 1000:>8.2f} ms  {len(full):>9} bytes")
+    print(f"full       {full_time * 1000:>8.2f} ms  {len(encoded):>9} bytes")
+    print(f"delta      {delta_time * 1000:>8.2f} ms  {len(delta):>9} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import asyncio
+from lsp import start_tcp_server
+
+
+async def hover(params):
+    # pretend we are doing some analysis.
+    await asyncio.sleep(0.1)
+    return {"contents": f"I am hovering on {params}:)"}
+
+
+def initialized(params):
+    print("Client is initialized.")
+
+
+async def main():
+    server = await start_tcp_server(
+        {"textDocument/hover": hover, "initialized": initialized}, "0.0.0.0", 10001
+    )
+    print("Serving on port 10001")
+    async with server:
+        await server.serve_forever()
+
+
+asyncio.run(main())
@@ -1,7 +1,7 @@
-__all__ = ["LspProtocolError"]
+__all__ = ["LspProtocolError", "ResponseError"]
 
 
-from ._errors import LspProtocolError
+from ._errors import LspProtocolError, ResponseError
 from ._connection import Connection, NEED_DATA
 from ._events import (
     # Mainly used by server
@@ -10,6 +10,11 @@ from ._events import (
     # Mainly userd by client
     ResponseReceived,
     RequestSent,
+    # Used in multiplexed connection
+    MessageReceived,
+    MessageSent,
+    # Used in whole message mode
+    MessageComplete,
     # Common
     DataSent,
     DataReceived,
@@ -17,10 +22,58 @@ from ._events import (
     Close,
     MessageEnd,
 )
+from ._codec import Codec, JsonCodec, get_codec, available_codecs
+from ._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Request,
+    Notification,
+    Response,
+    ErrorResponse,
+)
+from ._asyncio import (
+    LspProtocol,
+    start_tcp_server,
+    open_tcp_connection,
+    connect_stdio,
+)
+from ._io import write_vectored
+from ._streaming import StreamingDecoder
+from ._lazy import LazyMessage
+from ._scheduler import (
+    RequestScheduler,
+    FifoQueue,
+    PriorityQueue,
+    PRIORITY_SYNC,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+)
+from ._executor import PoolDispatcher
+from ._coalesce import CoalescingQueue, Debouncer, merge_changes
+from ._rope import Rope
+from ._documents import TextDocument, DocumentStore
+from ._cache import ResponseCache
+from ._tokens import SemanticTokensEncoder, diff_tokens
+from ._diagnostics import DiagnosticsPublisher
 from ._state import IDLE, SEND_BODY, SEND_RESPONSE, DONE, CLOSED
 from ._version import __version__
 
 __all__ += _connection.__all__
 __all__ += _events.__all__
+__all__ += _codec.__all__
+__all__ += _jsonrpc.__all__
+__all__ += _asyncio.__all__
+__all__ += _io.__all__
+__all__ += _streaming.__all__
+__all__ += _lazy.__all__
+__all__ += _scheduler.__all__
+__all__ += _executor.__all__
+__all__ += _coalesce.__all__
+__all__ += _rope.__all__
+__all__ += _documents.__all__
+__all__ += _cache.__all__
+__all__ += _tokens.__all__
+__all__ += _diagnostics.__all__
 __all__ += _state.__all__
 __all__ += [__version__]
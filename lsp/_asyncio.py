@@ -0,0 +1,312 @@
+""" asyncio adapter for lsp.
+
+LspProtocol is an asyncio.Protocol which drives JsonRpcConnection from
+`data_received`.  Incoming requests and notifications are dispatched to handlers,
+and our requests can be awaited until their responses come back.  It works over
+TCP connections and stdio pipes.
+"""
+
+import asyncio
+import logging
+import sys
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Set, Union
+
+from ._codec import Codec
+from ._errors import LspProtocolError, ResponseError
+from ._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Request,
+    Notification,
+    Response,
+    ErrorResponse,
+    RequestId,
+)
+from ._scheduler import CANCEL_METHOD
+
+__all__ = ["LspProtocol", "start_tcp_server", "open_tcp_connection", "connect_stdio"]
+
+# Handler receives params of message, and returns result, or an awaitable of it.
+Handler = Callable[[Any], Union[Any, Awaitable[Any]]]
+
+logger = logging.getLogger(__name__)
+
+
+class LspProtocol(asyncio.Protocol):
+    """ asyncio protocol which speaks language server protocol.
+
+    Args:
+        role (str): represent our role.  Which can be 'client' or 'server'
+        handlers (None or Mapping[str, Handler]): maps method name to the handler of
+            incoming requests and notifications.  Handler is called with params of
+            message, and can be a coroutine function.  It can raise `ResponseError`
+            to answer the request with an error.
+        codec (None or Codec): the codec to convert between json object and bytes.
+        writer (None or asyncio.WriteTransport): the transport we write to.  If it's
+            None, we write to the transport which is passed to `connection_made`.
+            It's useful when reading and writing are different pipes, like stdio.
+    """
+
+    def __init__(
+        self,
+        role: str,
+        handlers: Optional[Mapping[str, Handler]] = None,
+        codec: Optional[Codec] = None,
+        writer: Optional[asyncio.WriteTransport] = None,
+    ):
+        self.rpc = JsonRpcConnection(role, codec=codec)
+        self.handlers: Mapping[str, Handler] = {} if handlers is None else handlers
+        self.transport: Optional[asyncio.BaseTransport] = None
+        self.writer = writer
+        # request id -> future, which waits for the response.
+        self._waiters: Dict[RequestId, asyncio.Future] = {}
+        # handler tasks which are running.
+        self._tasks: Set[asyncio.Future] = set()
+        # request id -> task which answers the request, for `$/cancelRequest`.
+        self._answering: Dict[RequestId, asyncio.Future] = {}
+        # outgoing messages are queued, and written together in next loop iteration.
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._closed = asyncio.get_event_loop().create_future()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        if self.writer is None:
+            self.writer = transport  # type: ignore
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            events = self.rpc.receive_and_drain(data)
+        except LspProtocolError:
+            # other side sends something we can't understand, there is no way
+            # to recover the framing, so just close the connection.
+            self.close()
+            return
+        for event in events:
+            self._handle_event(event)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_exception(ConnectionError("Connection is lost."))
+        self._waiters.clear()
+        # nobody will receive the results, so stop running handlers.
+        for task in self._tasks:
+            task.cancel()
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def _handle_event(self, event: Any) -> None:
+        if isinstance(event, (Response, ErrorResponse)):
+            waiter = self._waiters.pop(event["id"], None)
+            if waiter is None or waiter.done():
+                return
+            if isinstance(event, Response):
+                waiter.set_result(event["result"])
+            else:
+                error = event["error"]
+                waiter.set_exception(
+                    ResponseError(error["code"], error["message"], error.get("data"))
+                )
+        elif isinstance(event, Request):
+            request_id = event["id"]
+            task = self._spawn(self._answer(event))
+            self._answering[request_id] = task
+            task.add_done_callback(lambda task: self._answered(request_id, task))
+        elif isinstance(event, Notification):
+            if event["method"] == CANCEL_METHOD:
+                self._cancel(event["params"])
+                return
+            handler = self.handlers.get(event["method"])
+            if handler is not None:
+                try:
+                    result = handler(event["params"])
+                except Exception:
+                    # nobody can be answered, don't let it break the connection.
+                    logger.exception("Handler of %s failed.", event["method"])
+                    return
+                if asyncio.iscoroutine(result):
+                    self._spawn(self._notified(event["method"], result))
+
+    def _spawn(self, coro: Awaitable) -> asyncio.Future:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _cancel(self, params: Any) -> None:
+        """ cancel the handler task of request, it's answered with RequestCancelled
+        error by `_answered`. """
+        if not isinstance(params, dict) or "id" not in params:
+            return
+        task = self._answering.get(params["id"])
+        if task is not None:
+            task.cancel()
+
+    def _answered(self, request_id: RequestId, task: asyncio.Future) -> None:
+        del self._answering[request_id]
+        if task.cancelled() and not self._closed.done():
+            # the task may be cancelled before it starts, so the error is sent here.
+            self.rpc.send_error(
+                request_id, ErrorCodes.RequestCancelled, "Request cancelled", queue=True
+            )
+            self._schedule_flush()
+
+    async def _answer(self, request: Request) -> None:
+        request_id = request["id"]
+        handler = self.handlers.get(request["method"])
+        try:
+            if handler is None:
+                raise ResponseError(
+                    ErrorCodes.MethodNotFound, f"Method not found: {request['method']}"
+                )
+            result = handler(request["params"])
+            if asyncio.iscoroutine(result):
+                result = await result
+        except asyncio.CancelledError:
+            # answered by `_answered`.
+            raise
+        except ResponseError as e:
+            self.rpc.send_error(request_id, e.code, e.message, e.data, queue=True)
+        except Exception as e:
+            self.rpc.send_error(
+                request_id, ErrorCodes.InternalError, str(e), queue=True
+            )
+        else:
+            self.rpc.send_response(request_id, result, queue=True)
+        self._schedule_flush()
+
+    async def _notified(self, method: str, result: Awaitable) -> None:
+        try:
+            await result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Handler of %s failed.", method)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_soon(self._flush)
+
+    def _flush(self) -> None:
+        """ write all queued messages with one `writelines` call. """
+        self._flush_handle = None
+        buffers = self.rpc.data_to_send()
+        if buffers and self.writer is not None and not self.writer.is_closing():
+            self.writer.writelines(buffers)
+
+    async def request(self, method: str, params: Any = None) -> Any:
+        """ Send a request, and wait for its result.
+
+        Args:
+            method (str): the method name of request.
+            params: parameters of request.
+        Returns:
+            The result of request.
+        Raises:
+            ResponseError - when other side answers the request with an error.
+            ConnectionError - when the connection is lost before response.
+        """
+        if self._closed.done():
+            raise ConnectionError("Connection is closed.")
+        request_id, _ = self.rpc.send_request(method, params, queue=True)
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters[request_id] = waiter
+        self._schedule_flush()
+        return await waiter
+
+    def notify(self, method: str, params: Any = None) -> None:
+        """ Send a notification.
+
+        Args:
+            method (str): the method name of notification.
+            params: parameters of notification.
+        """
+        self.rpc.send_notification(method, params, queue=True)
+        self._schedule_flush()
+
+    def close(self) -> None:
+        """ Close the transports. """
+        for transport in (self.transport, self.writer):
+            if transport is not None and not transport.is_closing():
+                transport.close()
+
+    async def wait_closed(self) -> None:
+        """ Wait until the connection is lost. """
+        await asyncio.shield(self._closed)
+
+
+async def start_tcp_server(
+    handlers: Mapping[str, Handler],
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    codec: Optional[Codec] = None,
+    **kwargs: Any,
+) -> asyncio.AbstractServer:
+    """ Start a TCP language server, each client gets it's own LspProtocol, and all
+    of them are served by the running event loop.
+
+    Args:
+        handlers (Mapping[str, Handler]): handlers of requests and notifications.
+        host (None or str), port (None or int): the address we listen to.
+        codec (None or Codec): the codec to convert between json object and bytes.
+        kwargs: other arguments which will be passed to `loop.create_server`.
+    Returns:
+        The asyncio server object.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.create_server(
+        lambda: LspProtocol("server", handlers, codec), host, port, **kwargs
+    )
+
+
+async def open_tcp_connection(
+    host: str,
+    port: int,
+    handlers: Optional[Mapping[str, Handler]] = None,
+    codec: Optional[Codec] = None,
+    **kwargs: Any,
+) -> LspProtocol:
+    """ Connect to a TCP language server.
+
+    Args:
+        host (str), port (int): the address of server.
+        handlers (None or Mapping[str, Handler]): handlers of requests and
+            notifications from server.
+        codec (None or Codec): the codec to convert between json object and bytes.
+        kwargs: other arguments which will be passed to `loop.create_connection`.
+    Returns:
+        The connected LspProtocol object.
+    """
+    loop = asyncio.get_event_loop()
+    _, protocol = await loop.create_connection(
+        lambda: LspProtocol("client", handlers, codec), host, port, **kwargs
+    )
+    return protocol  # type: ignore
+
+
+async def connect_stdio(
+    role: str = "server",
+    handlers: Optional[Mapping[str, Handler]] = None,
+    codec: Optional[Codec] = None,
+    stdin: Any = None,
+    stdout: Any = None,
+) -> LspProtocol:
+    """ Speak language server protocol over pipes, by default stdin and stdout.
+
+    Args:
+        role (str): represent our role.  Which can be 'client' or 'server'
+        handlers (None or Mapping[str, Handler]): handlers of requests and
+            notifications.
+        codec (None or Codec): the codec to convert between json object and bytes.
+        stdin (None or file object): the pipe we read from, default is sys.stdin.
+        stdout (None or file object): the pipe we write to, default is sys.stdout.
+    Returns:
+        The connected LspProtocol object.
+    """
+    loop = asyncio.get_event_loop()
+    stdin = sys.stdin.buffer if stdin is None else stdin
+    stdout = sys.stdout.buffer if stdout is None else stdout
+    writer, _ = await loop.connect_write_pipe(asyncio.BaseProtocol, stdout)
+    protocol = LspProtocol(role, handlers, codec, writer=writer)  # type: ignore
+    await loop.connect_read_pipe(lambda: protocol, stdin)
+    return protocol
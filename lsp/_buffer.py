@@ -1,15 +1,94 @@
-from typing import Optional, Dict
+import mmap
+import tempfile
+from typing import Optional, Dict, Union
+
+from ._errors import LspProtocolError
+
+
+# The delimiter between header part and body part.
+_HEADER_END = b"\r\n\r\n"
+
+
+def _parse_header(header_bytes: Union[bytes, bytearray]) -> Dict[str, str]:
+    """ parse header rows into a dict.  Every row is partitioned in bytes, so we
+    needn't decode the whole header string and split it again.
+
+    Args:
+        header_bytes (bytes): header part without the trailing "\\r\\n\\r\\n".
+    Returns:
+        A dict which maps header field name to it's value.
+    """
+    results = {}
+    for row in header_bytes.split(b"\r\n"):
+        key, _, val = row.partition(b":")
+        results[key.strip().decode("ascii")] = val.strip().decode("ascii")
+    return results
+
+
+def _content_length(header: Dict[str, str]) -> Optional[int]:
+    """ return `Content-Length` of header, or None if it's missing.
+
+    Raises:
+        LspProtocolError - when it's not a non-negative integer.
+    """
+    length = header.get("Content-Length")
+    if length is None:
+        return None
+    try:
+        value = int(length)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise LspProtocolError(f"Invalid Content-Length: {length!r}.")
+    return value
+
+
+def _spill_body(length: int) -> mmap.mmap:
+    """ allocate a body of `length` bytes which is backed by a temporary file, so
+    huge bodies don't stay in resident memory. """
+    with tempfile.TemporaryFile() as file:
+        file.truncate(length)
+        # mmap keeps its own handle of file, so the file can be closed here, and it's
+        # deleted when mapping is gone.
+        return mmap.mmap(file.fileno(), length)
 
 
 class ReceiveBuffer:
     """ Inner data buffer.  It can receive data, and extract our header part and body
-    part later. """
+    part later.
 
-    def __init__(self):  # type: ignore
+    Args:
+        zero_copy (bool): when it's True, the body is saved into a single buffer which
+            is preallocated from `Content-Length`, and `try_extract_data` returns
+            memoryview into that buffer instead of copying data out.
+        spill_threshold (None or int): bodies whose `Content-Length` is not less
+            than it are received into a memory-mapped temporary file, and handled
+            like zero_copy mode.  None means never spill.
+        max_message_size (None or int): the max `Content-Length` we accept.  A
+            larger frame is rejected before anything is allocated for it.
+    """
+
+    def __init__(  # type: ignore
+        self,
+        zero_copy: bool = False,
+        spill_threshold: Optional[int] = None,
+        max_message_size: Optional[int] = None,
+    ):
+        self.zero_copy = zero_copy
+        self.spill_threshold = spill_threshold
+        self.max_message_size = max_message_size
         self.raw = bytearray()
+        # preallocated body in zero_copy mode, or spilled body, and how many bytes
+        # are filled.
+        self.body: Optional[Union[bytearray, mmap.mmap]] = None
+        self._body_view: Optional[memoryview] = None
+        self._filled: int = 0
         self.body_pointer: int = 0
         self._header_bytes: Optional[bytearray] = None
         self.header: Optional[Dict[str, str]] = None
+        self.content_length: Optional[int] = None
+        # how many bytes in `raw` have been scanned for header delimiter.
+        self._scanned: int = 0
 
     @property
     def header_bytes(self) -> Optional[bytearray]:
@@ -17,59 +96,117 @@ class ReceiveBuffer:
 
     @header_bytes.setter
     def header_bytes(self, value: Optional[bytearray]) -> None:
-        def _extract_header() -> Dict[str, str]:
-            header_str = self._header_bytes.decode("ascii")  # type: ignore
-            results = {}
-            rows = header_str.split("\r\n")
-            for row in rows:
-                key, val = row.split(": ")
-                results[key] = val
-            return results
-
         self._header_bytes = value
         if value is None:
             self.header = None
+            self.content_length = None
         else:
-            self.header = _extract_header()
+            self.header = _parse_header(value)
+            self.content_length = _content_length(self.header)
 
-    def append(self, data: bytes) -> None:
+    def append(self, data: Union[bytes, bytearray, memoryview]) -> None:
         """ Append data into buffer.
 
         Args:
-            data (bytes): the data we need to append.
+            data (bytes, bytearray or memoryview): the data we need to append.
         """
+        if self._body_view is not None and self._filled < len(self._body_view):
+            # write into preallocated body directly, and only keep the remaining
+            # data in `raw`.
+            count = min(len(data), len(self._body_view) - self._filled)
+            view = memoryview(data)
+            # fmt: off
+            self._body_view[self._filled:self._filled + count] = view[:count]
+            # fmt: on
+            self._filled += count
+            data = view[count:]
         self.raw.extend(data)
 
+    @property
+    def spilled(self) -> bool:
+        """ return True if body of current message should be spilled to a
+        temporary file. """
+        return (
+            self.spill_threshold is not None
+            and bool(self.content_length)
+            and self.content_length >= self.spill_threshold  # type: ignore
+        )
+
+    def _allocate_body(self) -> None:
+        """ allocate body from `Content-Length`, and move received body data from
+        `raw` into it. """
+        if self.content_length is None:
+            raise RuntimeError("Can't allocate body without Content-Length in header.")
+        if self.spilled:
+            self.body = _spill_body(self.content_length)
+        else:
+            self.body = bytearray(self.content_length)
+        self._body_view = memoryview(self.body)
+        count = min(len(self.raw), self.content_length)
+        with memoryview(self.raw) as raw_view:
+            self._body_view[:count] = raw_view[:count]
+        del self.raw[:count]
+        self._filled = count
+
     def try_extract_header(self) -> Optional[Dict[str, str]]:
         """ Try to extract the header part in the buffer.
 
+        The buffer remembers how far it has scanned, so when header data arrives in
+        small pieces, every byte is only scanned once.
+
         Returns:
             When the buffer received completely header data, then return
             A dict.  Else we return None.
+
+        Raises:
+            LspProtocolError - When `Content-Length` is invalid, or it's larger than
+                max_message_size, or it's missing in zero_copy mode.  The buffer
+                isn't changed, so it's raised again when it's called again.
         """
 
         if self.header is not None:
             return self.header
-        data_splitted = self.raw.split(b"\r\n\r\n")
-        if len(data_splitted) == 1:  # so we don't receive header data complete yet.
+        # the delimiter may be splitted between the old data and new data, so we
+        # need to re-scan last 3 bytes.
+        start = self._scanned - len(_HEADER_END) + 1
+        index = self.raw.find(_HEADER_END, start if start > 0 else 0)
+        if index == -1:  # so we don't receive header data complete yet.
+            self._scanned = len(self.raw)
             return None
-        else:
-            # we have receive header completely, so we can extract header, and if there
-            # are any data inputed, we save it to the raw, which indicate that it's
-            # un-handled.
-            self.header_bytes, self.raw = (
-                bytearray(data_splitted[0]),
-                bytearray(data_splitted[1]),
+        # we have receive header completely, so we can extract header, and if there
+        # are any data inputed, we leave it in the raw, which indicate that it's
+        # un-handled.  Deleting from the front of bytearray doesn't copy the body.
+        header_bytes = self.raw[:index]
+        header = _parse_header(header_bytes)
+        content_length = _content_length(header)
+        # check before changing the buffer, so the message is never delivered.
+        if content_length is None and self.zero_copy:
+            raise LspProtocolError(f"Missing Content-Length in header: {header}")
+        if (
+            self.max_message_size is not None
+            and content_length is not None
+            and content_length > self.max_message_size
+        ):
+            raise LspProtocolError(
+                f"Message size {content_length} exceeds the limit "
+                f"{self.max_message_size}."
             )
-            return self.header
+        self._header_bytes = header_bytes
+        self.header, self.content_length = header, content_length
+        del self.raw[: index + len(_HEADER_END)]
+        self._scanned = 0
+        if self.zero_copy or self.spilled:
+            self._allocate_body()
+        return self.header
 
-    def try_extract_data(self) -> Optional[bytes]:
+    def try_extract_data(self) -> Optional[Union[bytes, bytearray, memoryview]]:
         """ Try to extract the actual data in buffer.  Note that we should call
         `try_extract_header` first to extract header out.
 
         Returns:
             When there are data in the buffer, return it.  Return None to indicate
-            there are no data in the buffer.
+            there are no data in the buffer.  In zero_copy mode, the returned data
+            is a memoryview into the preallocated body.
 
         Raises:
             RuntimeError - When the buffer doesn't completely handle header data.
@@ -78,19 +215,75 @@ class ReceiveBuffer:
             raise RuntimeError(
                 "Header is un-handled yet, please call `try_extract_header` first."
             )
+        if self._body_view is not None:
+            if self.body_pointer == self._filled:
+                return None
+            # fmt: off
+            view = self._body_view[self.body_pointer:self._filled]
+            # fmt: on
+            self.body_pointer = self._filled
+            return view
         # TODO: need to rewrite the implementation.  Because the slice operation will
         # copy memeory, and it may be high cost.
-        if self.body_pointer == len(self.raw):
+        end = len(self.raw)
+        if self.content_length is not None and end > self.content_length:
+            # data after the body belongs to next message.
+            end = self.content_length
+        if self.body_pointer == end:
             return None
         # fmt: off
-        data = self.raw[self.body_pointer:]
+        data = self.raw[self.body_pointer:end]
         # fmt: on
-        self.body_pointer += len(data)
+        self.body_pointer = end
         return data
 
+    def take_body(self) -> Union[bytes, memoryview]:
+        """ return the body we have received, which is still valid after
+        `next_message`.  It's a bytes copy, or a memoryview of the preallocated
+        body in zero_copy mode. """
+        if self._body_view is not None:
+            return self._body_view
+        with memoryview(self.raw) as raw_view:
+            return raw_view[: self.content_length].tobytes()
+
     def clear(self) -> None:
         """ clear the buffer.  Which is useful when Connection want
         to start the next circle. """
         self.header_bytes = None
         self.raw.clear()
         self.body_pointer = 0
+        self._scanned = 0
+        # don't reuse the body, user may still hold memoryview of it.
+        self.body = None
+        self._body_view = None
+        self._filled = 0
+
+    def body_complete(self) -> bool:
+        """ return True if header is extracted and the whole body is received. """
+        if self.content_length is None:
+            return False
+        if self._body_view is not None:
+            return self._filled == self.content_length
+        return len(self.raw) >= self.content_length
+
+    def next_message(self) -> None:
+        """ drop the current message, and keep the remaining bytes in buffer.  Which
+        is useful when Connection want to start the next circle, but the next message
+        is already (partially) received. """
+        if self._body_view is None and self.content_length is not None:
+            del self.raw[: self.content_length]
+        self.header_bytes = None
+        self.body_pointer = 0
+        self._scanned = 0
+        self.body = None
+        self._body_view = None
+        self._filled = 0
+
+    def get_body(self) -> Union[bytearray, memoryview]:
+        """ return the body we have received.  In zero_copy mode, it's a memoryview
+        of the preallocated body. """
+        if self._body_view is not None:
+            return self._body_view
+        if self.content_length is not None and len(self.raw) > self.content_length:
+            return self.raw[: self.content_length]
+        return self.raw
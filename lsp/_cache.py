@@ -0,0 +1,192 @@
+""" Cache of responses of idempotent document requests.
+
+Editors often ask for `textDocument/hover`, `documentSymbol` or `foldingRange` of
+a document which didn't change, like when focus changes, or several panes show the
+same file.  ResponseCache keeps their encoded results keyed by document version,
+so the server can answer them without running handlers, or encoding results
+again.
+"""
+
+from collections import OrderedDict
+from typing import Any, Collection, Dict, Hashable, Optional, Set, Tuple
+
+from ._jsonrpc import Notification, _MessageEvent
+from ._scheduler import DID_OPEN, DID_CHANGE, DID_CLOSE
+
+__all__ = ["ResponseCache"]
+
+# Requests whose results only depend on the document and params.
+CACHED_METHODS = frozenset(
+    {
+        "textDocument/hover",
+        "textDocument/documentSymbol",
+        "textDocument/foldingRange",
+        "textDocument/documentLink",
+        "textDocument/documentColor",
+        "textDocument/selectionRange",
+        "textDocument/semanticTokens/full",
+        "textDocument/semanticTokens/range",
+    }
+)
+
+# Params which differ between requests, but don't change the result.
+IGNORED_PARAMS = frozenset({"textDocument", "workDoneToken", "partialResultToken"})
+
+CacheKey = Tuple[str, str, Optional[int], Hashable]
+
+
+def _freeze(value: Any) -> Hashable:
+    """ convert json value into hashable value, object keys are sorted. """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return ("[]",) + tuple(_freeze(item) for item in value)
+    return value
+
+
+class ResponseCache:
+    """ A LRU cache of responses, which is keyed by (method, uri, document version,
+    normalized params).
+
+    The cache tracks versions of opened documents by `handle`, and entries of a
+    document are dropped when it's changed or closed.  Requests of documents which
+    are not opened are not cached, because their files may change on disk.
+
+    Pass it to RequestScheduler, then cached requests are answered when they're
+    taken out of scheduler, and results of other requests are saved when they're
+    answered.
+
+    Args:
+        max_entries (int): how many responses are kept.
+        max_bytes (int): how many bytes of encoded results are kept.  A result
+            which is larger than it is not cached.
+        methods (None or Collection[str]): methods whose results are cached,
+            default is `CACHED_METHODS`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        methods: Optional[Collection[str]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.methods = CACHED_METHODS if methods is None else frozenset(methods)
+        self.hits = 0
+        self.misses = 0
+        # how many entries are dropped to keep the cache in limits.
+        self.evictions = 0
+        # the total size of cached results.
+        self.size = 0
+        # key -> encoded result, the least recently used comes first.
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        # uri -> version of opened documents.
+        self._versions: Dict[str, Optional[int]] = {}
+        # uri -> keys of it's entries.
+        self._keys: Dict[str, Set[CacheKey]] = {}
+
+    def handle(self, event: _MessageEvent) -> bool:
+        """ Track document versions by a text synchronization notification, and drop
+        entries of changed documents.
+
+        Args:
+            event (_MessageEvent): the message event.
+        Returns:
+            True if the event is a text synchronization notification.
+        """
+        if event.__class__ is not Notification:
+            return False
+        method = event["method"]
+        if method not in (DID_OPEN, DID_CHANGE, DID_CLOSE):
+            return False
+        document = event["params"]["textDocument"]
+        uri = document["uri"]
+        self.invalidate(uri)
+        if method == DID_CLOSE:
+            self._versions.pop(uri, None)
+        elif method == DID_OPEN or uri in self._versions:
+            self._versions[uri] = document.get("version")
+        return True
+
+    def key(self, method: str, params: Any) -> Optional[CacheKey]:
+        """ Make cache key of a request.
+
+        Args:
+            method (str): method of the request.
+            params: params of the request.
+        Returns:
+            The cache key, or None if the request is not cached.
+        """
+        if method not in self.methods or not isinstance(params, dict):
+            return None
+        document = params.get("textDocument")
+        if not isinstance(document, dict):
+            return None
+        uri = document.get("uri")
+        if uri not in self._versions:
+            return None
+        others = {
+            name: value for name, value in params.items() if name not in IGNORED_PARAMS
+        }
+        return (method, uri, self._versions[uri], _freeze(others))
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        """ return encoded result of key, or None if it's not cached. """
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: CacheKey, result: bytes) -> bool:
+        """ Save result of key, and evict the least recently used entries.
+
+        Args:
+            key (CacheKey): the key from `key`.
+            result (bytes): utf-8 json bytes of the result.
+        Returns:
+            True if it's saved.  The result is not saved when it's too large, or the
+            document changed after the key is made.
+        """
+        uri, version = key[1], key[2]
+        if uri not in self._versions or self._versions[uri] != version:
+            return False
+        if len(result) > self.max_bytes:
+            return False
+        self._discard(key)
+        self._entries[key] = result
+        self._keys.setdefault(uri, set()).add(key)
+        self.size += len(result)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def invalidate(self, uri: str) -> None:
+        """ drop all entries of document. """
+        for key in self._keys.pop(uri, ()):
+            self.size -= len(self._entries.pop(key))
+
+    def clear(self) -> None:
+        """ drop all entries, versions of documents are kept. """
+        self._entries.clear()
+        self._keys.clear()
+        self.size = 0
+
+    def _discard(self, key: CacheKey) -> None:
+        result = self._entries.pop(key, None)
+        if result is not None:
+            self.size -= len(result)
+            keys = self._keys[key[1]]
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[1]]
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,211 @@
+""" Coalescing of `textDocument/didChange` bursts.
+
+When the user types fast, editors send many didChange notifications for one
+document.  CoalescingQueue merges changes which are queued before their handler
+runs into a single notification, and Debouncer delays work like diagnostics until
+a document stops changing.
+"""
+
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from ._jsonrpc import Notification, _MessageEvent
+from ._scheduler import FifoQueue, DID_OPEN, DID_CHANGE, DID_CLOSE, _document_uri
+
+__all__ = ["CoalescingQueue", "Debouncer", "merge_changes"]
+
+# notifications about a document, which can't be reordered with it's changes.
+DOCUMENT_SYNC_METHODS = frozenset(
+    {
+        DID_OPEN,
+        DID_CHANGE,
+        "textDocument/willSave",
+        "textDocument/didSave",
+        DID_CLOSE,
+    }
+)
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _end_of_insert(change: Dict) -> Optional[Dict]:
+    """ return the position after text of range change, when it's applied. """
+    text = change["text"]
+    if "\r" in text:
+        # lone carriage return is also a line break, don't bother.
+        return None
+    start = change["range"]["start"]
+    lines = text.count("\n")
+    if lines == 0:
+        return {
+            "line": start["line"],
+            "character": start["character"] + _utf16_length(text),
+        }
+    # fmt: off
+    return {
+        "line": start["line"] + lines,
+        "character": _utf16_length(text[text.rindex("\n") + 1:]),
+    }
+    # fmt: on
+
+
+def _append_change(changes: List[Dict], change: Dict) -> None:
+    """ append content change, and merge it into the last one when possible. """
+    if "range" not in change:
+        # full text replaces everything before it.
+        changes.clear()
+    elif changes and "range" in changes[-1]:
+        last = changes[-1]
+        start, end = change["range"]["start"], change["range"]["end"]
+        # an insertion right after the text of last change, like typing.
+        if start == end and _end_of_insert(last) == start:
+            merged = dict(last)
+            merged["text"] = last["text"] + change["text"]
+            changes[-1] = merged
+            return
+    changes.append(change)
+
+
+def merge_changes(changes: Sequence[Dict]) -> Dict:
+    """ Merge params of didChange notifications of one document into one equivalent
+    params.
+
+    Content changes are applied in version order.  Changes before a full text
+    change are dropped, and insertions which continue the previous range change,
+    like typing, are merged into it.
+
+    Args:
+        changes (Sequence[Dict]): params of didChange notifications.
+    Returns:
+        The params of merged didChange notification.
+    """
+    ordered = sorted(
+        changes, key=lambda params: params["textDocument"].get("version") or 0
+    )
+    content_changes: List[Dict] = []
+    for params in ordered:
+        for change in params["contentChanges"]:
+            _append_change(content_changes, change)
+    return {
+        "textDocument": ordered[-1]["textDocument"],
+        "contentChanges": content_changes,
+    }
+
+
+class CoalescingQueue:
+    """ A queue which merges didChange notifications of a document, which are
+    queued before their handler runs, into one notification.
+
+    A didChange is merged into the queued one of the same document, unless another
+    text synchronization notification of the document, or any other message, is
+    queued between them.  So changes are never moved ahead of requests which come
+    before them.  It wraps another queue.
+
+    Args:
+        queue (None or queue object): the queue which keeps messages, like
+            `FifoQueue` or `PriorityQueue`.  Default is FifoQueue.
+    """
+
+    __slots__ = ("queue", "coalesced", "_open", "_merged")
+
+    def __init__(self, queue: Any = None):
+        self.queue = FifoQueue() if queue is None else queue
+        # how many didChange notifications are merged into queued ones.
+        self.coalesced = 0
+        # uri -> queued didChange which later changes can be merged into.
+        self._open: Dict[str, _MessageEvent] = {}
+        # id of queued didChange -> params of changes which are merged into it.
+        self._merged: Dict[int, List[Any]] = {}
+
+    def push(self, message: _MessageEvent) -> None:
+        """ add message into queue, or merge it into a queued didChange. """
+        method = message["method"]
+        if method in DOCUMENT_SYNC_METHODS and message.__class__ is Notification:
+            params = message["params"]
+            uri = _document_uri(params)
+            if uri is not None:
+                head = self._open.get(uri)
+                if method != DID_CHANGE:
+                    self._open.pop(uri, None)
+                elif head is not None:
+                    self._merged.setdefault(id(head), []).append(params)
+                    self.coalesced += 1
+                    return
+                else:
+                    self._open[uri] = message
+        else:
+            # requests may read any document, later changes can't go before them.
+            self._open.clear()
+        self.queue.push(message)
+
+    def pop(self) -> _MessageEvent:
+        """ remove and return the next message, merged changes are returned as a
+        new didChange notification.
+
+        Raises:
+            IndexError - when the queue is empty.
+        """
+        message = self.queue.pop()
+        if message["method"] == DID_CHANGE:
+            uri = _document_uri(message["params"])
+            if self._open.get(uri) is message:  # type: ignore
+                del self._open[uri]  # type: ignore
+            merged = self._merged.pop(id(message), None)
+            if merged is not None:
+                params = merge_changes([message["params"]] + merged)
+                message = Notification.make(DID_CHANGE, params)
+        return message
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+
+class Debouncer:
+    """ Delay work of keys until they are quiet for `delay` seconds, like
+    recomputing diagnostics of a document after the user stops typing.
+
+    It doesn't do any io, the caller should call `due` when `timeout` seconds
+    passed.
+
+    Args:
+        delay (float): seconds a key should be quiet before it's due.
+        clock (Callable[[], float]): returns current time in seconds.
+    """
+
+    def __init__(self, delay: float, clock: Callable[[], float] = time.monotonic):
+        self.delay = delay
+        self.clock = clock
+        # key -> deadline, they're in deadline order, because delay is fixed.
+        self._deadlines: Dict[Hashable, float] = {}
+
+    def touch(self, key: Hashable) -> None:
+        """ postpone work of key, it's due after `delay` seconds. """
+        self._deadlines.pop(key, None)
+        self._deadlines[key] = self.clock() + self.delay
+
+    def cancel(self, key: Hashable) -> None:
+        """ forget about key, like when the document is closed. """
+        self._deadlines.pop(key, None)
+
+    def due(self) -> List[Hashable]:
+        """ return keys which are quiet for `delay` seconds, and forget them. """
+        now = self.clock()
+        keys = []
+        for key, deadline in self._deadlines.items():
+            if deadline > now:
+                break
+            keys.append(key)
+        for key in keys:
+            del self._deadlines[key]
+        return keys
+
+    def timeout(self) -> Optional[float]:
+        """ return seconds until the next key is due, or None if nothing waits. """
+        for deadline in self._deadlines.values():
+            return max(deadline - self.clock(), 0.0)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
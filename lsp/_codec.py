@@ -0,0 +1,132 @@
+""" JSON codecs which convert between python objects and message body bytes.
+
+The stdlib json codec is always available.  Faster backends are detected at import
+time, and they can be selected per Connection:
+
+conn = Connection("server", codec=get_codec("orjson"))
+"""
+
+import json
+from json import JSONEncoder
+from typing import Any, Dict, List, Optional, Type, Union
+
+__all__ = ["Codec", "JsonCodec", "get_codec", "available_codecs"]
+
+# The body types which codec should decode from.
+BodyType = Union[bytes, bytearray, memoryview]
+
+
+class Codec:
+    """ Base class of codecs.  Subclass should implement `encode` and `decode`,
+    and both of them work directly with bytes.
+
+    Attributes:
+        name (str): the name to select the codec by `get_codec`.
+    """
+
+    name = ""
+
+    def encode(self, obj: Any) -> bytes:
+        """ encode python object into utf-8 json bytes. """
+        raise NotImplementedError()
+
+    def decode(self, data: BodyType) -> Any:
+        """ decode utf-8 json bytes into python object. """
+        raise NotImplementedError()
+
+
+class JsonCodec(Codec):
+    """ Codec implemented by stdlib json module.
+
+    Args:
+        encoder (None or an subclass of json.JSONEncoder): The encoder to encode
+            json, if the encoder is None, the default json.JSONEncoder will be used.
+    """
+
+    name = "json"
+
+    def __init__(self, encoder: Optional[Type[JSONEncoder]] = None):
+        self.encoder = encoder
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, cls=self.encoder).encode("utf-8")
+
+    def decode(self, data: BodyType) -> Any:
+        # str() can decode memoryview directly, and lsp body is always utf-8, so
+        # we needn't let json detect the encoding.
+        return json.loads(str(data, "utf-8"))
+
+
+_codecs: Dict[str, Type[Codec]] = {"json": JsonCodec}
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    pass
+else:
+
+    class OrjsonCodec(Codec):
+        """ Codec implemented by orjson, which works with bytes natively. """
+
+        name = "orjson"
+
+        def encode(self, obj: Any) -> bytes:
+            return orjson.dumps(obj)
+
+        def decode(self, data: BodyType) -> Any:
+            return orjson.loads(data)
+
+    _codecs["orjson"] = OrjsonCodec
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    pass
+else:  # pragma: no cover
+
+    class UjsonCodec(Codec):
+        """ Codec implemented by ujson. """
+
+        name = "ujson"
+
+        def encode(self, obj: Any) -> bytes:
+            return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+        def decode(self, data: BodyType) -> Any:
+            if isinstance(data, memoryview):
+                data = bytes(data)
+            return ujson.loads(data)
+
+    _codecs["ujson"] = UjsonCodec
+
+
+# the order we prefer when selecting the fastest codec.
+_preferred = ["orjson", "ujson", "json"]
+
+
+def available_codecs() -> List[str]:
+    """ return names of available codecs, the faster one comes first. """
+    return [name for name in _preferred if name in _codecs]
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """ make a codec object by name.
+
+    Args:
+        name (None or str): the name of codec.  When it's None, the fastest
+            available codec is used.
+    Returns:
+        The codec object.
+    Raises:
+        ValueError - when the codec is not available.
+    """
+    if name is None:
+        name = available_codecs()[0]
+    try:
+        codec_cls = _codecs[name]
+    except KeyError:
+        raise ValueError(
+            f"Codec {name!r} is not available, available codecs: "
+            f"{available_codecs()}"
+        ) from None
+    return codec_cls()
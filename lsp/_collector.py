@@ -3,21 +3,30 @@
 # if we add too much data during appending data, which can throw out error
 # as soon as possible.
 
+from typing import Union
+
 
 class FixedLengthCollector:
     """ Collector which can handle data, and automatically check out
-    if we push too much data into it. """
+    if we push too much data into it.
+
+    Args:
+        keep_data (bool): Indicate that if we should save appended data into
+            `self.data`.  When it's False, the collector only tracks the count.
+    """
 
-    def __init__(self):  # type: ignore
+    def __init__(self, keep_data: bool = True):  # type: ignore
         self.remain: int = 0
         self.data = bytearray()
         self.length_set = False
+        self.keep_data = keep_data
+        self.count: int = 0
 
-    def append(self, data: bytes) -> None:
+    def append(self, data: Union[bytes, bytearray, memoryview]) -> None:
         """ append data into collector.
 
         Args:
-            data (bytes): data we need to append to.
+            data (bytes, bytearray or memoryview): data we need to append to.
         Raises:
             RuntimeError - When the length of data is more than the buffer capacity.
         """
@@ -29,7 +38,9 @@ class FixedLengthCollector:
         if checked_length < 0:
             raise RuntimeError("Too much data to insert into buffer.")
         self.remain -= len(data)
-        self.data.extend(data)
+        self.count += len(data)
+        if self.keep_data:
+            self.data.extend(data)
 
     def set_length(self, length: int) -> None:
         """ set the length of collector.  Note that if the length is set, we can't call
@@ -54,10 +65,11 @@ class FixedLengthCollector:
         self.length_set = False
         self.data.clear()
         self.remain = 0
+        self.count = 0
 
     def __len__(self) -> int:
         """ return the length of buffer in bytes. """
-        return len(self.data)
+        return self.count
 
     def full(self) -> bool:
         """ return True if collect data complete. """
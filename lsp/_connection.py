@@ -1,6 +1,5 @@
 """ Core implementation for lsp """
 
-import json
 from json import JSONEncoder
 from typing import Dict, List, Union, Type, Optional, Tuple
 
@@ -8,19 +7,34 @@ from ._events import (
     Close,
     EventBase,
     _HeaderEvent,
+    DataEvent,
     DataReceived,
     DataSent,
     RequestReceived,
     RequestSent,
     ResponseReceived,
     MessageEnd,
+    MessageReceived,
+    MessageSent,
+    MessageComplete,
     ResponseSent,
 )
-from ._state import IDLE, next_state, DONE, SEND_RESPONSE
+from ._state import (
+    IDLE,
+    DONE,
+    SEND_RESPONSE,
+    EVENT_COUNT,
+    state_table,
+    stream_table,
+    transition,
+)
 from ._role import Role
 from ._buffer import ReceiveBuffer
 from ._collector import FixedLengthCollector
+from ._codec import Codec, JsonCodec
+from ._frame import FrameEncoder, DEFAULT_CONTENT_TYPE
 from ._errors import LspProtocolError
+from ._lazy import LazyMessage
 
 __all__ = ["Connection", "NEED_DATA"]
 
@@ -45,14 +59,61 @@ def make_sentinal(name: str) -> SentinalType:
 NEED_DATA = make_sentinal("NEED_DATA")
 
 
+# when we get RequestReceived/ResponseReceived/DataReceived event, we should change
+# other side's state by RequestSent/ResponseSent/DataSent event.  The list is
+# indexed by the code of received event, EventBase has no valid transition.
+_their_events: List[Type[EventBase]] = [EventBase] * EVENT_COUNT
+for _received, _sent in [
+    (RequestReceived, RequestSent),
+    (ResponseReceived, ResponseSent),
+    (MessageReceived, MessageSent),
+    (DataReceived, DataSent),
+    (MessageEnd, MessageEnd),
+]:
+    _their_events[_received._code] = _sent
+
+
 class Connection:
     """ Language server protocol Connection object.
 
     Args:
         role (str): represent our role.  Which can be 'cliet' or 'server'
+        zero_copy (bool): receive body into a single buffer preallocated from
+            `Content-Length`.  Then `DataReceived` events carry memoryview into that
+            buffer, and `get_received_data(raw=True)` returns memoryview of the
+            whole body, so body bytes are not copied again after receiving.
+        multiplexed (bool): make connection full duplex.  Inbound messages and
+            outbound messages are independent streams, so any number of requests
+            can be outstanding in both directions, and there is no need to call
+            `go_next_circle`.  Incoming headers are reported as `MessageReceived`
+            events, because a header alone can't tell a request from a response.
+        codec (None or Codec): the codec to convert between json object and bytes.
+            If it's None, the stdlib json codec will be used.  See `get_codec`.
+        send_content_type (bool): Indicate that if `send_json` should write the
+            Content-Type line in header.  The other side uses the same value by
+            default when it's omitted.
+        whole_message (bool): only report complete messages.  `next_event` returns
+            a single `MessageComplete` event which holds header and body, instead
+            of header event, `DataReceived` events and `MessageEnd`.
+        spill_threshold (None or int): receive bodies whose `Content-Length` is not
+            less than it into a memory-mapped temporary file, then they are
+            delivered as memoryview like zero_copy mode.  None means never spill.
+        max_message_size (None or int): reject incoming messages whose
+            `Content-Length` is larger than it with LspProtocolError, before
+            anything is allocated for the body.
     """
 
-    def __init__(self, role: str):  # type: ignore
+    def __init__(  # type: ignore
+        self,
+        role: str,
+        zero_copy: bool = False,
+        multiplexed: bool = False,
+        codec: Optional[Codec] = None,
+        send_content_type: bool = True,
+        whole_message: bool = False,
+        spill_threshold: Optional[int] = None,
+        max_message_size: Optional[int] = None,
+    ):
         if role == "client":
             self.our_role = Role.CLIENT
             self.their_role = Role.SERVER
@@ -63,9 +124,34 @@ class Connection:
             raise ValueError("The `role` value should be one of ('client', 'server')")
         self.our_state = IDLE
         self.their_state = IDLE
-        self.in_buffer = ReceiveBuffer()
+        # compiled state machines of our side and their side.
+        if multiplexed:
+            self._our_table = self._their_table = stream_table
+        else:
+            self._our_table = state_table(self.our_role)
+            self._their_table = state_table(self.their_role)
+        self.in_buffer = ReceiveBuffer(
+            zero_copy=zero_copy,
+            spill_threshold=spill_threshold,
+            max_message_size=max_message_size,
+        )
         self.out_collector = FixedLengthCollector()
-        self.in_collector = FixedLengthCollector()
+        # incoming body is kept by in_buffer, so don't keep another copy of it when
+        # body may be huge.
+        self.in_collector = FixedLengthCollector(
+            keep_data=not zero_copy and spill_threshold is None
+        )
+        self.multiplexed = multiplexed
+        self.whole_message = whole_message
+        self.codec = JsonCodec() if codec is None else codec
+        self.frame_encoder = FrameEncoder(
+            DEFAULT_CONTENT_TYPE if send_content_type else None
+        )
+        # buffers which are queued by `queue_json`.
+        self._out_queue: List[bytes] = []
+        # In multiplexed mode, indicate that incoming message is complete, and
+        # buffer should go to next message before extracting next event.
+        self._in_message_end = False
 
     def send(self, event: EventBase) -> bytes:
         """ send event and returns the relative bytes.  So what this function
@@ -78,7 +164,7 @@ class Connection:
             Bytes we can send to other side.
         """
         # transfer our state
-        self.our_state = next_state(self.our_role, self.our_state, event)
+        self.our_state = transition(self._our_table, self.our_state, event)
         try:
             data = self._handle_event(event)
         except RuntimeError as e:
@@ -87,13 +173,16 @@ class Connection:
 
     def _handle_event(self, event: EventBase) -> bytes:
         # convert event into bytes
-        data = event.to_data()
+        if isinstance(event, DataEvent) and isinstance(event["data"], (list, dict)):
+            data = self.codec.encode(event["data"])
+        else:
+            data = event.to_data()
         if isinstance(event, _HeaderEvent):
-            if isinstance(event, RequestSent):
+            if isinstance(event, RequestSent) and not self.multiplexed:
                 # client fire RequestSent event, server should goto next_state according
                 # to RequestReceived event
-                self.their_state = next_state(
-                    self.their_role, self.their_state, RequestReceived
+                self.their_state = transition(
+                    self._their_table, self.their_state, RequestReceived
                 )
             self.out_collector.set_length(event["Content-Length"])
         elif isinstance(event, MessageEnd) and self.out_collector.remain > 0:
@@ -102,6 +191,9 @@ class Connection:
             )
         else:
             self.out_collector.append(data)
+            if self.multiplexed and isinstance(event, MessageEnd):
+                # outbound stream is ready for next message.
+                self.out_collector.clear()
         return data
 
     def send_json(
@@ -112,13 +204,79 @@ class Connection:
         Args:
             data (List or Dict): A valid object which can be dumps to json
             encoder (None or an subclass of json.JSONEncoder): The encoder to encode
-                json, if the encoder is None, the default json.JSONEncoder will be used.
+                json, if the encoder is None, the codec of connection will be used.
         Returns:
             Bytes that we can send to other side.
         """
+        header, body = self._frame_json(data, encoder)
+        return header + body
+
+    def queue_json(
+        self, data: Union[List[Dict], Dict], encoder: Optional[Type[JSONEncoder]] = None
+    ) -> None:
+        """ Just like `send_json`, but the header and body are saved into outbound
+        queue instead of concatenating them.  Then many pending messages can be
+        fetched by `data_to_send` and written in one syscall.
+
+        Args:
+            data (List or Dict): A valid object which can be dumps to json
+            encoder (None or an subclass of json.JSONEncoder): The encoder to encode
+                json, if the encoder is None, the codec of connection will be used.
+        """
+        self._out_queue.extend(self._frame_json(data, encoder))
+
+    def send_body(self, body: bytes) -> bytes:
+        """ Just like `send_json`, but the body is already encoded, like results
+        which are cached.
+
+        Args:
+            body (bytes): utf-8 json bytes of the message.
+        Returns:
+            Bytes that we can send to other side.
+        """
+        header, body = self._frame_body(body)
+        return header + body
+
+    def queue_body(self, body: bytes) -> None:
+        """ Just like `queue_json`, but the body is already encoded, like results
+        which are cached.
+
+        Args:
+            body (bytes): utf-8 json bytes of the message.
+        """
+        self._out_queue.extend(self._frame_body(body))
+
+    def data_to_send(self) -> List[bytes]:
+        """ Fetch and clear the buffers in outbound queue.
+
+        Returns:
+            A list of bytes, which can be passed to `socket.sendmsg`, `os.writev`
+            or `transport.writelines` directly.
+        """
+        buffers, self._out_queue = self._out_queue, []
+        return buffers
+
+    def _frame_json(
+        self, data: Union[List[Dict], Dict], encoder: Optional[Type[JSONEncoder]]
+    ) -> Tuple[bytes, bytes]:
+        """ Check state, and encode data into (header, body). """
+        if encoder is None:
+            binary_data = self.codec.encode(data)
+        else:
+            binary_data = JsonCodec(encoder).encode(data)
+        return self._frame_body(binary_data)
+
+    def _frame_body(self, binary_data: bytes) -> Tuple[bytes, bytes]:
+        """ Check state, and make (header, body) of encoded body. """
 
         def _check_state() -> None:
-            if self.our_role == Role.SERVER:
+            if self.multiplexed:
+                if self.our_state is not IDLE:
+                    raise LspProtocolError(
+                        "Can't send data while sending another message, "
+                        f"our_state: {self.our_state}"
+                    )
+            elif self.our_role == Role.SERVER:
                 if self.our_state is not SEND_RESPONSE or self.their_state is not DONE:
                     raise LspProtocolError(
                         "Can only send data when we receive request.\n"
@@ -133,16 +291,17 @@ class Connection:
                     )
 
         def _set_state() -> None:
+            if self.multiplexed:
+                # the whole message is sent, so outbound stream is still IDLE.
+                return
             self.our_state = DONE
             if self.our_role == Role.CLIENT:
                 self.their_state = SEND_RESPONSE
 
         # do state checking.
         _check_state()
-        binary_data = json.dumps(data, cls=encoder).encode("utf-8")
-        header_event = _HeaderEvent({"Content-Length": len(binary_data)})
         _set_state()
-        return header_event.to_data() + binary_data
+        return self.frame_encoder.encode_header(len(binary_data)), binary_data
 
     def next_event(self) -> Union[SentinalType, EventBase]:
         """ Parse the next event out of incoming buffer, and return it.
@@ -156,32 +315,169 @@ class Connection:
             2. A special constant NEED_DATA, which indicate that user need to receive
             data from remote server, and calling receive(data).
         """
+        if self.whole_message:
+            return self._next_whole_message()
+        if self.multiplexed:
+            return self._next_stream_event()
         if self.our_role is Role.CLIENT and self.our_state is not DONE:
             raise LspProtocolError("Client can only accept data after it send request.")
         event = self._extract_event()
-        if isinstance(event, EventBase):
-            their_event: Union[type, EventBase]
-            # when we get RequestReceived/ResponseReceived/DataReceived event, we
-            # should change other side's state by RequestSent/ResponseSent/DataSent
-            # event.
-            if isinstance(event, _HeaderEvent):
-                if isinstance(event, RequestReceived):
-                    # when server get RequestReceived event, it should change
-                    # the state according to this event.
-                    self.our_state = next_state(self.our_role, self.our_state, event)
-                    their_event = RequestSent
-                elif isinstance(event, ResponseReceived):
-                    their_event = ResponseSent
-            elif isinstance(event, DataReceived):
-                their_event = DataSent
-            else:
-                their_event = event.__class__
-            # transfer their_state
-            self.their_state = next_state(
-                self.their_role, self.their_state, their_event
+        if not isinstance(event, EventBase):
+            return event
+        if event.__class__ is RequestReceived:
+            # when server get RequestReceived event, it should change
+            # the state according to this event.
+            self.our_state = transition(self._our_table, self.our_state, event)
+        # transfer their_state
+        self.their_state = transition(
+            self._their_table, self.their_state, _their_events[event._code]
+        )
+        return event
+
+    def next_events(self) -> List[EventBase]:
+        """ Parse all events which are ready in incoming buffer, and return them.
+
+        Role and state checks are done once for the whole batch.  In lockstep
+        mode it stops after MessageEnd, because the connection needs to go to next
+        circle before it can receive more.  In multiplexed mode it drains every
+        message in incoming buffer, so `get_received_data` can't be used, bodies
+        of messages are carried by their DataReceived events.
+
+        Returns:
+            A list of events, it's empty when we need to receive more data.
+        """
+        events: List[EventBase] = []
+        append = events.append
+        if self.whole_message:
+            next_whole_message = self._next_whole_message
+            while True:
+                event = next_whole_message()
+                if not isinstance(event, EventBase):
+                    return events
+                append(event)
+                if not self.multiplexed:
+                    return events
+        if self.multiplexed:
+            next_stream_event = self._next_stream_event
+            while True:
+                event = next_stream_event()
+                if not isinstance(event, EventBase):
+                    return events
+                append(event)
+        if self.our_role is Role.CLIENT and self.our_state is not DONE:
+            raise LspProtocolError("Client can only accept data after it send request.")
+        extract_event = self._extract_event
+        their_table = self._their_table
+        while True:
+            event = extract_event()
+            if not isinstance(event, EventBase):
+                return events
+            if event.__class__ is RequestReceived:
+                self.our_state = transition(self._our_table, self.our_state, event)
+            self.their_state = transition(
+                their_table, self.their_state, _their_events[event._code]
             )
+            append(event)
+            if event.__class__ is MessageEnd:
+                return events
+
+    def receive_and_drain(self, data: bytes) -> List[EventBase]:
+        """ Receive data, and return all events which are ready.  It's the same as
+        `receive(data)` followed by `next_events()`.
+
+        Args:
+            data (bytes): the data we received.
+        Returns:
+            A list of events, it's empty when we need to receive more data.
+        """
+        self.in_buffer.append(data)
+        return self.next_events()
+
+    def _next_stream_event(self) -> Union[SentinalType, EventBase]:
+        """ next_event implementation for multiplexed connection. """
+        if self._in_message_end:
+            # previous message is complete, start receiving the next one.
+            self.in_buffer.next_message()
+            self.in_collector.clear()
+            self._in_message_end = False
+        event = self._extract_event()
+        if not isinstance(event, EventBase):
+            return event
+        self._in_message_end = event.__class__ is MessageEnd
+        self.their_state = transition(
+            self._their_table, self.their_state, _their_events[event._code]
+        )
         return event
 
+    def _next_whole_message(self) -> Union[SentinalType, EventBase]:
+        """ next_event implementation for whole message mode.  It waits until the
+        whole body is received, and the state goes through header and MessageEnd
+        events at once. """
+        buffer = self.in_buffer
+        their_event: Type[_HeaderEvent]
+        if self.multiplexed:
+            if self._in_message_end:
+                buffer.next_message()
+                self._in_message_end = False
+            their_event = MessageSent
+        else:
+            if self.our_role is Role.CLIENT:
+                if self.our_state is not DONE:
+                    raise LspProtocolError(
+                        "Client can only accept data after it send request."
+                    )
+                their_event = ResponseSent
+            else:
+                their_event = RequestSent
+        header = buffer.try_extract_header()
+        if header is None:
+            return NEED_DATA
+        if buffer.content_length is None:
+            raise LspProtocolError(f"Missing Content-Length in header: {header}")
+        if not buffer.body_complete():
+            return NEED_DATA
+        if their_event is RequestSent:
+            self.our_state = transition(
+                self._our_table, self.our_state, RequestReceived
+            )
+        their_table = self._their_table
+        their_state = transition(their_table, self.their_state, their_event)
+        self.their_state = transition(their_table, their_state, MessageEnd)
+        self._in_message_end = self.multiplexed
+        return MessageComplete.make(header, buffer.take_body())
+
+    def _next_message(
+        self
+    ) -> Optional[Tuple[Dict[str, str], Union[bytearray, memoryview]]]:
+        """ Extract a complete message out of incoming buffer without firing any
+        events, which is the hot path for message layers on top of multiplexed
+        connection.  It shouldn't be mixed with `next_event` on the same message.
+
+        Returns:
+            A tuple contains (header, body) when a whole message is received.  Or
+            None when we need to receive more data.
+
+        Raises:
+            LspProtocolError - when the connection is not multiplexed, or the header
+                doesn't contain Content-Length.
+        """
+        if not self.multiplexed:
+            raise LspProtocolError("Can only extract message in multiplexed mode.")
+        buffer = self.in_buffer
+        if self._in_message_end:
+            buffer.next_message()
+            self.in_collector.clear()
+            self._in_message_end = False
+        header = buffer.try_extract_header()
+        if header is None:
+            return None
+        if buffer.content_length is None:
+            raise LspProtocolError(f"Missing Content-Length in header: {header}")
+        if not buffer.body_complete():
+            return None
+        self._in_message_end = True
+        return header, buffer.get_body()
+
     def receive(self, data: bytes) -> None:
         """ Receive data and feed it to our incoming buffer.  Then we can call
         `next_event` to extrace out incoming events.
@@ -200,7 +496,9 @@ class Connection:
                 return NEED_DATA
             else:
                 event_obj: _HeaderEvent
-                if self.our_role == Role.SERVER:
+                if self.multiplexed:
+                    event_obj = MessageReceived(header)
+                elif self.our_role == Role.SERVER:
                     event_obj = RequestReceived(header)
                 else:
                     event_obj = ResponseReceived(header)
@@ -210,18 +508,24 @@ class Connection:
             data = self.in_buffer.try_extract_data()
             if data is None:
                 if self.in_collector.remain == 0:
-                    return MessageEnd()
+                    return MessageEnd.make()
                 return NEED_DATA
             else:
                 self.in_collector.append(data)
-                return DataReceived({"data": data})
+                return DataReceived.make(data)
 
     def go_next_circle(self) -> None:
         """ go to next request/response circle.
 
         Raises:
             LspProtocolError - When our state and their state is not done yet.
+                Or the connection is multiplexed, which has no circle.
         """
+        if self.multiplexed:
+            raise LspProtocolError(
+                "Multiplexed connection goes to next message automatically, "
+                "there is no need to call `go_next_circle`."
+            )
         # As server: when we receive Notification complete
         # As client: when we cend Notification complete
         # We can just go_next_circle.  But just ensure that client's state is DONE
@@ -244,13 +548,14 @@ class Connection:
                 )
         self.our_state = IDLE
         self.their_state = IDLE
-        self.in_buffer.clear()
+        # the next message may be already received, so keep it in buffer.
+        self.in_buffer.next_message()
         self.out_collector.clear()
         self.in_collector.clear()
 
     def get_received_data(
-        self, raw: bool = False
-    ) -> Tuple[Dict, Union[bytes, Dict, List]]:
+        self, raw: bool = False, lazy: bool = False
+    ) -> Tuple[Dict, Union[bytes, memoryview, Dict, List, LazyMessage]]:
         """ A helper method to extract our received data.  This method is useful
         when we get `MessageEnd` event(which indicate we have received data completely).
         And it returns a eaiily-handled python objects.
@@ -258,27 +563,39 @@ class Connection:
         Args:
             raw (bool): Indicate that if we should return raw data(in bytes).  Or
                 deserialized data.
+            lazy (bool): return a LazyMessage, which decodes `params` and `result`
+                on first access.
 
         Returns:
             A tuple contains (header, data), header has type dict.
             And data's type can be bytes when raw is True(So it can be serialize by
             other json library on user code).  Or it can be a dict or list object.
+            In zero_copy mode, the raw data is a memoryview of received body.
 
         Raises:
             Raise RuntimeError when we don't receive data completely.
         """
         header = self.in_buffer.try_extract_header()
-        if header is None or not self.in_collector.full():
+        if self.whole_message:
+            complete = self.in_buffer.body_complete()
+        else:
+            complete = self.in_collector.full()
+        if header is None or not complete:
             raise RuntimeError(
                 "Receive data incompletely.  Please call `next_event()` until"
                 "Received MessageEnd event"
             )
+        if lazy:
+            return header, LazyMessage(self.in_buffer.take_body(), self.codec)
+        body = self.in_buffer.get_body()
         if raw is False:
-            return header, json.loads(self.in_buffer.raw)
+            return header, self.codec.decode(body)
+        elif isinstance(body, memoryview):
+            return header, body
         else:
-            return header, bytes(self.in_buffer.raw)
+            return header, bytes(body)
 
     def close(self) -> None:
         """ Close the connection, make both states go to closed. """
-        self.our_state = next_state(self.our_role, self.our_state, Close)
-        self.their_state = next_state(self.their_role, self.their_state, Close)
+        self.our_state = transition(self._our_table, self.our_state, Close)
+        self.their_state = transition(self._their_table, self.their_state, Close)
@@ -0,0 +1,146 @@
+""" Publisher of `textDocument/publishDiagnostics` notifications.
+
+Servers usually publish diagnostics of a document after every change, and most of
+them are the same as the last ones.  DiagnosticsPublisher skips diagnostics which
+the client already has, sends at most one notification per document in an
+interval, and queues notifications of many documents, so they're written
+together.
+"""
+
+import hashlib
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ._jsonrpc import JsonRpcConnection
+
+__all__ = ["DiagnosticsPublisher"]
+
+PUBLISH_METHOD = "textDocument/publishDiagnostics"
+_BODY_PREFIX = b'{"jsonrpc": "2.0", "method": "%s", "params": {"uri": ' % (
+    PUBLISH_METHOD.encode("ascii")
+)
+
+
+class DiagnosticsPublisher:
+    """ Publish diagnostics of documents to the client.
+
+    `publish` only saves the latest diagnostics of a document, and `flush` queues
+    notifications of documents which are due into outbound queue of connection, so
+    they can be fetched by `data_to_send` and written in one call.  Like Debouncer,
+    it doesn't do any io, the caller should call `flush` when `timeout` seconds
+    passed.
+
+    Args:
+        rpc (JsonRpcConnection): the connection we send notifications to.
+        interval (float): seconds between notifications of a document.
+        clock (Callable[[], float]): returns current time in seconds.
+    """
+
+    def __init__(
+        self,
+        rpc: JsonRpcConnection,
+        interval: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rpc = rpc
+        self.interval = interval
+        self.clock = clock
+        # how many notifications are sent.
+        self.published = 0
+        # how many diagnostics are not sent, because the client has them, or newer
+        # diagnostics replace them.
+        self.skipped = 0
+        # uri -> (digest, time) of the last notification.
+        self._sent: Dict[str, Tuple[bytes, float]] = {}
+        # uri -> (digest, version, encoded diagnostics) of the latest diagnostics
+        # which are not sent.
+        self._pending: Dict[str, Tuple[bytes, Optional[int], bytes]] = {}
+
+    def publish(
+        self, uri: str, diagnostics: Sequence[Any], version: Optional[int] = None
+    ) -> bool:
+        """ Save the latest diagnostics of document, they're sent by `flush`.
+
+        Args:
+            uri (str): uri of the document.
+            diagnostics (Sequence[Any]): diagnostics of the document.
+            version (None or int): version of the document.
+        Returns:
+            False if the client already has the same diagnostics, so nothing will
+            be sent.
+        """
+        encoded = self.rpc.conn.codec.encode(diagnostics)
+        # version isn't hashed, the client needn't know the same diagnostics again.
+        digest = hashlib.blake2b(encoded, digest_size=16).digest()
+        if self._pending.pop(uri, None) is not None:
+            self.skipped += 1
+        sent = self._sent.get(uri)
+        if sent is not None and sent[0] == digest:
+            self.skipped += 1
+            return False
+        # the body is built by `flush`, diagnostics replaced before it are only
+        # encoded.
+        self._pending[uri] = (digest, version, encoded)
+        return True
+
+    def flush(self) -> int:
+        """ Queue notifications of documents which are not published in the last
+        `interval` seconds into outbound queue.
+
+        Returns:
+            The number of queued notifications.
+        """
+        if not self._pending:
+            return 0
+        now = self.clock()
+        due: List[str] = []
+        for uri in self._pending:
+            sent = self._sent.get(uri)
+            if sent is None or now - sent[1] >= self.interval:
+                due.append(uri)
+        conn = self.rpc.conn
+        encode = conn.codec.encode
+        for uri in due:
+            digest, version, encoded = self._pending.pop(uri)
+            body = b"".join(
+                (
+                    _BODY_PREFIX,
+                    encode(uri),
+                    b"" if version is None else b', "version": %d' % version,
+                    b', "diagnostics": ',
+                    encoded,
+                    b"}}",
+                )
+            )
+            conn.queue_body(body)
+            self._sent[uri] = (digest, now)
+        self.published += len(due)
+        return len(due)
+
+    def timeout(self) -> Optional[float]:
+        """ return seconds until the next notification is due, or None if nothing
+        waits. """
+        if not self._pending:
+            return None
+        now = self.clock()
+        timeout = self.interval
+        for uri in self._pending:
+            sent = self._sent.get(uri)
+            if sent is None:
+                return 0.0
+            timeout = min(timeout, sent[1] + self.interval - now)
+        return max(timeout, 0.0)
+
+    def forget(self, uri: str) -> None:
+        """ drop state of document, like when it's closed. """
+        self._sent.pop(uri, None)
+        self._pending.pop(uri, None)
+
+    def data_to_send(self) -> List[bytes]:
+        """ Fetch and clear the buffers of notifications.  See
+        `Connection.data_to_send`. """
+        return self.rpc.data_to_send()
+
+    def __len__(self) -> int:
+        """ return the number of documents whose diagnostics are not sent. """
+        return len(self._pending)
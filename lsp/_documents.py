@@ -0,0 +1,156 @@
+""" Text documents which are synchronized by the client.
+
+DocumentStore applies `textDocument/didOpen`, `didChange` and `didClose`
+notifications to Rope backed documents, so servers don't need to keep document
+strings themselves.  Range changes cost O(log n), and documents keep snapshots of
+recent versions, which share most of their text with each other.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+from ._jsonrpc import Notification, _MessageEvent
+from ._rope import Rope
+from ._scheduler import DID_OPEN, DID_CHANGE, DID_CLOSE
+
+__all__ = ["TextDocument", "DocumentStore"]
+
+
+class TextDocument:
+    """ A text document, whose text is stored in Rope.
+
+    Args:
+        uri (str): uri of document.
+        text (str): text of document.
+        version (None or int): version of document.
+        language_id (None or str): language id of document.
+        max_snapshots (int): how many versions are kept, including current one.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        text: str,
+        version: Optional[int] = None,
+        language_id: Optional[str] = None,
+        max_snapshots: int = 16,
+    ):
+        self.uri = uri
+        self.language_id = language_id
+        self.version = version
+        self.rope = Rope(text)
+        self.max_snapshots = max_snapshots
+        # version -> rope of that version, the oldest comes first.
+        self.snapshots: "OrderedDict[Optional[int], Rope]" = OrderedDict()
+        self._save_snapshot()
+
+    @property
+    def text(self) -> str:
+        """ the whole text of current version. """
+        return str(self.rope)
+
+    def snapshot(self, version: Optional[int]) -> Rope:
+        """ return text of the given version.
+
+        Raises:
+            KeyError - when the version is unknown, or it's too old.
+        """
+        return self.snapshots[version]
+
+    def apply_changes(self, changes: Any, version: Optional[int] = None) -> None:
+        """ Apply `contentChanges` of didChange notification in order.
+
+        Args:
+            changes (List[Dict]): the content changes, a change with `range`
+                replaces text of range, and other changes replace the whole text.
+            version (None or int): the version after changes.
+        """
+        rope = self.rope
+        for change in changes:
+            change_range = change.get("range")
+            if change_range is None:
+                rope = Rope(change["text"])
+                continue
+            start, end = change_range["start"], change_range["end"]
+            start_offset = rope.offset_at(start["line"], start["character"])
+            end_offset = rope.offset_at(end["line"], end["character"])
+            end_offset = max(start_offset, end_offset)
+            rope = rope.replace(start_offset, end_offset, change["text"])
+        self.rope = rope
+        self.version = version
+        self._save_snapshot()
+
+    def _save_snapshot(self) -> None:
+        self.snapshots.pop(self.version, None)
+        self.snapshots[self.version] = self.rope
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+
+    def __repr__(self) -> str:
+        return f"<TextDocument {self.uri!r} version={self.version}>"
+
+
+class DocumentStore:
+    """ Keep text documents which are opened by the client.
+
+    Pass it to RequestScheduler, then text synchronization notifications are
+    applied when they're taken out of scheduler, before their handlers run.  Or
+    call `handle` with events from any connection.
+
+    Args:
+        max_snapshots (int): how many versions are kept for each document.
+    """
+
+    def __init__(self, max_snapshots: int = 16):
+        self.max_snapshots = max_snapshots
+        self.documents: Dict[str, TextDocument] = {}
+
+    def handle(self, event: _MessageEvent) -> bool:
+        """ Apply a text synchronization notification.
+
+        Args:
+            event (_MessageEvent): the message event.
+        Returns:
+            True if the event is applied.  didChange of documents which are not
+            opened is ignored.
+        """
+        if event.__class__ is not Notification:
+            return False
+        method = event["method"]
+        if method == DID_CHANGE:
+            params = event["params"]
+            document = self.documents.get(params["textDocument"]["uri"])
+            if document is None:
+                return False
+            document.apply_changes(
+                params["contentChanges"], params["textDocument"].get("version")
+            )
+        elif method == DID_OPEN:
+            item = event["params"]["textDocument"]
+            self.documents[item["uri"]] = TextDocument(
+                item["uri"],
+                item["text"],
+                item.get("version"),
+                item.get("languageId"),
+                self.max_snapshots,
+            )
+        elif method == DID_CLOSE:
+            self.documents.pop(event["params"]["textDocument"]["uri"], None)
+        else:
+            return False
+        return True
+
+    def get(self, uri: str) -> Optional[TextDocument]:
+        return self.documents.get(uri)
+
+    def __getitem__(self, uri: str) -> TextDocument:
+        return self.documents[uri]
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self.documents
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
@@ -1,3 +1,6 @@
+from typing import Any
+
+
 class LspProtocolError(BaseException):
     """ exception for lsp protocol error.  Mainly contains the following
     errors:
@@ -7,3 +10,25 @@ class LspProtocolError(BaseException):
     """
 
     pass
+
+
+class ResponseError(Exception):
+    """ exception for JSON-RPC error response.  Request handlers can raise it to
+    answer the request with an error, and it's raised when other side answers our
+    request with an error.
+
+    Args:
+        code (int): error code, see `ErrorCodes`.
+        message (str): error message.
+        data: additional information about the error.
+    """
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def __reduce__(self) -> Any:
+        # keep data when it's pickled, like sent back from a process pool.
+        return self.__class__, (self.code, self.message, self.data)
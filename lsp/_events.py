@@ -4,10 +4,14 @@ We can initialize EventClass by this way:
 event = RequestSent({'Content-Length': 90})
 """
 
+import keyword
+import re
 import warnings
 import json
 from typing import Set, List, Tuple, Dict, Any, Optional
 
+from ._frame import DEFAULT_CONTENT_TYPE, encode_header
+
 
 __all__ = [
     # Mainly used by server
@@ -16,6 +20,11 @@ __all__ = [
     # Mainly userd by client
     "ResponseReceived",
     "RequestSent",
+    # Used in multiplexed connection
+    "MessageReceived",
+    "MessageSent",
+    # Used in whole message mode
+    "MessageComplete",
     # Common
     "DataSent",
     "DataReceived",
@@ -33,6 +42,57 @@ __all__ = [
 # https://stackoverflow.com/questions/100003/what-are-metaclasses-in-python
 # https://docs.python.org/3/reference/datamodel.html#metaclasses
 
+# Indicate that if events created by `EventClass(kwargs)` should validate their
+# fields.  By default it's only enabled in debug mode (python without -O).
+_validate = __debug__
+
+
+def set_validation(enabled: bool) -> None:
+    """ enable or disable fields validation when creating events from dict.
+
+    Args:
+        enabled (bool): True to validate required fields and too much fields.
+    """
+    global _validate
+    _validate = enabled
+
+
+def _slot_name(field: str) -> str:
+    """ convert field name into a valid attribute name which can be used in
+    __slots__, like 'Content-Length' -> 'Content_Length'. """
+    name = re.sub(r"\W", "_", field)
+    if not name.isidentifier() or keyword.iskeyword(name):
+        name = "_" + name
+    return name
+
+
+def _make_constructor(cls: type) -> Any:
+    """ generate the positional fast constructor of event class.  Required fields
+    come first in sorted order, then optional fields in the order of _defaults.
+    The class can define `_positional` to use another order. """
+    order = getattr(cls, "_positional", None)
+    defaults = dict(cls._defaults)  # type: ignore
+    if order is None or set(order) != cls._fields:  # type: ignore
+        order = sorted(cls._required) + [  # type: ignore
+            field for field, _ in cls._defaults  # type: ignore
+        ]
+    namespace: Dict[str, Any] = {"_new": object.__new__}
+    args, body = [], []
+    for index, field in enumerate(order):
+        if field in defaults:
+            namespace[f"_d{index}"] = defaults[field]
+            args.append(f"a{index}=_d{index}")
+        else:
+            args.append(f"a{index}")
+        body.append(f"    self.{cls._slot_names[field]} = a{index}\n")  # type: ignore
+    source = (
+        f"def make(cls, {', '.join(args)}):\n"
+        "    self = _new(cls)\n" + "".join(body) + "    return self\n"
+    )
+    exec(source, namespace)
+    return classmethod(namespace["make"])
+
+
 # NOTE: because it's just the helper implementation of event class definition
 # so we needn't test for it.
 class _EventBaseMeta(type):  # pragma: no cover
@@ -40,13 +100,33 @@ class _EventBaseMeta(type):  # pragma: no cover
 
     When a class using this metaclass, the '_required' fields will be
     auto-generated.  And it required class should have '_fields' attribute.
+
+    The created class is slotted, every field is saved in a slot named by
+    `_slot_name(field)`, and the class gets a positional fast constructor `make`,
+    which doesn't validate fields.
     """
 
+    _fields: Set[str]
+
     def __new__(cls, cls_name: str, bases: Tuple, attrs: Dict) -> type:
         if bases is None:
             assert (
                 "_fields" in attrs
             ), "The new creating class must contains '_fields' attribute"
+        # code is used by compiled state machine, see `_CODED_EVENTS`.  It's not
+        # inherited, so subclass of a coded event is still unknown to state machine.
+        attrs.setdefault("_code", 0)
+        if "__slots__" not in attrs:
+            fields = attrs.get("_fields")
+            if fields is None:
+                fields = next((base._fields for base in bases), set())
+            slotted: Set[str] = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    slotted.update(getattr(klass, "__slots__", ()))
+            attrs["__slots__"] = tuple(
+                sorted({_slot_name(field) for field in fields} - slotted)
+            )
         return super(_EventBaseMeta, cls).__new__(cls, cls_name, bases, attrs)
 
     def __init__(cls, cls_name, bases, attrs):  # type: ignore
@@ -63,6 +143,8 @@ class _EventBaseMeta(type):  # pragma: no cover
             )
 
         cls._required = cls._fields - optional_fields
+        cls._slot_names = {field: _slot_name(field) for field in cls._fields}
+        cls.make = _make_constructor(cls)
 
 
 class EventBase(metaclass=_EventBaseMeta):
@@ -83,30 +165,49 @@ class EventBase(metaclass=_EventBaseMeta):
             _defaults = [("field1", "go")]
 
         After the class creation, the value of SendHeader._required is {"field2"}
+
+        Events can also be created by positional fast constructor, which skips
+        validation: SendHeader.make("value2", "go")
     """
 
+    __slots__ = ()
+    _code = 0
     _fields: Set[str] = set()
     _defaults: List[Tuple[str, Any]] = []
+    _slot_names: Dict[str, str] = {}
 
     def __init__(self, kwargs: Optional[Dict] = None):  # type: ignore
         if kwargs is None:
             return
-        keys = set(kwargs.keys())
-        missing_required = self.__class__._required - keys
-        # check for fields
-        if missing_required:
-            raise ValueError(f"Missing required fields: {missing_required}")
-        too_much_fields = keys - self._fields
-        if too_much_fields:
-            warnings.warn(
-                f"There are too much fields: {too_much_fields}, I will ignore them."
-            )
-
-        self.__dict__.update(self._defaults)
-        self.__dict__.update(kwargs)
+        slot_names = self._slot_names
+        if _validate:
+            keys = set(kwargs.keys())
+            missing_required = self.__class__._required - keys
+            # check for fields
+            if missing_required:
+                raise ValueError(f"Missing required fields: {missing_required}")
+            too_much_fields = keys - self._fields
+            if too_much_fields:
+                warnings.warn(
+                    f"There are too much fields: {too_much_fields}, I will ignore them."
+                )
+
+        for field, value in self._defaults:
+            setattr(self, slot_names[field], value)
+        for field, value in kwargs.items():
+            if field in slot_names:
+                setattr(self, slot_names[field], value)
+
+    def __getattr__(self, key: str) -> Any:
+        # only called when normal lookup fails, so we can access fields which are
+        # not valid attribute names, like getattr(event, "Content-Length").
+        slot = self._slot_names.get(key)
+        if slot is None or slot == key:
+            raise AttributeError(key)
+        return getattr(self, slot)
 
     def __getitem__(self, key: str) -> Any:
-        return getattr(self, key)
+        return getattr(self, self._slot_names.get(key, key))
 
     def to_data(self, encoding: str = "ascii") -> bytes:
         """ convert event into bytes.
@@ -125,7 +226,7 @@ class DataEvent(EventBase):
     _fields = {"data"}
 
     def to_data(self, encoding: str = "utf-8") -> bytes:
-        if isinstance(self["data"], (bytes, bytearray)):
+        if isinstance(self["data"], (bytes, bytearray, memoryview)):
             data = bytes(self["data"])
         elif isinstance(self["data"], str):
             data = self["data"].encode(encoding)
@@ -150,19 +251,12 @@ class _HeaderEvent(EventBase):
     """ Fired when header is sent. """
 
     _fields = {"Content-Length", "Content-Type"}
-    _defaults = [("Content-Type", "application/vscode-jsonrpc; charset=utf-8")]
+    _defaults = [("Content-Type", DEFAULT_CONTENT_TYPE)]
 
     def to_data(self, encoding: str = "ascii") -> bytes:
-        row_spliter = "\r\n"
-        rows = []
-        for field in self._fields:
-            rows.append(f"{field}: {self[field]}")
-        # because the splitter between header part and
-        # data part is \r\n, we need to add two \r\n
-        rows.append("")
-        rows.append("")
-        # The header is encoded in ascii, by the definition of lsp
-        return row_spliter.join(rows).encode("ascii")
+        # The header is encoded in ascii, by the definition of lsp, and fields are
+        # always in the order of Content-Length, Content-Type.
+        return encode_header(self["Content-Length"], self["Content-Type"])
 
 
 class RequestReceived(_HeaderEvent):
@@ -189,6 +283,19 @@ class ResponseSent(_HeaderEvent):
     pass
 
 
+class MessageReceived(_HeaderEvent):
+    """ Fired when we get message header in multiplexed connection.  Both sides can
+    send requests and responses there, so we can't tell which it is from header. """
+
+    pass
+
+
+class MessageSent(_HeaderEvent):
+    """ Fired when message header is sent in multiplexed connection. """
+
+    pass
+
+
 class Close(EventBase):
     """ Fired when we need to close connection. """
 
@@ -201,3 +308,31 @@ class MessageEnd(EventBase):
 
     def to_data(self, encoding: str = "ascii") -> bytes:
         return b""
+
+
+class MessageComplete(EventBase):
+    """ Fired in whole message mode when a message is received completely, instead
+    of header event, DataReceived events and MessageEnd.  `header` is a dict, and
+    `data` is the body, which is bytes, or memoryview in zero_copy mode. """
+
+    _fields = {"header", "data"}
+    _positional = ("header", "data")
+
+
+# Events which take part in connection state machines.  They're tagged with integer
+# codes, so a state transition can be an array lookup.  Code 0 is reserved for other
+# events.
+_CODED_EVENTS = (
+    RequestSent,
+    RequestReceived,
+    ResponseSent,
+    ResponseReceived,
+    MessageSent,
+    MessageReceived,
+    DataSent,
+    DataReceived,
+    MessageEnd,
+    Close,
+)
+for _code, _event_cls in enumerate(_CODED_EVENTS, 1):
+    _event_cls._code = _code
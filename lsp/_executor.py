@@ -0,0 +1,183 @@
+""" Run handlers in concurrent.futures executors.
+
+PoolDispatcher takes messages out of RequestScheduler, and runs their handlers in
+a thread pool or process pool.  The connection is only touched by the I/O thread,
+which calls `dispatch` and `poll`.  Responses are written back by id as soon as
+their handlers complete, so a slow request doesn't hold back the others.
+"""
+
+import queue
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Collection, Deque, Dict, Mapping, Optional
+
+from ._errors import ResponseError
+from ._jsonrpc import ErrorCodes, Request, _MessageEvent
+from ._scheduler import RequestScheduler, SYNC_METHODS
+
+__all__ = ["PoolDispatcher"]
+
+# Handler receives params of message, and returns result.  Handlers which run in
+# process pool should be picklable, like module level functions.
+PoolHandler = Callable[[Any], Any]
+
+
+class PoolDispatcher:
+    """ Dispatch messages of scheduler to handlers, which run in an executor.
+
+    Handlers of methods in `ordered` are order-sensitive, they are serialized: each
+    of them starts after the previous one completes, in the order they're taken out
+    of scheduler.  Other handlers run concurrently.
+
+    Request handlers can raise `ResponseError` to answer the request with an error,
+    other exceptions are answered with InternalError.  Exceptions of notification
+    handlers are ignored.
+
+    Args:
+        scheduler (RequestScheduler): the scheduler we take messages from, and send
+            responses to.
+        handlers (Mapping[str, PoolHandler]): maps method name to it's handler.
+        executor (concurrent.futures.Executor): the executor which runs handlers,
+            like ThreadPoolExecutor or ProcessPoolExecutor.
+        ordered (None or Collection[str]): methods whose handlers are serialized,
+            default is `SYNC_METHODS`.
+        wakeup (None or Callable[[], None]): called in worker threads when a handler
+            completes, it can wake up the I/O thread to call `poll`, like
+            `loop.call_soon_threadsafe` or writing to a socketpair.
+    """
+
+    def __init__(
+        self,
+        scheduler: RequestScheduler,
+        handlers: Mapping[str, PoolHandler],
+        executor: Executor,
+        ordered: Optional[Collection[str]] = None,
+        wakeup: Optional[Callable[[], None]] = None,
+    ):
+        self.scheduler = scheduler
+        self.handlers = handlers
+        self.executor = executor
+        self.ordered = SYNC_METHODS if ordered is None else frozenset(ordered)
+        self.wakeup = wakeup
+        # futures of running handlers -> their messages.
+        self.running: Dict[Future, _MessageEvent] = {}
+        # request id -> future, to cancel handlers which are not started.
+        self._requests: Dict[Any, Future] = {}
+        # order-sensitive messages which wait for the previous one.
+        self._ordered: Deque[_MessageEvent] = deque()
+        self._ordered_busy = False
+        # completed futures, they're put by worker threads.
+        self._done: "queue.SimpleQueue[Future]" = queue.SimpleQueue()
+
+    def dispatch(self) -> int:
+        """ Submit all messages which are queued in scheduler, and cancel handlers
+        of cancelled requests which are not started yet.
+
+        Returns:
+            The number of messages taken out of scheduler.
+        """
+        for request_id in self.scheduler.cancelled:
+            future = self._requests.get(request_id)
+            if future is not None:
+                future.cancel()
+        count = 0
+        message = self.scheduler.next_message()
+        while message is not None:
+            count += 1
+            if message["method"] in self.ordered:
+                self._ordered.append(message)
+            else:
+                self._submit(message)
+            message = self.scheduler.next_message()
+        self._submit_ordered()
+        return count
+
+    def poll(self, timeout: Optional[float] = 0) -> int:
+        """ Send responses of completed handlers.  Responses are saved into outbound
+        queue, which can be fetched by `scheduler.data_to_send`.
+
+        Args:
+            timeout (None or float): how many seconds to wait for the first
+                completed handler, None means waiting until one completes.
+        Returns:
+            The number of completed handlers.
+        """
+        if not self.running:
+            return 0
+        try:
+            if timeout == 0:
+                future = self._done.get_nowait()
+            else:
+                future = self._done.get(timeout=timeout)
+        except queue.Empty:
+            return 0
+        count = 0
+        while True:
+            count += 1
+            self._finish(future)
+            try:
+                future = self._done.get_nowait()
+            except queue.Empty:
+                break
+        self._submit_ordered()
+        return count
+
+    def __len__(self) -> int:
+        """ return the number of messages which are running or waiting. """
+        return len(self.running) + len(self._ordered)
+
+    def _submit(self, message: _MessageEvent) -> bool:
+        """ submit handler of message, return False if it's not submitted. """
+        is_request = message.__class__ is Request
+        handler = self.handlers.get(message["method"])
+        if not is_request:
+            if handler is None:
+                return False
+        elif handler is None:
+            self.scheduler.respond_error(
+                message["id"],
+                ErrorCodes.MethodNotFound,
+                f"Method not found: {message['method']}",
+            )
+            return False
+        elif self.scheduler.is_cancelled(message["id"]):
+            # it's cancelled while waiting for order-sensitive handlers.
+            self.scheduler.respond(message["id"], None)
+            return False
+        future = self.executor.submit(handler, message["params"])
+        self.running[future] = message
+        if is_request:
+            self._requests[message["id"]] = future
+        future.add_done_callback(self._on_done)
+        return True
+
+    def _submit_ordered(self) -> None:
+        while not self._ordered_busy and self._ordered:
+            self._ordered_busy = self._submit(self._ordered.popleft())
+
+    def _on_done(self, future: Future) -> None:
+        # called in worker threads, don't touch the connection here.
+        self._done.put(future)
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def _finish(self, future: Future) -> None:
+        message = self.running.pop(future)
+        if message["method"] in self.ordered:
+            self._ordered_busy = False
+        if message.__class__ is not Request:
+            return
+        request_id = message["id"]
+        del self._requests[request_id]
+        scheduler = self.scheduler
+        if future.cancelled():
+            # the scheduler answers it with RequestCancelled error.
+            scheduler.respond(request_id, None)
+            return
+        error = future.exception()
+        if error is None:
+            scheduler.respond(request_id, future.result())
+        elif isinstance(error, ResponseError):
+            scheduler.respond_error(request_id, error.code, error.message, error.data)
+        else:
+            scheduler.respond_error(request_id, ErrorCodes.InternalError, str(error))
@@ -0,0 +1,58 @@
+""" Frame encoder which writes message header from precomputed byte templates. """
+
+from typing import Optional, Union
+
+__all__ = ["FrameEncoder", "DEFAULT_CONTENT_TYPE"]
+
+# The Content-Type defined by language server protocol, which is also the default
+# value when header doesn't contain Content-Type.
+DEFAULT_CONTENT_TYPE = "application/vscode-jsonrpc; charset=utf-8"
+
+
+def _make_template(content_type: Optional[str]) -> bytes:
+    if content_type is None:
+        return b"Content-Length: %d\r\n\r\n"
+    return (
+        b"Content-Length: %d\r\nContent-Type: "
+        + content_type.encode("ascii").replace(b"%", b"%%")
+        + b"\r\n\r\n"
+    )
+
+
+class FrameEncoder:
+    """ Encode message frames.  The header is formatted from a precomputed template,
+    so only `Content-Length` needs to be converted to ascii for every message.
+
+    Args:
+        content_type (None or str): the Content-Type we write in header.  When it's
+            None, the Content-Type line is omitted, and the other side should use
+            the default value.
+    """
+
+    def __init__(self, content_type: Optional[str] = DEFAULT_CONTENT_TYPE):
+        self.content_type = content_type
+        self._template = _make_template(content_type)
+
+    def encode_header(self, length: int) -> bytes:
+        """ encode header of a message.
+
+        Args:
+            length (int): the length of body in bytes.
+        Returns:
+            header bytes, which ends with "\\r\\n\\r\\n".
+        """
+        return self._template % length
+
+    def encode(self, body: bytes) -> bytes:
+        """ encode a whole message frame, contains header and body. """
+        return self._template % len(body) + body
+
+
+_default_encoder = FrameEncoder()
+
+
+def encode_header(length: Union[int, str], content_type: Optional[str]) -> bytes:
+    """ encode header with given fields, the default Content-Type goes fast path. """
+    if content_type == DEFAULT_CONTENT_TYPE:
+        return _default_encoder.encode_header(int(length))
+    return _make_template(content_type) % int(length)
@@ -0,0 +1,66 @@
+""" Helpers which write buffers from `Connection.data_to_send` with vectored io.
+
+Connection itself never does io, these helpers are only for the transports which
+write by blocking sockets or file descriptors.
+"""
+
+import functools
+import os
+import socket
+from typing import Callable, List, Sequence, Union
+
+__all__ = ["write_vectored"]
+
+
+def _iov_max() -> int:
+    try:
+        return os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        return 1024
+
+
+# max number of buffers can be written in one syscall.
+IOV_MAX = _iov_max()
+
+
+def _advance(buffers: List[memoryview], written: int) -> List[memoryview]:
+    """ drop the written bytes from the front of buffers. """
+    index = 0
+    while index < len(buffers) and written >= len(buffers[index]):
+        written -= len(buffers[index])
+        index += 1
+    remain = buffers[index:]
+    if written:
+        remain[0] = remain[0][written:]
+    return remain
+
+
+def write_vectored(target: Union[socket.socket, int], buffers: Sequence[bytes]) -> int:
+    """ Write all buffers to a blocking socket or file descriptor.  Buffers are
+    gathered by `socket.sendmsg` or `os.writev`, so many frames go out in one
+    syscall without concatenating them.
+
+    Args:
+        target (socket or int): the socket or file descriptor we write to.
+        buffers (Sequence[bytes]): buffers we need to write, in order.
+    Returns:
+        The number of bytes written.
+    """
+    pending = [memoryview(buffer) for buffer in buffers if len(buffer)]
+    total = 0
+    write: Callable[[List[memoryview]], int]
+    if isinstance(target, socket.socket):
+        if not hasattr(target, "sendmsg"):  # pragma: no cover
+            # sendmsg is not available on windows.
+            data = b"".join(pending)
+            target.sendall(data)
+            return len(data)
+        write = target.sendmsg
+    else:
+        write = functools.partial(os.writev, target)
+
+    while pending:
+        written = write(pending[:IOV_MAX])
+        total += written
+        pending = _advance(pending, written)
+    return total
@@ -0,0 +1,408 @@
+""" JSON-RPC 2.0 message layer on top of multiplexed Connection.
+
+The layer parses complete messages out of connection, and fires one of Request,
+Notification, Response, ErrorResponse events for each of them.  Responses are
+correlated with requests we sent by `id`.
+"""
+
+import json
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from ._codec import Codec
+from ._connection import Connection, NEED_DATA, SentinalType
+from ._events import EventBase
+from ._errors import LspProtocolError
+from ._lazy import LazyMessage
+
+__all__ = [
+    "JsonRpcConnection",
+    "ErrorCodes",
+    "Request",
+    "Notification",
+    "Response",
+    "ErrorResponse",
+]
+
+# Type of JSON-RPC request id.
+RequestId = Union[int, str]
+
+
+class ErrorCodes(IntEnum):
+    """ Error codes defined by JSON-RPC and language server protocol. """
+
+    ParseError = -32700
+    InvalidRequest = -32600
+    MethodNotFound = -32601
+    InvalidParams = -32602
+    InternalError = -32603
+    ServerNotInitialized = -32002
+    UnknownErrorCode = -32001
+    RequestCancelled = -32800
+    ContentModified = -32801
+
+
+class _MessageEvent(EventBase):
+    """ Base class for JSON-RPC message events.  When they're created from
+    LazyMessage, `params` and `result` are decoded on first access by
+    `event["params"]` or `event["result"]`. """
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self._slot_names.get(key, key)
+        value = getattr(self, slot)
+        if value.__class__ is LazyMessage:
+            value = value[key]
+            setattr(self, slot, value)
+        return value
+
+    def to_message(self) -> Dict:
+        """ convert event into JSON-RPC message object. """
+        raise NotImplementedError()
+
+    def to_data(self, encoding: str = "utf-8") -> bytes:
+        return json.dumps(self.to_message()).encode(encoding)
+
+
+class Request(_MessageEvent):
+    """ Fired when we get a request, which needs response from us. """
+
+    _fields = {"id", "method", "params"}
+    _defaults = [("params", None)]
+
+    def to_message(self) -> Dict:
+        message = {"jsonrpc": "2.0", "id": self["id"], "method": self["method"]}
+        if self["params"] is not None:
+            message["params"] = self["params"]
+        return message
+
+
+class Notification(_MessageEvent):
+    """ Fired when we get a notification. """
+
+    _fields = {"method", "params"}
+    _defaults = [("params", None)]
+
+    def to_message(self) -> Dict:
+        message = {"jsonrpc": "2.0", "method": self["method"]}
+        if self["params"] is not None:
+            message["params"] = self["params"]
+        return message
+
+
+class Response(_MessageEvent):
+    """ Fired when we get a successful response of our request.  The `method` field
+    is the method of our request. """
+
+    _fields = {"id", "result", "method"}
+    _defaults = [("method", None)]
+
+    def to_message(self) -> Dict:
+        return {"jsonrpc": "2.0", "id": self["id"], "result": self["result"]}
+
+
+class ErrorResponse(_MessageEvent):
+    """ Fired when we get an error response.  The `error` field is a dict contains
+    `code`, `message` and optional `data`.  The `id` can be None when other side
+    fails to parse our request. """
+
+    _fields = {"id", "error", "method"}
+    _defaults = [("method", None)]
+    _positional = ("id", "error", "method")
+
+    def to_message(self) -> Dict:
+        return {"jsonrpc": "2.0", "id": self["id"], "error": self["error"]}
+
+
+class JsonRpcConnection:
+    """ JSON-RPC 2.0 connection over multiplexed lsp Connection.
+
+    It keeps two outstanding request tables keyed by `id`: requests we sent which
+    are waiting for response, and requests we received which we haven't answered.
+
+    Args:
+        role (str): represent our role.  Which can be 'client' or 'server'
+        zero_copy (bool): receive body in zero copy mode, see `Connection`.
+        codec (None or Codec): the codec to convert between json object and bytes.
+        spill_threshold (None or int), max_message_size (None or int): limits of
+            incoming body size, see `Connection`.
+        lazy (bool): decode `params` and `result` of incoming messages on first
+            access, see `LazyMessage`.  Messages can be routed or dropped by `id`
+            and `method` without decoding them.
+    """
+
+    def __init__(  # type: ignore
+        self,
+        role: str,
+        zero_copy: bool = False,
+        codec: Optional[Codec] = None,
+        spill_threshold: Optional[int] = None,
+        max_message_size: Optional[int] = None,
+        lazy: bool = False,
+    ):
+        self.lazy = lazy
+        self.conn = Connection(
+            role,
+            zero_copy=zero_copy,
+            multiplexed=True,
+            codec=codec,
+            spill_threshold=spill_threshold,
+            max_message_size=max_message_size,
+        )
+        # request id -> method, for requests we sent.
+        self.outgoing: Dict[RequestId, str] = {}
+        # request id -> method, for requests we received.
+        self.incoming: Dict[RequestId, str] = {}
+        self._next_id = 0
+
+    def receive(self, data: bytes) -> None:
+        """ Receive data and feed it to our incoming buffer.
+
+        Args:
+            data (bytes): the data we received.
+        """
+        self.conn.receive(data)
+
+    def next_event(self) -> Union[SentinalType, _MessageEvent]:
+        """ Parse the next message out of incoming buffer.
+
+        Returns:
+            One of Request, Notification, Response, ErrorResponse event.  Or
+            NEED_DATA, which indicates that we need to receive more data.
+
+        Raises:
+            LspProtocolError - when we get invalid message, or a response which
+                doesn't correspond to our request.
+        """
+        obj = self._next_object()
+        if obj is NEED_DATA:
+            return NEED_DATA
+        return self._to_event(obj)
+
+    def _next_object(self) -> Any:
+        """ decode the next complete message, or return NEED_DATA. """
+        conn = self.conn
+        message = conn._next_message()
+        if message is None:
+            return NEED_DATA
+        try:
+            if self.lazy:
+                # the body should be kept until lazy members are decoded.
+                return LazyMessage(conn.in_buffer.take_body(), conn.codec)
+            return conn.codec.decode(message[1])
+        except ValueError as e:
+            raise LspProtocolError(f"Invalid JSON in message body: {e}") from e
+
+    def next_events(self) -> List[_MessageEvent]:
+        """ Parse all complete messages out of incoming buffer.
+
+        Returns:
+            A list of Request, Notification, Response, ErrorResponse events, it's
+            empty when we need to receive more data.
+
+        Raises:
+            LspProtocolError - when we get invalid message, or a response which
+                doesn't correspond to our request.
+        """
+        events: List[_MessageEvent] = []
+        next_object = self._next_object
+        to_event = self._to_event
+        while True:
+            obj = next_object()
+            if obj is NEED_DATA:
+                return events
+            events.append(to_event(obj))
+
+    def receive_and_drain(self, data: bytes) -> List[_MessageEvent]:
+        """ Receive data, and return all messages which are ready.  It's the same
+        as `receive(data)` followed by `next_events()`.
+
+        Args:
+            data (bytes): the data we received.
+        Returns:
+            A list of message events, it's empty when we need to receive more data.
+        """
+        self.conn.receive(data)
+        return self.next_events()
+
+    def _to_event(self, obj: Any) -> _MessageEvent:
+        get: Callable[..., Any]
+        has: Callable[[str], bool]
+        if obj.__class__ is LazyMessage:
+            # keep the lazy members undecoded, and route by the members which are
+            # scanned.  Members which may follow the lazy member are searched only
+            # when neither method nor id is scanned.
+            get, has = obj.deferred, obj.scanned
+            if not (has("method") or has("id")):
+                has = obj.__contains__
+        elif isinstance(obj, dict):
+            get, has = obj.get, obj.__contains__
+        else:
+            raise LspProtocolError(f"JSON-RPC message should be an object: {obj!r}")
+        if has("method"):
+            method, params = obj["method"], get("params")
+            if has("id"):
+                self.incoming[obj["id"]] = method
+                return Request.make(obj["id"], method, params)
+            return Notification.make(method, params)
+        if not has("id"):
+            raise LspProtocolError(f"Invalid JSON-RPC message: {obj!r}")
+        request_id = obj["id"]
+        if has("error"):
+            method = self.outgoing.pop(request_id, None)
+            return ErrorResponse.make(request_id, obj["error"], method)
+        if not has("result"):
+            raise LspProtocolError(f"Invalid JSON-RPC message: {obj!r}")
+        try:
+            method = self.outgoing.pop(request_id)
+        except KeyError:
+            raise LspProtocolError(
+                f"Receive response of unknown request id: {request_id!r}"
+            ) from None
+        return Response.make(request_id, get("result"), method)
+
+    def data_to_send(self) -> List[bytes]:
+        """ Fetch and clear the buffers of messages which are sent with
+        `queue=True`.  See `Connection.data_to_send`. """
+        return self.conn.data_to_send()
+
+    def send_request(
+        self,
+        method: str,
+        params: Optional[Union[Dict, List]] = None,
+        *,
+        queue: bool = False,
+    ) -> Tuple[RequestId, bytes]:
+        """ Make a request, and remember it until the response is received.
+
+        Args:
+            method (str): the method name of request.
+            params (None, dict or list): parameters of request.
+            queue (bool): save the message into outbound queue instead of returning
+                it, then it can be fetched by `data_to_send`.
+        Returns:
+            A tuple contains (request id, bytes we can send to other side).  The
+            bytes is empty when the message is queued.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        message = Request.make(request_id, method, params)
+        data = self._send(message.to_message(), queue)
+        self.outgoing[request_id] = method
+        return request_id, data
+
+    def send_notification(
+        self,
+        method: str,
+        params: Optional[Union[Dict, List]] = None,
+        *,
+        queue: bool = False,
+    ) -> bytes:
+        """ Make a notification.
+
+        Args:
+            method (str): the method name of notification.
+            params (None, dict or list): parameters of notification.
+            queue (bool): save the message into outbound queue instead of returning
+                it, then it can be fetched by `data_to_send`.
+        Returns:
+            Bytes that we can send to other side, or empty bytes when it's queued.
+        """
+        message = Notification.make(method, params)
+        return self._send(message.to_message(), queue)
+
+    def send_response(
+        self, request_id: RequestId, result: Any, *, queue: bool = False
+    ) -> bytes:
+        """ Answer the request we received.
+
+        Args:
+            request_id (int or str): id of request.
+            result: the result of request, which can be dumps to json.
+            queue (bool): save the message into outbound queue instead of returning
+                it, then it can be fetched by `data_to_send`.
+        Returns:
+            Bytes that we can send to other side, or empty bytes when it's queued.
+        Raises:
+            LspProtocolError - when we don't receive the request, or it has been
+                answered.
+        """
+        self._pop_incoming(request_id)
+        return self._send({"jsonrpc": "2.0", "id": request_id, "result": result}, queue)
+
+    def send_encoded_response(
+        self, request_id: RequestId, result: bytes, *, queue: bool = False
+    ) -> bytes:
+        """ Answer the request we received with a result which is already encoded by
+        codec of the connection, like results which are cached.
+
+        Args:
+            request_id (int or str): id of request.
+            result (bytes): utf-8 json bytes of the result.
+            queue (bool): save the message into outbound queue instead of returning
+                it, then it can be fetched by `data_to_send`.
+        Returns:
+            Bytes that we can send to other side, or empty bytes when it's queued.
+        Raises:
+            LspProtocolError - when we don't receive the request, or it has been
+                answered.
+        """
+        self._pop_incoming(request_id)
+        body = b"".join(
+            (
+                b'{"jsonrpc": "2.0", "id": ',
+                self.conn.codec.encode(request_id),
+                b', "result": ',
+                result,
+                b"}",
+            )
+        )
+        if queue:
+            self.conn.queue_body(body)
+            return b""
+        return self.conn.send_body(body)
+
+    def send_error(
+        self,
+        request_id: Optional[RequestId],
+        code: int,
+        message: str,
+        data: Any = None,
+        *,
+        queue: bool = False,
+    ) -> bytes:
+        """ Answer the request we received with an error.
+
+        Args:
+            request_id (None, int or str): id of request, it can be None when we
+                can't parse the request.
+            code (int): error code, see `ErrorCodes`.
+            message (str): error message.
+            data: additional information about the error.
+            queue (bool): save the message into outbound queue instead of returning
+                it, then it can be fetched by `data_to_send`.
+        Returns:
+            Bytes that we can send to other side, or empty bytes when it's queued.
+        Raises:
+            LspProtocolError - when we don't receive the request, or it has been
+                answered.
+        """
+        if request_id is not None:
+            self._pop_incoming(request_id)
+        error: Dict[str, Any] = {"code": int(code), "message": message}
+        if data is not None:
+            error["data"] = data
+        return self._send({"jsonrpc": "2.0", "id": request_id, "error": error}, queue)
+
+    def _send(self, message: Dict, queue: bool) -> bytes:
+        if queue:
+            self.conn.queue_json(message)
+            return b""
+        return self.conn.send_json(message)
+
+    def _pop_incoming(self, request_id: RequestId) -> str:
+        try:
+            return self.incoming.pop(request_id)
+        except KeyError:
+            raise LspProtocolError(
+                f"There is no outstanding request with id {request_id!r}"
+            ) from None
@@ -0,0 +1,284 @@
+""" Lazy decoding of JSON-RPC messages.
+
+A dispatcher only needs `id` and `method` to route a message, or to drop a stale
+request.  LazyMessage scans the top level members before `params` (or `result`)
+out of the raw body, and decodes the large member only when it's accessed.
+"""
+
+import json
+import re
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+
+from ._codec import Codec, JsonCodec
+
+__all__ = ["LazyMessage"]
+
+# members which are decoded on access.
+LAZY_KEYS = frozenset({"params", "result"})
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_NESTED_TOKEN = re.compile(rb'["{}\[\]]')
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_SCALAR = re.compile(rb"[^,}\]\s]*")
+_SPACES = b" \t\r\n"
+
+_QUOTE, _COLON, _COMMA = ord('"'), ord(":"), ord(",")
+_OPEN_OBJECT, _CLOSE_OBJECT = ord("{"), ord("}")
+_CLOSERS = {ord("{"): ord("}"), ord("["): ord("]")}
+
+BytesLike = Union[bytes, bytearray, memoryview]
+# (key, value start, value end) of a member.
+_Member = Tuple[str, int, int]
+
+_MISSING = object()
+
+
+def _skip_string(body: BytesLike, pos: int) -> int:
+    """ return the end of string which starts at pos. """
+    end = _STRING_BODY.match(body, pos + 1).end()  # type: ignore
+    if end >= len(body) or body[end] != _QUOTE:
+        raise ValueError(f"Unterminated string starting at {pos}.")
+    return end + 1
+
+
+def _skip_value(body: BytesLike, pos: int) -> int:
+    """ return the end of value which starts at pos, without decoding it. """
+    if pos >= len(body):
+        raise ValueError("Expecting value.")
+    first = body[pos]
+    if first == _QUOTE:
+        return _skip_string(body, pos)
+    if first not in _CLOSERS:
+        return _SCALAR.match(body, pos).end()  # type: ignore
+    depth = 0
+    while True:
+        match = _NESTED_TOKEN.search(body, pos)
+        if match is None:
+            raise ValueError("Unbalanced brackets.")
+        pos = match.start()
+        token = body[pos]
+        if token == _QUOTE:
+            pos = _skip_string(body, pos)
+            continue
+        depth += 1 if token in _CLOSERS else -1
+        pos += 1
+        if depth == 0:
+            return pos
+
+
+def _scan_head(
+    body: BytesLike, lazy_keys: FrozenSet[str]
+) -> Tuple[List[_Member], Optional[_Member]]:
+    """ scan top level members of object body, until a member in `lazy_keys` whose
+    value is a container.
+
+    Returns:
+        A tuple contains (members before lazy member, lazy member).  The lazy
+        member is None if there is no such member, or it's not the last member.
+    Raises:
+        ValueError - when body is not a JSON object.
+    """
+    members: List[_Member] = []
+    pos = _WHITESPACE.match(body).end()  # type: ignore
+    if pos == len(body) or body[pos] != _OPEN_OBJECT:
+        raise ValueError("Message body should be a JSON object.")
+    pos = _WHITESPACE.match(body, pos + 1).end()  # type: ignore
+    if pos < len(body) and body[pos] == _CLOSE_OBJECT:
+        return members, None
+    return members, _scan_members(body, pos, lazy_keys, members)
+
+
+def _scan_members(
+    body: BytesLike, pos: int, lazy_keys: FrozenSet[str], members: List[_Member]
+) -> Optional[_Member]:
+    """ scan members from the property name at pos into `members`, until the end of
+    object, or a member in `lazy_keys` whose value is a container.
+
+    Returns:
+        The lazy member, see `_tail_member`.  None if there is no such member.
+    Raises:
+        ValueError - when members are not valid.
+    """
+    while True:
+        if pos >= len(body) or body[pos] != _QUOTE:
+            raise ValueError(f"Expecting property name at {pos}.")
+        end = _skip_string(body, pos)
+        key_bytes = bytes(body[pos:end])
+        if b"\\" in key_bytes:
+            key = json.loads(key_bytes)
+        else:
+            key = str(key_bytes[1:-1], "utf-8")
+        pos = _WHITESPACE.match(body, end).end()  # type: ignore
+        if pos >= len(body) or body[pos] != _COLON:
+            raise ValueError(f"Expecting ':' delimiter at {pos}.")
+        start = _WHITESPACE.match(body, pos + 1).end()  # type: ignore
+        if key in lazy_keys and start < len(body) and body[start] in _CLOSERS:
+            return _tail_member(body, key, start)
+        end = _skip_value(body, start)
+        members.append((key, start, end))
+        next_pos = _next_member(body, end)
+        if next_pos is None:
+            return None
+        pos = next_pos
+
+
+def _next_member(body: BytesLike, end: int) -> Optional[int]:
+    """ return the start of member after the value which ends at end, or None at the
+    end of object. """
+    pos = _WHITESPACE.match(body, end).end()  # type: ignore
+    if pos < len(body) and body[pos] == _COMMA:
+        return _WHITESPACE.match(body, pos + 1).end()  # type: ignore
+    if pos < len(body) and body[pos] == _CLOSE_OBJECT:
+        return None
+    raise ValueError(f"Expecting ',' delimiter at {pos}.")
+
+
+def _tail_member(body: BytesLike, key: str, start: int) -> Optional[_Member]:
+    """ return the member if it's value is the last one in body, it's checked by the
+    closing brackets at the end, so the value isn't scanned. """
+    end = _rstrip(body, len(body))
+    if end == 0 or body[end - 1] != _CLOSE_OBJECT:
+        return None
+    end = _rstrip(body, end - 1)
+    if end <= start or body[end - 1] != _CLOSERS[body[start]]:
+        return None
+    return key, start, end
+
+
+def _rstrip(body: BytesLike, end: int) -> int:
+    """ return the end of body[:end] without trailing whitespace. """
+    while end > 0 and body[end - 1] in _SPACES:
+        end -= 1
+    return end
+
+
+class LazyMessage:
+    """ A JSON-RPC message object whose `params` or `result` is decoded on first
+    access.  Other members are decoded when the message is created.
+
+    If the lazy member is not the last member of body, we can't find members after
+    it without scanning it, so the whole message is decoded instead.  Members after
+    the lazy member which can't be told by the closing brackets are found by
+    skipping the lazy value when they're looked up, the lazy value isn't decoded.
+    `scanned` tells members without looking for them.
+
+    Args:
+        body (bytes-like): body of message.  It should not be changed while the
+            message is alive.
+        codec (None or Codec): the codec to decode values.  If it's None, the
+            stdlib json codec will be used.
+    Raises:
+        ValueError - when body is not a JSON object.
+    """
+
+    __slots__ = ("_body", "_codec", "_fields", "_lazy", "_after")
+
+    def __init__(self, body: BytesLike, codec: Optional[Codec] = None):
+        self._codec = JsonCodec() if codec is None else codec
+        members, lazy = _scan_head(body, LAZY_KEYS)
+        self._body: Optional[BytesLike] = body
+        self._lazy = lazy
+        # keys of members after the lazy member, None if they're not searched.
+        self._after: Optional[List[str]] = None
+        self._fields: Dict[str, Any]
+        if lazy is None:
+            # there is no lazy member, or it's not the last one.
+            self._fields = self._codec.decode(body)
+            self._body = None
+            return
+        decode = self._codec.decode
+        with memoryview(body) as view:
+            self._fields = {key: decode(view[start:end]) for key, start, end in members}
+
+    def _decode(self, start: int, end: int) -> Any:
+        with memoryview(self._body) as view:  # type: ignore
+            return self._codec.decode(view[start:end])
+
+    def _scan_tail(self) -> None:
+        """ find members after the lazy member by skipping the lazy value. """
+        key, start, _ = self._lazy  # type: ignore
+        body = self._body
+        end = _skip_value(body, start)  # type: ignore
+        members: List[_Member] = []
+        pos = _next_member(body, end)  # type: ignore
+        if pos is not None:
+            _scan_members(body, pos, frozenset(), members)  # type: ignore
+        for member_key, member_start, member_end in members:
+            self._fields[member_key] = self._decode(member_start, member_end)
+        self._after = [member[0] for member in members]
+        self._lazy = (key, start, end)
+
+    def _decode_lazy(self) -> None:
+        key, start, end = self._lazy  # type: ignore
+        try:
+            value = self._decode(start, end)
+        except ValueError:
+            if self._after is not None:
+                raise
+            # other members may follow the lazy member, which can't be told by the
+            # closing brackets, find where the lazy value ends then.
+            self._scan_tail()
+            key, start, end = self._lazy  # type: ignore
+            value = self._decode(start, end)
+        fields = self._fields
+        # keep the member order of body.
+        after = [(member, fields.pop(member)) for member in self._after or ()]
+        fields[key] = value
+        fields.update(after)
+        self._lazy = None
+        self._body = None
+
+    def is_decoded(self, key: str) -> bool:
+        """ return False if the member of key is not decoded yet. """
+        return self._lazy is None or self._lazy[0] != key
+
+    def scanned(self, key: str) -> bool:
+        """ return True if the member of key is found, members which may follow the
+        lazy member are not searched, so nothing is decoded or skipped. """
+        return key in self._fields or (self._lazy is not None and self._lazy[0] == key)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._fields.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._lazy is not None:
+            if self._lazy[0] == key:
+                self._decode_lazy()
+            elif self._after is None:
+                # it may follow the lazy member.
+                self._scan_tail()
+        return self._fields[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def deferred(self, key: str, default: Any = None) -> Any:
+        """ like `get`, but return the message itself when the member of key is not
+        decoded yet, then it can be decoded later by `message[key]`. """
+        if self._lazy is not None and self._lazy[0] == key:
+            return self
+        return self._fields.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        if self.scanned(key):
+            return True
+        if self._lazy is None or self._after is not None:
+            return False
+        # other members may follow the lazy member, skip it to find them.
+        self._scan_tail()
+        return key in self._fields
+
+    def __iter__(self) -> Iterator[str]:
+        if self._lazy is not None:
+            self._decode_lazy()
+        return iter(self._fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ return the whole message as a dict, lazy member is decoded. """
+        if self._lazy is not None:
+            self._decode_lazy()
+        return self._fields
+
+    def __repr__(self) -> str:
+        pending = "" if self._lazy is None else f" pending={self._lazy[0]!r}"
+        return f"<LazyMessage {self._fields!r}{pending}>"
@@ -0,0 +1,644 @@
+""" Persistent rope for document text.
+
+Rope keeps text in a balanced binary tree, whose leaves are short strings.  Edits
+split and join the tree, they cost O(log n) and return a new Rope, the old one is
+not changed.  So snapshots of a document share most of their nodes.
+
+Nodes know the number of line breaks, UTF-16 code units and UTF-8 bytes below
+them.  They are maintained by edits, and make conversions between LSP positions,
+code point offsets and byte offsets O(log n) too.  Line breaks are "\\n",
+"\\r\\n" and "\\r" like LSP defines, and a "\\r\\n" is never split between
+leaves, so every leaf counts it's line breaks by itself.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+__all__ = ["Rope"]
+
+# max length of leaf text.
+LEAF_MAX = 1024
+
+# positions_at scans text between offsets which are closer than this.
+_SCAN_MAX = 4096
+
+_LINE_BREAK = re.compile("\r\n?|\n")
+# characters which take two UTF-16 code units.
+_ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+
+# (line, character) of LSP position.
+Position = Tuple[int, int]
+
+
+class _Node:
+    """ A node of rope.  Leaves have `text`, and branches have `left` and `right`,
+    which are never None. """
+
+    __slots__ = (
+        "left",
+        "right",
+        "text",
+        "length",
+        "newlines",
+        "utf16",
+        "utf8",
+        "height",
+        "breaks",
+        "astrals",
+    )
+
+    def __init__(
+        self,
+        left: Optional["_Node"],
+        right: Optional["_Node"],
+        text: Optional[str],
+        length: int,
+        newlines: int,
+        utf16: int,
+        utf8: int,
+        height: int,
+    ):
+        self.left = left
+        self.right = right
+        self.text = text
+        self.length = length
+        self.newlines = newlines
+        self.utf16 = utf16
+        self.utf8 = utf8
+        self.height = height
+        # indexes after line breaks in leaf text, they're found on first use.
+        self.breaks: Optional[List[int]] = None
+        # indexes of characters which take two UTF-16 code units.
+        self.astrals: Optional[List[int]] = None
+
+
+def _utf16_length(text: str) -> int:
+    return len(text) + len(_ASTRAL.findall(text))
+
+
+def _utf8_length(text: str) -> int:
+    return len(text.encode("utf-8", "surrogatepass"))
+
+
+def _count_breaks(text: str, start: int, end: int) -> int:
+    """ return the number of line breaks which end in text[start:end], a "\\r\\n"
+    which is split by end is not counted. """
+    if end < len(text) and text[end] == "\n" and end > start and text[end - 1] == "\r":
+        end -= 1
+    count = text.count("\n", start, end)
+    if text.find("\r", start, end) >= 0:
+        count += text.count("\r", start, end) - text.count("\r\n", start, end)
+    return count
+
+
+def _last_break(text: str, start: int, end: int) -> int:
+    """ return the index after the last line break which ends in text[start:end],
+    or -1 if there is no such line break. """
+    if end < len(text) and text[end] == "\n" and end > start and text[end - 1] == "\r":
+        end -= 1
+    index = text.rfind("\n", start, end)
+    # a "\r" after the last "\n" is not followed by "\n".
+    index = max(index, text.rfind("\r", index + 1 if index >= 0 else start, end))
+    return index + 1 if index >= 0 else -1
+
+
+def _leaf(text: str) -> _Node:
+    utf8 = _utf8_length(text)
+    # ascii text has the same length in all units.
+    utf16 = utf8 if utf8 == len(text) else _utf16_length(text)
+    breaks = _count_breaks(text, 0, len(text))
+    return _Node(None, None, text, len(text), breaks, utf16, utf8, 0)
+
+
+def _branch(left: _Node, right: _Node) -> _Node:
+    return _Node(
+        left,
+        right,
+        None,
+        left.length + right.length,
+        left.newlines + right.newlines,
+        left.utf16 + right.utf16,
+        left.utf8 + right.utf8,
+        max(left.height, right.height) + 1,
+    )
+
+
+def _leaf_utf16(leaf: _Node, index: int) -> int:
+    """ return UTF-16 code units of leaf text before index. """
+    if leaf.utf16 == leaf.length:
+        return index
+    astrals = leaf.astrals
+    if astrals is None:
+        astrals = leaf.astrals = [
+            match.start() for match in _ASTRAL.finditer(leaf.text)  # type: ignore
+        ]
+    return index + bisect_left(astrals, index)
+
+
+def _index_of_utf16(text: str, units: int) -> int:
+    """ convert UTF-16 code units into index of text, the middle of a surrogate
+    pair is rounded down. """
+    extra = 0
+    for match in _ASTRAL.finditer(text):
+        index = match.start()
+        if units < index + extra:
+            break
+        if units < index + extra + 2:
+            return index
+        extra += 1
+    return min(units - extra, len(text))
+
+
+def _index_of_utf8(text: str, size: int) -> int:
+    """ convert UTF-8 bytes into index of text, the middle of a character is
+    rounded down. """
+    return len(text.encode("utf-8", "surrogatepass")[:size].decode("utf-8", "ignore"))
+
+
+def _seek_offset(node: _Node, offset: int) -> Tuple[_Node, int, int, int, int]:
+    """ find the leaf of code point offset.
+
+    Returns:
+        A tuple contains (leaf, index in leaf, newlines, UTF-16 code units and UTF-8
+        bytes before the leaf).
+    """
+    newlines = utf16 = utf8 = 0
+    while node.text is None:
+        left = node.left
+        if offset < left.length:  # type: ignore
+            node = left  # type: ignore
+        else:
+            offset -= left.length  # type: ignore
+            newlines += left.newlines  # type: ignore
+            utf16 += left.utf16  # type: ignore
+            utf8 += left.utf8  # type: ignore
+            node = node.right  # type: ignore
+    return node, offset, newlines, utf16, utf8
+
+
+def _leaves(node: _Node, offset: int) -> Iterator[_Node]:
+    """ iterate leaves from the one which is found by `_seek_offset`. """
+    stack: List[_Node] = []
+    while True:
+        if node.text is not None:
+            yield node
+            if not stack:
+                return
+            node, offset = stack.pop(), 0
+        elif offset < node.left.length:  # type: ignore
+            stack.append(node.right)  # type: ignore
+            node = node.left  # type: ignore
+        else:
+            offset -= node.left.length  # type: ignore
+            node = node.right  # type: ignore
+
+
+def _seek_utf16(node: _Node, units: int) -> int:
+    """ convert UTF-16 code units into code point offset. """
+    offset = 0
+    while node.text is None:
+        left = node.left
+        if units < left.utf16:  # type: ignore
+            node = left  # type: ignore
+        else:
+            units -= left.utf16  # type: ignore
+            offset += left.length  # type: ignore
+            node = node.right  # type: ignore
+    if node.utf16 == node.length:
+        return offset + min(units, node.length)
+    return offset + _index_of_utf16(node.text, units)
+
+
+def _seek_utf8(node: _Node, size: int) -> int:
+    """ convert UTF-8 bytes into code point offset. """
+    offset = 0
+    while node.text is None:
+        left = node.left
+        if size < left.utf8:  # type: ignore
+            node = left  # type: ignore
+        else:
+            size -= left.utf8  # type: ignore
+            offset += left.length  # type: ignore
+            node = node.right  # type: ignore
+    if node.utf8 == node.length:
+        return offset + min(size, node.length)
+    return offset + _index_of_utf8(node.text, size)
+
+
+def _seek_line(node: _Node, line: int) -> Tuple[_Node, int, int, int]:
+    """ find start of line, which should be in [0, newlines].
+
+    Returns:
+        A tuple contains (leaf, index of line start in leaf, code point offset and
+        UTF-16 code units of line start).
+    """
+    offset = utf16 = 0
+    while node.text is None:
+        left = node.left
+        if line <= left.newlines:  # type: ignore
+            node = left  # type: ignore
+        else:
+            line -= left.newlines  # type: ignore
+            offset += left.length  # type: ignore
+            utf16 += left.utf16  # type: ignore
+            node = node.right  # type: ignore
+    text = node.text
+    if line == 0:
+        index = 0
+    else:
+        breaks = node.breaks
+        if breaks is None:
+            breaks = node.breaks = [
+                match.end() for match in _LINE_BREAK.finditer(text)  # type: ignore
+            ]
+        index = breaks[line - 1]
+    return node, index, offset + index, utf16 + _leaf_utf16(node, index)
+
+
+def _build(text: str) -> Optional[_Node]:
+    """ build a balanced tree of text. """
+    if not text:
+        return None
+    nodes = []
+    start = 0
+    while start < len(text):
+        end = start + LEAF_MAX
+        if end < len(text) and text[end] == "\n" and text[end - 1] == "\r":
+            # don't split "\r\n" between leaves.
+            end += 1
+        nodes.append(_leaf(text[start:end]))
+        start = end
+    while len(nodes) > 1:
+        paired = [_branch(nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+        if len(nodes) % 2:
+            paired.append(nodes[-1])
+        nodes = paired
+    return nodes[0]
+
+
+def _balance(left: _Node, right: _Node) -> _Node:
+    """ make a branch of left and right, rotate it if their heights differ by 2. """
+    if left.height > right.height + 1:
+        if left.left.height >= left.right.height:  # type: ignore
+            return _branch(left.left, _branch(left.right, right))  # type: ignore
+        inner = left.right
+        return _branch(
+            _branch(left.left, inner.left), _branch(inner.right, right)  # type: ignore
+        )
+    if right.height > left.height + 1:
+        if right.right.height >= right.left.height:  # type: ignore
+            return _branch(_branch(left, right.left), right.right)  # type: ignore
+        inner = right.left
+        return _branch(
+            _branch(left, inner.left), _branch(inner.right, right.right)  # type: ignore
+        )
+    return _branch(left, right)
+
+
+def _join(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """ concatenate two trees, adjacent short leaves are merged. """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.height > right.height + 1:
+        return _balance(left.left, _join(left.right, right))  # type: ignore
+    if right.height > left.height + 1:
+        return _balance(_join(left, right.left), right.right)  # type: ignore
+    if (
+        left.text is not None
+        and right.text is not None
+        and left.length + right.length <= LEAF_MAX
+    ):
+        return _leaf(left.text + right.text)
+    return _balance(left, right)
+
+
+def _split(
+    node: Optional[_Node], index: int
+) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """ split tree into text before index and text after it. """
+    if node is None:
+        return None, None
+    if index <= 0:
+        return None, node
+    if index >= node.length:
+        return node, None
+    if node.text is not None:
+        return _leaf(node.text[:index]), _leaf(node.text[index:])
+    left = node.left
+    if index <= left.length:  # type: ignore
+        before, after = _split(left, index)
+        return before, _join(after, node.right)
+    before, after = _split(node.right, index - left.length)  # type: ignore
+    return _join(left, before), after
+
+
+class Rope:
+    """ Immutable text, which can be edited in O(log n) time.
+
+    Offsets are code point offsets of python str.  Line breaks are "\\n",
+    "\\r\\n" and "\\r".  A position between "\\r" and "\\n" is on the line before
+    the line break.
+
+    Args:
+        text (str): the initial text.
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, text: str = ""):
+        self._root = _build(text)
+
+    @classmethod
+    def _from_root(cls, root: Optional[_Node]) -> "Rope":
+        rope = object.__new__(cls)
+        rope._root = root
+        return rope
+
+    def __len__(self) -> int:
+        return 0 if self._root is None else self._root.length
+
+    def __str__(self) -> str:
+        return "".join(self.chunks())
+
+    def __repr__(self) -> str:
+        return f"<Rope length={len(self)} lines={self.line_count}>"
+
+    def __getitem__(self, key: Union[int, slice]) -> str:
+        """ return text of index or slice, slice step is not supported. """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("Slice step is not supported.")
+        else:
+            start = key + len(self) if key < 0 else key
+            if not 0 <= start < len(self):
+                raise IndexError("Rope index out of range.")
+            stop = start + 1
+        pieces: List[str] = []
+        size = stop - start
+        for chunk in self.chunks(start):
+            if size <= 0:
+                break
+            pieces.append(chunk[:size])
+            size -= len(chunk)
+        return "".join(pieces)
+
+    def chunks(self, start: int = 0) -> Iterator[str]:
+        """ iterate text from offset `start`, in pieces of leaves. """
+        node = self._root
+        stack: List[_Node] = []
+        while node is not None:
+            if node.text is not None:
+                if start < node.length:
+                    yield node.text[start:] if start else node.text
+                start = 0
+                node = stack.pop() if stack else None
+            elif start < node.left.length:  # type: ignore
+                stack.append(node.right)  # type: ignore
+                node = node.left
+            else:
+                start -= node.left.length  # type: ignore
+                node = node.right
+
+    def replace(self, start: int, end: int, text: str) -> "Rope":
+        """ return a new rope which replaces text between `start` and `end`.
+
+        Args:
+            start (int), end (int): the range of code point offsets.
+            text (str): the new text.
+        Raises:
+            ValueError - when the range is invalid.
+        """
+        if not 0 <= start <= end <= len(self):
+            raise ValueError(f"Invalid range: {start}, {end}.")
+        # take the "\r" or "\n" which would be split from it's pair by the edit
+        # into the new text, so the pair is in one leaf.
+        following = text[:1] or (self[end] if end < len(self) else "")
+        if following == "\n" and start > 0 and self[start - 1] == "\r":
+            start -= 1
+            text = "\r" + text
+        if text[-1:] == "\r" and end < len(self) and self[end] == "\n":
+            end += 1
+            text += "\n"
+        before, rest = _split(self._root, start)
+        _, after = _split(rest, end - start)
+        if len(text) > LEAF_MAX:
+            middle = _build(text)
+        else:
+            middle = _leaf(text) if text else None
+        return Rope._from_root(_join(_join(before, middle), after))
+
+    def insert(self, offset: int, text: str) -> "Rope":
+        """ return a new rope with text inserted at offset. """
+        return self.replace(offset, offset, text)
+
+    def delete(self, start: int, end: int) -> "Rope":
+        """ return a new rope without text between `start` and `end`. """
+        return self.replace(start, end, "")
+
+    @property
+    def line_count(self) -> int:
+        """ the number of lines, a text ends with newline has an empty last line. """
+        return 1 if self._root is None else self._root.newlines + 1
+
+    def line_start(self, line: int) -> int:
+        """ return the offset where line starts, or length of text if the line is
+        out of range. """
+        return self._line_start(line)[0]
+
+    def _line_start(self, line: int) -> Tuple[int, int]:
+        """ return (code point offset, UTF-16 code units) of line start. """
+        node = self._root
+        if line <= 0 or node is None:
+            return 0, 0
+        if line > node.newlines:
+            return node.length, node.utf16
+        return _seek_line(node, line)[2:]
+
+    def line(self, line: int) -> str:
+        """ return text of line, without line break. """
+        start = self.line_start(line)
+        end = self.line_start(line + 1) if line + 1 < self.line_count else len(self)
+        text = self[start:end]
+        if text.endswith("\r\n"):
+            return text[:-2]
+        if text.endswith(("\n", "\r")):
+            return text[:-1]
+        return text
+
+    def offset_at(self, line: int, character: int) -> int:
+        """ Convert LSP position into code point offset.
+
+        Args:
+            line (int): zero based line number.
+            character (int): UTF-16 code units from the start of line, it's clamped
+                to the end of line.
+        Returns:
+            The code point offset.
+        """
+        return self._offset_in_line(self._line_bounds(line), character)
+
+    def _line_bounds(self, line: int) -> Tuple[int, int, int, int]:
+        """ return (start, UTF-16 of start, end, UTF-16 of end) of line, end is
+        before line break. """
+        node = self._root
+        if node is None:
+            return 0, 0, 0, 0
+        if line > node.newlines:
+            return node.length, node.utf16, node.length, node.utf16
+        leaf, index, start, start_utf16 = _seek_line(node, max(line, 0))
+        text = leaf.text
+        end = text.find("\n", index)  # type: ignore
+        # the line break may start with "\r".
+        carriage_return = text.find(  # type: ignore
+            "\r", index, len(text) if end < 0 else end  # type: ignore
+        )
+        if carriage_return >= 0:
+            end = carriage_return
+        if end >= 0:
+            # most lines end in the leaf where they start.
+            units = _leaf_utf16(leaf, end) - _leaf_utf16(leaf, index)
+            return start, start_utf16, start + end - index, start_utf16 + units
+        if line == node.newlines:
+            return start, start_utf16, node.length, node.utf16
+        _, _, end, end_utf16 = _seek_line(node, line + 1)
+        # don't count line break.
+        pair_start = max(end - 2, 0)
+        size = 2 if self[pair_start:end] == "\r\n" else 1
+        return start, start_utf16, end - size, end_utf16 - size
+
+    def _offset_in_line(self, bounds: Tuple[int, int, int, int], character: int) -> int:
+        start, start_utf16, end, end_utf16 = bounds
+        if start_utf16 + character >= end_utf16:
+            return end
+        if end - start == end_utf16 - start_utf16:
+            # there is no surrogate pair in line.
+            return start + character
+        return _seek_utf16(self._root, start_utf16 + character)  # type: ignore
+
+    def position_at(self, offset: int) -> Position:
+        """ Convert code point offset into LSP position.
+
+        Args:
+            offset (int): the code point offset, it's clamped into text.
+        Returns:
+            A tuple contains (line, UTF-16 code units from the start of line).
+        """
+        node = self._root
+        if node is None or offset <= 0:
+            return 0, 0
+        offset = min(offset, node.length)
+        leaf, index, newlines, utf16, _ = _seek_offset(node, offset)
+        text = leaf.text
+        line_break = _last_break(text, 0, index)  # type: ignore
+        line = newlines + _count_breaks(text, 0, index)  # type: ignore
+        if line_break >= 0:
+            units = _leaf_utf16(leaf, index) - _leaf_utf16(leaf, line_break)
+            return line, units
+        utf16 += _leaf_utf16(leaf, index)
+        return line, utf16 - self._line_start(line)[1]
+
+    def byte_offset(self, offset: int) -> int:
+        """ convert code point offset into UTF-8 byte offset. """
+        node = self._root
+        if node is None or offset <= 0:
+            return 0
+        if offset >= node.length:
+            return node.utf8
+        leaf, index, _, _, utf8 = _seek_offset(node, offset)
+        if leaf.utf8 == leaf.length:
+            return utf8 + index
+        return utf8 + _utf8_length(leaf.text[:index])  # type: ignore
+
+    def offset_of_byte(self, byte_offset: int) -> int:
+        """ convert UTF-8 byte offset into code point offset, an offset in the
+        middle of a character is rounded down. """
+        node = self._root
+        if node is None or byte_offset <= 0:
+            return 0
+        if byte_offset >= node.utf8:
+            return node.length
+        return _seek_utf8(node, byte_offset)
+
+    def utf16_offset(self, offset: int) -> int:
+        """ convert code point offset into UTF-16 code units from start of text. """
+        node = self._root
+        if node is None or offset <= 0:
+            return 0
+        if offset >= node.length:
+            return node.utf16
+        leaf, index, _, utf16, _ = _seek_offset(node, offset)
+        return utf16 + _leaf_utf16(leaf, index)
+
+    def offsets_at(self, positions: Iterable[Position]) -> List[int]:
+        """ Convert many LSP positions into code point offsets, like ranges of
+        diagnostics.  Bounds of each line are looked up once.
+
+        Args:
+            positions (Iterable[Position]): (line, character) tuples.
+        Returns:
+            Code point offsets of positions.
+        """
+        lines: Dict[int, Tuple[int, int, int, int]] = {}
+        offsets = []
+        for line, character in positions:
+            bounds = lines.get(line)
+            if bounds is None:
+                bounds = lines[line] = self._line_bounds(line)
+            offsets.append(self._offset_in_line(bounds, character))
+        return offsets
+
+    def positions_at(self, offsets: Iterable[int]) -> List[Position]:
+        """ Convert many code point offsets into LSP positions, like tokens which
+        are found by a scanner.  Close offsets in ascending order are converted by
+        a single pass over leaves between them, others are looked up in the tree.
+
+        Args:
+            offsets (Iterable[int]): code point offsets.
+        Returns:
+            (line, character) tuples of offsets.
+        """
+        root = self._root
+        if root is None:
+            return [(0, 0) for _ in offsets]
+        positions: List[Position] = []
+        leaves: Optional[Iterator[_Node]] = None
+        leaf = root
+        # offset of leaf start, index in leaf, UTF-16 code units before leaf.
+        start = index = base = 0
+        # the offset we have scanned to, it's line, and UTF-16 of line start.
+        current = -1
+        line = line_utf16 = 0
+        for offset in offsets:
+            offset = max(0, min(offset, root.length))
+            if current < 0 or offset < current or offset - current > _SCAN_MAX:
+                leaf, index, line, base, _ = _seek_offset(root, offset)
+                start, current, leaves = offset - index, offset, None
+                text = leaf.text
+                line_break = _last_break(text, 0, index)  # type: ignore
+                line += _count_breaks(text, 0, index)  # type: ignore
+                if line_break >= 0:
+                    line_utf16 = base + _leaf_utf16(leaf, line_break)
+                else:
+                    line_utf16 = self._line_start(line)[1]
+            while current < offset:
+                if index == leaf.length:
+                    if leaves is None:
+                        leaves = _leaves(root, start)
+                        next(leaves)
+                    base += leaf.utf16
+                    start += leaf.length
+                    leaf, index = next(leaves), 0
+                end = min(leaf.length, index + offset - current)
+                text = leaf.text
+                line_break = _last_break(text, index, end)  # type: ignore
+                if line_break >= 0:
+                    line += _count_breaks(text, index, end)  # type: ignore
+                    line_utf16 = base + _leaf_utf16(leaf, line_break)
+                current += end - index
+                index = end
+            positions.append((line, base + _leaf_utf16(leaf, index) - line_utf16))
+        return positions
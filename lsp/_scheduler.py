@@ -0,0 +1,450 @@
+""" Server side request scheduler with `$/cancelRequest` support.
+
+RequestScheduler sits between JsonRpcConnection and handlers.  Incoming requests
+and notifications are queued, and the server takes them out one by one with
+`next_message`.  Cancellation notifications are applied as soon as they are
+received: a queued request is dropped and answered with RequestCancelled error
+before it starts, and an in-flight request is marked, so its handler can stop
+early, and it's answered with RequestCancelled error too.
+
+Like Connection, the scheduler doesn't do any io, and doesn't run handlers itself.
+"""
+
+import heapq
+import itertools
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional, Set, Tuple
+
+from ._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Request,
+    Notification,
+    RequestId,
+    _MessageEvent,
+)
+
+__all__ = [
+    "RequestScheduler",
+    "FifoQueue",
+    "PriorityQueue",
+    "PRIORITY_SYNC",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW",
+]
+
+CANCEL_METHOD = "$/cancelRequest"
+DID_OPEN = "textDocument/didOpen"
+DID_CHANGE = "textDocument/didChange"
+DID_CLOSE = "textDocument/didClose"
+
+# Priorities of PriorityQueue, smaller one is dispatched first.
+PRIORITY_SYNC = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+# Notifications which change documents and server state.  They always have
+# PRIORITY_SYNC, so they keep their arrival order, and requests which come after
+# them see the changes.
+SYNC_METHODS = frozenset(
+    {
+        "initialize",
+        "initialized",
+        "shutdown",
+        "exit",
+        DID_OPEN,
+        DID_CHANGE,
+        "textDocument/willSave",
+        "textDocument/didSave",
+        DID_CLOSE,
+        "workspace/didChangeConfiguration",
+        "workspace/didChangeWorkspaceFolders",
+        "workspace/didChangeWatchedFiles",
+    }
+)
+
+# (priority, arrival order, uri, message) of a message in PriorityQueue.
+_QueueEntry = Tuple[int, int, Optional[str], _MessageEvent]
+# (arrival order, message, uri, messages which wait for it) of a sync message.
+_Barrier = Tuple[int, _MessageEvent, Optional[str], List[_QueueEntry]]
+
+DEFAULT_PRIORITIES = {
+    # latency sensitive requests, the user is waiting for them while typing.
+    "textDocument/completion": PRIORITY_HIGH,
+    "completionItem/resolve": PRIORITY_HIGH,
+    "textDocument/signatureHelp": PRIORITY_HIGH,
+    "textDocument/hover": PRIORITY_HIGH,
+    "textDocument/documentHighlight": PRIORITY_HIGH,
+    # expensive requests, which usually scan the whole document or workspace.
+    "textDocument/references": PRIORITY_LOW,
+    "workspace/symbol": PRIORITY_LOW,
+    "textDocument/semanticTokens/full": PRIORITY_LOW,
+    "textDocument/semanticTokens/full/delta": PRIORITY_LOW,
+    "textDocument/semanticTokens/range": PRIORITY_LOW,
+    "textDocument/codeLens": PRIORITY_LOW,
+    "textDocument/foldingRange": PRIORITY_LOW,
+    "textDocument/diagnostic": PRIORITY_LOW,
+    "workspace/diagnostic": PRIORITY_LOW,
+}
+
+
+def _document_uri(params: Any) -> Optional[str]:
+    """ return uri of `textDocument` in params, or None if there is no document. """
+    if isinstance(params, dict):
+        document = params.get("textDocument")
+        if isinstance(document, dict):
+            return document.get("uri")
+    return None
+
+
+class FifoQueue:
+    """ The default queue of scheduler, which keeps messages in arrival order.
+
+    Queues of scheduler only need `push`, `pop` and `__len__`.
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self) -> None:
+        self._items: Deque[_MessageEvent] = deque()
+
+    def push(self, message: _MessageEvent) -> None:
+        """ add message into queue. """
+        self._items.append(message)
+
+    def pop(self) -> _MessageEvent:
+        """ remove and return the next message.
+
+        Raises:
+            IndexError - when the queue is empty.
+        """
+        return self._items.popleft()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class PriorityQueue:
+    """ A queue which dispatches messages by priority of their methods, messages
+    with the same priority are dispatched in arrival order.
+
+    Methods in `SYNC_METHODS` always have PRIORITY_SYNC, they're dispatched in
+    arrival order, and they're barriers of their document: messages of the
+    document which come before a text synchronization notification are dispatched
+    before it, and messages of the document which come after it are dispatched
+    after it.  So requests always see the documents they're sent against, and
+    requests of other documents or without a document are still reordered by
+    priority.  A synchronization notification without a document, like
+    `initialize` or `workspace/didChangeConfiguration`, is a barrier of all
+    messages.
+
+    Args:
+        priorities (None or Mapping[str, int]): maps method name to it's priority,
+            which overrides `DEFAULT_PRIORITIES`.  Smaller one is dispatched first.
+        default (int): priority of methods which are not in priorities.
+    Raises:
+        ValueError - when priorities try to change priority of `SYNC_METHODS`.
+    """
+
+    __slots__ = (
+        "priorities",
+        "default",
+        "_heap",
+        "_counter",
+        "_syncs",
+        "_barriers",
+        "_counts",
+        "_size",
+    )
+
+    def __init__(
+        self,
+        priorities: Optional[Mapping[str, int]] = None,
+        default: int = PRIORITY_NORMAL,
+    ):
+        self.priorities: Dict[str, int] = dict(DEFAULT_PRIORITIES)
+        if priorities is not None:
+            self.priorities.update(priorities)
+        for method in SYNC_METHODS:
+            if self.priorities.setdefault(method, PRIORITY_SYNC) != PRIORITY_SYNC:
+                raise ValueError(f"Priority of {method} can't be changed.")
+        self.default = default
+        # (priority, arrival order, uri, message) of messages which can be
+        # dispatched.
+        self._heap: List[_QueueEntry] = []
+        # arrival order, which breaks ties of priority.
+        self._counter = itertools.count()
+        # sync messages in arrival order.
+        self._syncs: Deque[_Barrier] = deque()
+        # uri -> the last queued sync message of document, None for the last one
+        # without a document.
+        self._barriers: Dict[Optional[str], _Barrier] = {}
+        # uri -> how many messages of document are in heap.
+        self._counts: Dict[str, int] = {}
+        self._size = 0
+
+    def push(self, message: _MessageEvent) -> None:
+        """ add message into queue. """
+        method = message["method"]
+        uri = _document_uri(message["params"])
+        order = next(self._counter)
+        self._size += 1
+        if method in SYNC_METHODS:
+            barrier: _Barrier = (order, message, uri, [])
+            self._syncs.append(barrier)
+            self._barriers[uri] = barrier
+            return
+        entry = (self.priorities.get(method, self.default), order, uri, message)
+        # wait for the last sync message which it comes after.
+        waits = self._barriers.get(None)
+        if uri is not None:
+            own = self._barriers.get(uri)
+            if own is not None and (waits is None or own[0] > waits[0]):
+                waits = own
+        if waits is None:
+            self._push_ready(entry)
+        else:
+            waits[3].append(entry)
+
+    def _push_ready(self, entry: _QueueEntry) -> None:
+        heapq.heappush(self._heap, entry)
+        uri = entry[2]
+        if uri is not None:
+            self._counts[uri] = self._counts.get(uri, 0) + 1
+
+    def pop(self) -> _MessageEvent:
+        """ remove and return the message with the highest priority.
+
+        Raises:
+            IndexError - when the queue is empty.
+        """
+        heap = self._heap
+        if self._syncs and (not heap or heap[0][0] >= PRIORITY_SYNC):
+            barrier = self._syncs[0]
+            uri = barrier[2]
+            # it waits for messages which come before it.
+            if not (heap if uri is None else uri in self._counts):
+                self._syncs.popleft()
+                if self._barriers[uri] is barrier:
+                    del self._barriers[uri]
+                for entry in barrier[3]:
+                    self._push_ready(entry)
+                self._size -= 1
+                return barrier[1]
+        _, _, uri, message = heapq.heappop(heap)
+        if uri is not None:
+            count = self._counts[uri] - 1
+            if count:
+                self._counts[uri] = count
+            else:
+                del self._counts[uri]
+        self._size -= 1
+        return message
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class RequestScheduler:
+    """ Schedule incoming requests and notifications of a server, and apply
+    cancellation as soon as it's received.
+
+    Args:
+        rpc (JsonRpcConnection): the connection we receive messages from, and send
+            responses to.  Responses are saved into its outbound queue, which can
+            be fetched by `data_to_send`.
+        queue (None or queue object): the queue of pending messages, like
+            `FifoQueue` or `PriorityQueue`.  Default is FifoQueue.
+        documents (None or DocumentStore): text synchronization notifications are
+            applied to it when they're taken out by `next_message`.
+        cache (None or ResponseCache): requests which are cached are answered by
+            `next_message` without returning them, and results of other requests
+            are encoded and saved into it by `respond`.
+    """
+
+    def __init__(
+        self,
+        rpc: JsonRpcConnection,
+        queue: Any = None,
+        documents: Any = None,
+        cache: Any = None,
+    ):
+        self.rpc = rpc
+        self.queue = FifoQueue() if queue is None else queue
+        self.documents = documents
+        self.cache = cache
+        # in-flight request id -> it's cache key.
+        self._cache_keys: Dict[RequestId, Any] = {}
+        # requests which are queued, request id -> request.  Cancelled requests are
+        # removed from it, and they're skipped when they're popped from queue.
+        self.pending: Dict[RequestId, Request] = {}
+        # requests which are taken out by `next_message`, but not answered.
+        self.in_flight: Dict[RequestId, Request] = {}
+        # in-flight requests which are cancelled.
+        self.cancelled: Set[RequestId] = set()
+        # how many queued requests are dropped before they start.
+        self.dropped = 0
+        # cancelled requests which are still in queue.
+        self._stale = 0
+
+    def receive(self, data: bytes) -> List[_MessageEvent]:
+        """ Receive data, and schedule all messages which are ready.
+
+        Args:
+            data (bytes): the data we received.
+        Returns:
+            Responses of requests we sent, which are not scheduled.
+        Raises:
+            LspProtocolError - when we get invalid message.
+        """
+        responses = []
+        for event in self.rpc.receive_and_drain(data):
+            if not self.schedule(event):
+                responses.append(event)
+        return responses
+
+    def schedule(self, event: _MessageEvent) -> bool:
+        """ Schedule an incoming message.
+
+        Args:
+            event (_MessageEvent): message event from JsonRpcConnection.
+        Returns:
+            True if the message is queued or applied, False for responses.
+        """
+        if event.__class__ is Request:
+            self.pending[event["id"]] = event  # type: ignore
+        elif event.__class__ is Notification:
+            if event["method"] == CANCEL_METHOD:
+                self._cancel(event["params"])
+                return True
+        else:
+            return False
+        self.queue.push(event)
+        return True
+
+    def _cancel(self, params: Any) -> None:
+        if not isinstance(params, dict) or "id" not in params:
+            return
+        request_id = params["id"]
+        if self.pending.pop(request_id, None) is not None:
+            # it's still in queue, answer it now, and it will be skipped later.
+            self.dropped += 1
+            self._stale += 1
+            self._send_cancelled(request_id)
+        elif request_id in self.in_flight:
+            self.cancelled.add(request_id)
+        # else the request is already answered, nothing to do.
+
+    def next_message(self) -> Optional[_MessageEvent]:
+        """ Take the next message out of queue.  A request becomes in-flight until
+        it's answered by `respond` or `respond_error`.
+
+        Returns:
+            Request or Notification event, or None when nothing is queued.
+        """
+        queue, pending = self.queue, self.pending
+        while queue:
+            event = queue.pop()
+            if event.__class__ is Request:
+                request_id = event["id"]
+                if pending.pop(request_id, None) is None:
+                    # it's cancelled before start.
+                    self._stale -= 1
+                    continue
+                self.in_flight[request_id] = event  # type: ignore
+                if self.cache is not None and self._answer_cached(event):
+                    continue
+                return event
+            if self.documents is not None:
+                self.documents.handle(event)
+            if self.cache is not None:
+                self.cache.handle(event)
+            return event
+        return None
+
+    def _answer_cached(self, request: _MessageEvent) -> bool:
+        """ answer request by cached result, return False if it's not cached. """
+        key = self.cache.key(request["method"], request["params"])
+        if key is None:
+            return False
+        result = self.cache.get(key)
+        if result is None:
+            self._cache_keys[request["id"]] = key
+            return False
+        self.in_flight.pop(request["id"])
+        self.rpc.send_encoded_response(request["id"], result, queue=True)
+        return True
+
+    def is_cancelled(self, request_id: RequestId) -> bool:
+        """ return True if the request is cancelled, handlers of long running
+        requests can check it to stop early. """
+        return request_id in self.cancelled
+
+    def respond(self, request_id: RequestId, result: Any) -> None:
+        """ Answer an in-flight request with result.  If the request is cancelled,
+        it's answered with RequestCancelled error instead.
+
+        Args:
+            request_id (RequestId): id of the request.
+            result: the result of request.
+        """
+        if request_id in self._cache_keys:
+            self.respond_encoded(request_id, self.rpc.conn.codec.encode(result))
+        elif self._finish(request_id):
+            self.rpc.send_response(request_id, result, queue=True)
+
+    def respond_encoded(self, request_id: RequestId, result: bytes) -> None:
+        """ Just like `respond`, but the result is already encoded by codec of the
+        connection, like results of `SemanticTokensEncoder`.
+
+        Args:
+            request_id (RequestId): id of the request.
+            result (bytes): utf-8 json bytes of the result.
+        """
+        key = self._cache_keys.pop(request_id, None)
+        if self._finish(request_id):
+            self.rpc.send_encoded_response(request_id, result, queue=True)
+            if key is not None:
+                self.cache.put(key, result)
+
+    def respond_error(
+        self, request_id: RequestId, code: int, message: str, data: Any = None
+    ) -> None:
+        """ Answer an in-flight request with an error.  If the request is cancelled,
+        it's answered with RequestCancelled error instead.
+
+        Args:
+            request_id (RequestId): id of the request.
+            code (int): error code, see `ErrorCodes`.
+            message (str): error message.
+            data: additional information about the error.
+        """
+        self._cache_keys.pop(request_id, None)
+        if self._finish(request_id):
+            self.rpc.send_error(request_id, code, message, data, queue=True)
+
+    def _finish(self, request_id: RequestId) -> bool:
+        """ remove request from in-flight requests, return False if it's cancelled
+        and answered here. """
+        self.in_flight.pop(request_id, None)
+        if request_id in self.cancelled:
+            self.cancelled.discard(request_id)
+            self._send_cancelled(request_id)
+            return False
+        return True
+
+    def _send_cancelled(self, request_id: RequestId) -> None:
+        self.rpc.send_error(
+            request_id, ErrorCodes.RequestCancelled, "Request cancelled", queue=True
+        )
+
+    def data_to_send(self) -> List[bytes]:
+        """ Fetch and clear the buffers of responses.  See `Connection.data_to_send`.
+        """
+        return self.rpc.data_to_send()
+
+    def __len__(self) -> int:
+        """ return the number of queued messages which are not cancelled. """
+        return len(self.queue) - self._stale
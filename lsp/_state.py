@@ -1,8 +1,9 @@
 """ Define lsp connection state for client side and server side. """
 
+import itertools
 import textwrap
 
-from typing import Type, Dict, Union
+from typing import Type, Dict, List, NoReturn, Optional, Union
 from ._role import Role
 from ._events import (
     RequestSent,
@@ -11,16 +12,24 @@ from ._events import (
     Close,
     RequestReceived,
     ResponseSent,
+    MessageSent,
     EventBase,
+    _CODED_EVENTS,
 )
 from ._errors import LspProtocolError
 
 __all__ = ["IDLE", "SEND_BODY", "SEND_RESPONSE", "DONE", "CLOSED"]
 
+# number of event codes, includes the reserved code 0.
+EVENT_COUNT = len(_CODED_EVENTS) + 1
+
 
 class _StateClassCreater(type):
     """ Creater for state class. """
 
+    # unique integer of state, which indexes compiled transition table.
+    code: int
+
     def __str__(self) -> str:
         return f"<State: {self.__name__}>"
 
@@ -28,18 +37,101 @@ class _StateClassCreater(type):
         return self.__name__
 
 
-def make_state(state_name: str) -> Type:
-    """ make state as a class.
+_state_codes = itertools.count()
+
+
+def make_state(state_name: str) -> _StateClassCreater:
+    """ make state as a class.  Every state is tagged with an unique integer `code`,
+    which is used to index compiled transition table.
 
     Args:
         state_name (str): the state name.
     Returns:
         A state relative class
     """
-    return _StateClassCreater(state_name, (), {})
+    return _StateClassCreater(state_name, (), {"code": next(_state_codes)})
+
+
+class TransitionTable:
+    """ State machine compiled into a flat tuple.  The next state of (state, event)
+    lays in `cells[state.code * EVENT_COUNT + event._code]`, None for invalid
+    transition.
+
+    Args:
+        state_machine (Dict[type, Dict]): maps state to a dict, which maps event
+            class to the next state.
+        description (str): description of state machine, used in error message.
+    """
+
+    __slots__ = ("cells", "state_machine", "description")
+
+    def __init__(
+        self, state_machine: Dict[_StateClassCreater, Dict], description: str
+    ):
+        self.state_machine = state_machine
+        self.description = description
+        state_count = max(state.code for state in state_machine) + 1
+        cells: List[Optional[_StateClassCreater]] = [None] * (state_count * EVENT_COUNT)
+        for state, transitions in state_machine.items():
+            for event_cls, next_state in transitions.items():
+                cells[state.code * EVENT_COUNT + event_cls._code] = next_state
+        self.cells = tuple(cells)
+
+
+def transition(
+    table: TransitionTable,
+    current_state: _StateClassCreater,
+    event: Union[Type[EventBase], EventBase],
+) -> _StateClassCreater:
+    """ find the next state in compiled transition table.
+
+    Args:
+        table (TransitionTable): the compiled state machine.
+        current_state (type): the current state.
+        event (EventBase or type of EventBase): The event we received.
+    Returns:
+        An instance of type indicate the next state.
+    Raises:
+        LspProtocolError - if the current_state is not a valid state of state
+            machine.  Or we can't find next state
+    """
+    try:
+        result = table.cells[current_state.code * EVENT_COUNT + event._code]
+    except (IndexError, AttributeError):
+        result = None
+    if result is None:
+        _raise_invalid(table, current_state, event)
+    return result
+
+
+def _raise_invalid(
+    table: TransitionTable,
+    current_state: _StateClassCreater,
+    event: Union[Type[EventBase], EventBase],
+) -> NoReturn:
+    """ raise error about invalid transition, it's out of the hot path. """
+    event_cls = event.__class__ if isinstance(event, EventBase) else event
+    if current_state not in table.state_machine:
+        raise LspProtocolError(f"The given state {repr(current_state)} is invalid.")
+    raise LspProtocolError(
+        textwrap.indent(
+            f"\nThe event is invalid.  More information: "
+            f"{table.description}; state - {current_state}; event - {event_cls}",
+            " " * 4,
+        )
+    )
+
 
+def state_table(role: Role) -> TransitionTable:
+    """ return the compiled state machine of role. """
+    return _client_table if role == Role.CLIENT else _server_table
 
-def next_state(role: Role, current_state: Type, event: Union[type, EventBase]) -> Type:
+
+def next_state(
+    role: Role,
+    current_state: _StateClassCreater,
+    event: Union[Type[EventBase], EventBase],
+) -> _StateClassCreater:
     """ given the role with current state, find the next state when received
     the given event.
 
@@ -53,21 +145,29 @@ def next_state(role: Role, current_state: Type, event: Union[type, EventBase]) -
         LspProtocolError - if the current_state is not a valid state of role.
             Or we can't find next state
     """
-    event_cls = event.__class__ if isinstance(event, EventBase) else event
+    return transition(state_table(role), current_state, event)
 
-    state_machine = _client_state if role == Role.CLIENT else _server_state
-    if current_state not in state_machine:
-        raise LspProtocolError(f"The given state {repr(current_state)} is invalid.")
-    next_state = state_machine[current_state].get(event_cls, None)
-    if not next_state:
-        raise LspProtocolError(
-            textwrap.indent(
-                f"\nThe event is invalid.  More information: "
-                f"role - {role}; state - {current_state}; event - {event_cls}",
-                " " * 4,
-            )
-        )
-    return next_state
+
+def next_stream_state(
+    current_state: _StateClassCreater, event: Union[Type[EventBase], EventBase]
+) -> _StateClassCreater:
+    """ given the current state of one message stream in multiplexed connection,
+    find the next state when received the given event.
+
+    In multiplexed connection, inbound messages and outbound messages are
+    independent streams.  Each of them goes back to IDLE after a message end,
+    so there is no request/response circle between them.
+
+    Args:
+        current_state (type): the current state of stream.
+        event (EventBase or type of EventBase): The event we received.
+    Returns:
+        An instance of type indicate the next state.
+    Raises:
+        LspProtocolError - if the current_state is not a valid state of stream.
+            Or we can't find next state
+    """
+    return transition(stream_table, current_state, event)
 
 
 # States definition
@@ -79,17 +179,32 @@ SEND_RESPONSE = make_state("SEND_RESPONSE")
 
 
 # state machine definieion
-_client_state: Dict[type, Dict] = {
+_client_state: Dict[_StateClassCreater, Dict] = {
     IDLE: {RequestSent: SEND_BODY, Close: CLOSED},
     SEND_BODY: {DataSent: SEND_BODY, Close: CLOSED, MessageEnd: DONE},
     DONE: {Close: CLOSED},
     CLOSED: {},
 }
 
-_server_state: Dict[type, Dict] = {
+_server_state: Dict[_StateClassCreater, Dict] = {
     IDLE: {RequestReceived: SEND_RESPONSE, Close: CLOSED},
     SEND_RESPONSE: {ResponseSent: SEND_BODY, Close: CLOSED},
     SEND_BODY: {DataSent: SEND_BODY, Close: CLOSED, MessageEnd: DONE},
     DONE: {Close: CLOSED},
     CLOSED: {},
 }
+
+_stream_state: Dict[_StateClassCreater, Dict] = {
+    IDLE: {
+        MessageSent: SEND_BODY,
+        RequestSent: SEND_BODY,
+        ResponseSent: SEND_BODY,
+        Close: CLOSED,
+    },
+    SEND_BODY: {DataSent: SEND_BODY, Close: CLOSED, MessageEnd: IDLE},
+    CLOSED: {},
+}
+
+_client_table = TransitionTable(_client_state, f"role - {Role.CLIENT}")
+_server_table = TransitionTable(_server_state, f"role - {Role.SERVER}")
+stream_table = TransitionTable(_stream_state, "multiplexed stream")
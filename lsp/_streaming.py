@@ -0,0 +1,230 @@
+""" Incremental decoding of JSON object bodies.
+
+Language server messages are JSON objects, and the interesting top level members
+(`jsonrpc`, `id`, `method`) usually come before the large `params` or `result`.
+StreamingDecoder is fed with `DataReceived` chunks as they arrive.  Top level
+members are available as soon as they are complete, and large containers are
+decoded element by element while their data is arriving.  So when the last byte
+lands, only the last element is left to decode.
+"""
+
+import codecs
+import json
+import re
+# scanstring is not exported by typeshed, but it's the C scanner of stdlib json.
+from json.decoder import scanstring  # type: ignore[attr-defined]
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+__all__ = ["StreamingDecoder"]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"[-+0-9.eE]*")
+# a value which fails to decode within this distance of the end of data may be
+# completed by the next chunk, `-Infinity` is the longest literal.
+_MAX_LITERAL = 9
+# values which are waiting for data are re-scanned for every chunk until they are
+# larger than this.
+_RETRY_MIN = 4096
+
+# what we expect next in a container.
+_KEY_OR_END, _KEY, _COLON, _VALUE, _VALUE_OR_END, _COMMA_OR_END = range(6)
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class _Frame:
+    """ A container which is being decoded. """
+
+    __slots__ = ("value", "key", "expect")
+
+    def __init__(self, value: Union[Dict, List], expect: int):
+        self.value = value
+        self.key: Optional[str] = None
+        self.expect = expect
+
+
+class StreamingDecoder:
+    """ Decode a JSON object body incrementally.
+
+    Feed it with chunks of body (like data of `DataReceived` events).  Top level
+    members are put into `fields` as soon as they are complete.  Values are decoded
+    by the C scanner of stdlib json, except that containers which are still
+    incomplete are opened, and their elements are decoded one by one, up to
+    `max_depth` levels.
+
+    Args:
+        max_depth (int): how many levels of incomplete containers can be opened,
+            the body object itself is the first level.
+    """
+
+    def __init__(self, max_depth: int = 3):
+        self.max_depth = max_depth
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._scan_once = json.scanner.make_scanner(json.JSONDecoder())  # type: ignore
+        self._stack: List[_Frame] = []
+        # text which is not decoded yet.
+        self._pieces: List[str] = []
+        self._size = 0
+        # when a single value is waiting for data, don't retry it until enough data
+        # arrives, so a huge value is not re-scanned for every chunk.
+        self._retry_size = 0
+        self._decoded: List[str] = []
+
+    def feed(self, data: BytesLike) -> List[str]:
+        """ Feed a chunk of body.
+
+        Args:
+            data (bytes-like): the next chunk of body.
+        Returns:
+            Names of top level members which are completed by this chunk.
+        Raises:
+            ValueError - when the body is not a valid JSON object.
+        """
+        text = self._utf8.decode(bytes(data))
+        if text:
+            self._pieces.append(text)
+            self._size += len(text)
+        if self._size < self._retry_size:
+            return []
+        return self._flush()
+
+    def result(self) -> Dict[str, Any]:
+        """ return the decoded object.
+
+        Raises:
+            ValueError - when the object is not complete.
+        """
+        if not self.done and self._size:
+            # the pending value may be waiting for retry.
+            self._flush()
+        if not self.done:
+            raise ValueError("JSON object is incomplete.")
+        return self.fields
+
+    def _flush(self) -> List[str]:
+        """ parse the pending text, and return names of completed members. """
+        if not self._size:
+            return []
+        text = "".join(self._pieces)
+        pos, waiting = self._parse(text)
+        rest = text[pos:]
+        self._pieces = [rest] if rest else []
+        self._size = len(rest)
+        self._retry_size = 0
+        if waiting and len(rest) > _RETRY_MIN:
+            self._retry_size = 2 * len(rest)
+        decoded, self._decoded = self._decoded, []
+        return decoded
+
+    def _parse(self, text: str) -> Tuple[int, bool]:
+        """ parse as much text as we can.
+
+        Returns:
+            A tuple contains (position we stopped at, if a single value at the
+            position is waiting for more data).
+        """
+        stack = self._stack
+        size = len(text)
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(text, pos).end()  # type: ignore
+            if pos == size:
+                return pos, False
+            char = text[pos]
+            if not stack:
+                if self.done:
+                    raise ValueError("Extra data after JSON object.")
+                if char != "{":
+                    raise ValueError("Message body should be a JSON object.")
+                stack.append(_Frame(self.fields, _KEY_OR_END))
+                pos += 1
+                continue
+            frame = stack[-1]
+            expect = frame.expect
+            if char in "}]" and expect in (_KEY_OR_END, _VALUE_OR_END, _COMMA_OR_END):
+                if (char == "}") != isinstance(frame.value, dict):
+                    raise ValueError(f"Unexpected {char!r} at {pos}.")
+                stack.pop()
+                pos += 1
+                if stack:
+                    self._add(stack[-1], frame.value)
+                else:
+                    self.done = True
+            elif expect == _COMMA_OR_END:
+                if char != ",":
+                    raise ValueError(f"Expecting ',' delimiter at {pos}.")
+                frame.expect = _KEY if isinstance(frame.value, dict) else _VALUE
+                pos += 1
+            elif expect == _KEY or expect == _KEY_OR_END:
+                if char != '"':
+                    raise ValueError(f"Expecting property name at {pos}.")
+                try:
+                    frame.key, end = scanstring(text, pos + 1)
+                except json.JSONDecodeError as e:
+                    if _incomplete(e, size):
+                        return pos, True
+                    raise
+                frame.expect = _COLON
+                pos = end
+            elif expect == _COLON:
+                if char != ":":
+                    raise ValueError(f"Expecting ':' delimiter at {pos}.")
+                frame.expect = _VALUE
+                pos += 1
+            elif char in "}]":
+                # a trailing comma, or a colon without value.
+                raise ValueError(f"Expecting value at {pos}.")
+            else:
+                value, end = self._scan_value(text, pos)
+                if end >= 0:
+                    self._add(frame, value)
+                    pos = end
+                elif char in "{[" and len(stack) < self.max_depth:
+                    # the container is incomplete, decode it's elements instead.
+                    if char == "{":
+                        stack.append(_Frame({}, _KEY_OR_END))
+                    else:
+                        stack.append(_Frame([], _VALUE_OR_END))
+                    pos += 1
+                else:
+                    return pos, True
+
+    def _scan_value(self, text: str, pos: int) -> Tuple[Any, int]:
+        """ decode a value at pos, the end is -1 if it needs more data. """
+        size = len(text)
+        try:
+            value, end = self._scan_once(text, pos)
+        except StopIteration as e:
+            if e.value >= size - _MAX_LITERAL:
+                return None, -1
+            raise ValueError(f"Expecting value at {e.value}.") from None
+        except json.JSONDecodeError as e:
+            if _incomplete(e, size):
+                return None, -1
+            raise
+        if value.__class__ in (int, float):
+            # digits of number may be continued in next chunk.
+            if _NUMBER.match(text, pos).end() == size:  # type: ignore
+                return None, -1
+        return value, end
+
+    def _add(self, frame: _Frame, value: Any) -> None:
+        """ add a complete value into container. """
+        if frame.key is None:
+            frame.value.append(value)  # type: ignore
+        else:
+            frame.value[frame.key] = value  # type: ignore
+            if frame.value is self.fields:
+                self._decoded.append(frame.key)
+            frame.key = None
+        frame.expect = _COMMA_OR_END
+
+
+def _incomplete(error: json.JSONDecodeError, size: int) -> bool:
+    """ return True if the error may be fixed by more data. """
+    return (
+        error.msg.startswith("Unterminated string")
+        or error.pos >= size - _MAX_LITERAL
+    )
@@ -0,0 +1,159 @@
+""" Delta encoding of semantic tokens.
+
+`textDocument/semanticTokens/full/delta` lets a server send edits against the
+previous token array instead of the whole array.  SemanticTokensEncoder keeps the
+last result of each document, computes the edit by a prefix and suffix diff, and
+encodes responses directly to bytes, which can be sent by
+`RequestScheduler.respond_encoded`.
+"""
+
+import itertools
+from array import array
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from ._jsonrpc import Notification, _MessageEvent
+from ._scheduler import DID_OPEN, DID_CLOSE
+
+__all__ = ["SemanticTokensEncoder", "diff_tokens"]
+
+# how many integers are compared at once, before searching the exact position.
+_CHUNK = 4096
+
+
+def _common_prefix(old: memoryview, new: memoryview, limit: int) -> int:
+    """ return length of the common prefix of old[:limit] and new[:limit]. """
+    start = 0
+    end = _CHUNK
+    while end <= limit and old[start:end] == new[start:end]:
+        start, end = end, end + _CHUNK
+    # old[:low] == new[:low], and the prefix is not longer than high.
+    low, high = start, min(end, limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def diff_tokens(old: array, new: array) -> Tuple[int, int, array]:
+    """ Compute the edit which turns old token array into new one.
+
+    Only the common prefix and suffix are kept, so the edit is minimal when the
+    arrays differ in one place, like after an edit of the document.
+
+    Args:
+        old (array): the previous integers of tokens.
+        new (array): the current integers of tokens, of the same typecode.
+    Returns:
+        (start, delete count, inserted integers) of the edit.  When the arrays are
+        equal, delete count is 0, and nothing is inserted.
+    """
+    old_view, new_view = memoryview(old), memoryview(new)
+    limit = min(len(old), len(new))
+    prefix = _common_prefix(old_view, new_view, limit)
+    # reversed memoryviews don't copy either.
+    suffix = _common_prefix(old_view[::-1], new_view[::-1], limit - prefix)
+    # fmt: off
+    return prefix, len(old) - prefix - suffix, new[prefix:len(new) - suffix]
+    # fmt: on
+
+
+def _encode_ints(data: Any) -> bytes:
+    # repr of list of ints is valid json, and it's faster than json.dumps.
+    if data.__class__ is not list:
+        data = data.tolist()
+    return repr(data).encode("ascii")
+
+
+class SemanticTokensEncoder:
+    """ Keep the last semantic tokens of documents, and encode results of
+    `semanticTokens/full` and `semanticTokens/full/delta` requests.
+
+    Results are utf-8 json bytes, which can be sent by
+    `RequestScheduler.respond_encoded` or `JsonRpcConnection.send_encoded_response`.
+    Tokens are kept in compact `array('I')`, and they're dropped when the document
+    is opened again or closed, see `handle`.
+    """
+
+    def __init__(self) -> None:
+        # uri -> (result id, integers of tokens).
+        self.results: Dict[str, Tuple[str, array]] = {}
+        self._ids = itertools.count(1)
+
+    def full(self, uri: str, data: Iterable[int]) -> bytes:
+        """ Save tokens of document, and encode the `SemanticTokens` result.
+
+        Args:
+            uri (str): uri of the document.
+            data (Iterable[int]): integers of tokens.
+        Returns:
+            The encoded result.
+        """
+        tokens = array("I", data)
+        result_id = self._save(uri, tokens)
+        return b'{"resultId": "%s", "data": %s}' % (
+            result_id.encode("ascii"),
+            _encode_ints(data if data.__class__ is list else tokens),
+        )
+
+    def delta(
+        self, uri: str, previous_result_id: Optional[str], data: Iterable[int]
+    ) -> bytes:
+        """ Save tokens of document, and encode the `SemanticTokensDelta` result
+        against the previous result.
+
+        Args:
+            uri (str): uri of the document.
+            previous_result_id (None or str): `previousResultId` of the request.
+            data (Iterable[int]): integers of tokens.
+        Returns:
+            The encoded result.  When the previous result is unknown, it's the
+            `SemanticTokens` result, just like `full`.
+        """
+        previous = self.results.get(uri)
+        if previous is None or previous[0] != previous_result_id:
+            return self.full(uri, data)
+        tokens = array("I", data)
+        start, delete_count, inserted = diff_tokens(previous[1], tokens)
+        result_id = self._save(uri, tokens).encode("ascii")
+        if delete_count == 0 and not inserted:
+            edits = b""
+        else:
+            edits = b'{"start": %d, "deleteCount": %d, "data": %s}' % (
+                start,
+                delete_count,
+                _encode_ints(inserted),
+            )
+        return b'{"resultId": "%s", "edits": [%s]}' % (result_id, edits)
+
+    def handle(self, event: _MessageEvent) -> bool:
+        """ Drop tokens of the document which is opened again or closed.
+
+        Args:
+            event (_MessageEvent): the message event.
+        Returns:
+            True if tokens are dropped.
+        """
+        if event.__class__ is not Notification:
+            return False
+        if event["method"] not in (DID_OPEN, DID_CLOSE):
+            return False
+        uri = event["params"]["textDocument"]["uri"]
+        return self.results.pop(uri, None) is not None
+
+    def forget(self, uri: str) -> None:
+        """ drop tokens of document. """
+        self.results.pop(uri, None)
+
+    def _save(self, uri: str, tokens: array) -> str:
+        result_id = str(next(self._ids))
+        self.results[uri] = (result_id, tokens)
+        return result_id
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self.results
+
+    def __len__(self) -> int:
+        return len(self.results)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+
+import pytest
+
+from .._asyncio import (
+    LspProtocol,
+    start_tcp_server,
+    open_tcp_connection,
+    connect_stdio,
+)
+from .._errors import ResponseError
+from .._jsonrpc import ErrorCodes
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(coro)
+        # let the other side of connections see the closing.
+        loop.run_until_complete(asyncio.sleep(0.01))
+    finally:
+        loop.close()
+
+
+async def _slow_echo(params):
+    await asyncio.sleep(params["delay"])
+    return params["value"]
+
+
+def _fail(params):
+    raise ResponseError(ErrorCodes.InvalidParams, "bad params", params)
+
+
+def _crash(params):
+    raise ValueError("crash")
+
+
+HANDLERS = {"echo": _slow_echo, "fail": _fail, "crash": _crash}
+
+
+def test_tcp_concurrent_clients_and_requests():
+    async def main():
+        server = await start_tcp_server(HANDLERS, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        clients = [await open_tcp_connection("127.0.0.1", port) for _ in range(5)]
+
+        # later requests are answered earlier, responses are matched by id.
+        results = await asyncio.gather(
+            *[
+                client.request("echo", {"delay": 0.01 * (3 - index), "value": index})
+                for client in clients
+                for index in range(3)
+            ]
+        )
+        assert results == [0, 1, 2] * 5
+
+        for client in clients:
+            client.close()
+            await client.wait_closed()
+        server.close()
+        await server.wait_closed()
+
+    _run(main())
+
+
+def test_tcp_error_responses():
+    async def main():
+        server = await start_tcp_server(HANDLERS, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await open_tcp_connection("127.0.0.1", port)
+
+        with pytest.raises(ResponseError) as e:
+            await client.request("fail", [1])
+        assert e.value.code == ErrorCodes.InvalidParams
+        assert e.value.data == [1]
+        with pytest.raises(ResponseError) as e:
+            await client.request("crash")
+        assert e.value.code == ErrorCodes.InternalError
+        with pytest.raises(ResponseError) as e:
+            await client.request("not-exists")
+        assert e.value.code == ErrorCodes.MethodNotFound
+
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    _run(main())
+
+
+def test_stdio_pipes_and_notifications():
+    async def main():
+        # two pipes, one for each direction.
+        client_read, server_write = os.pipe()
+        server_read, client_write = os.pipe()
+        files = [
+            os.fdopen(fd, mode)
+            for fd, mode in [
+                (server_read, "rb"),
+                (server_write, "wb"),
+                (client_read, "rb"),
+                (client_write, "wb"),
+            ]
+        ]
+        notified = asyncio.get_event_loop().create_future()
+
+        server = await connect_stdio(
+            "server",
+            {"initialized": notified.set_result, "echo": _slow_echo},
+            stdin=files[0],
+            stdout=files[1],
+        )
+        client = await connect_stdio("client", stdin=files[2], stdout=files[3])
+
+        client.notify("initialized", {"ok": True})
+        assert await notified == {"ok": True}
+        assert await client.request("echo", {"delay": 0, "value": "x"}) == "x"
+
+        client.close()
+        server.close()
+        await server.wait_closed()
+        await client.wait_closed()
+
+    _run(main())
+
+
+def test_notification_handler_errors_are_logged(caplog):
+    async def _crash_later(params):
+        raise ValueError("crash later")
+
+    async def main():
+        handlers = dict(HANDLERS, boom=_crash, later=_crash_later)
+        server = await start_tcp_server(handlers, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await open_tcp_connection("127.0.0.1", port)
+
+        client.notify("boom")
+        client.notify("later")
+        # the connection is still alive.
+        assert await client.request("echo", {"delay": 0, "value": 1}) == 1
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    _run(main())
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Handler of boom failed." in messages
+    assert "Handler of later failed." in messages
+
+
+def test_request_after_connection_lost():
+    async def main():
+        server = await start_tcp_server(HANDLERS, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await open_tcp_connection("127.0.0.1", port)
+        waiter = asyncio.ensure_future(client.request("echo", {"delay": 1, "value": 0}))
+        await asyncio.sleep(0.01)
+        client.close()
+        with pytest.raises(ConnectionError):
+            await waiter
+        with pytest.raises(ConnectionError):
+            await client.request("echo", {"delay": 0, "value": 0})
+        server.close()
+        await server.wait_closed()
+
+    _run(main())
+
+
+def test_protocol_close_on_invalid_message():
+    class _Transport(asyncio.Transport):
+        closed = False
+
+        def write(self, data):
+            pass
+
+        def is_closing(self):
+            return self.closed
+
+        def close(self):
+            self.closed = True
+
+    async def main():
+        protocol = LspProtocol("server")
+        transport = _Transport()
+        protocol.connection_made(transport)
+        protocol.data_received(b"Content-Length: 2\r\n\r\n[]")
+        assert transport.closed
+
+    _run(main())
+
+
+def test_cancel_request():
+    async def main():
+        server = await start_tcp_server(HANDLERS, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = await open_tcp_connection("127.0.0.1", port)
+
+        slow = asyncio.ensure_future(client.request("echo", {"delay": 10, "value": 1}))
+        await asyncio.sleep(0.01)
+        (request_id,) = client.rpc.outgoing
+        client.notify("$/cancelRequest", {"id": request_id})
+        with pytest.raises(ResponseError) as e:
+            await asyncio.wait_for(slow, 1)
+        assert e.value.code == ErrorCodes.RequestCancelled
+        # unknown id is ignored.
+        client.notify("$/cancelRequest", {"id": request_id})
+        assert await client.request("echo", {"delay": 0, "value": 2}) == 2
+
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+    _run(main())
@@ -1,5 +1,8 @@
+import mmap
+
 import pytest
 from .._buffer import ReceiveBuffer
+from .._errors import LspProtocolError
 
 
 def test_receive_buffer_append():
@@ -68,3 +71,148 @@ def test_receive_buffer_clear():
 
     assert buffer.raw == b""
     assert buffer.header_bytes is None
+
+
+def test_receive_buffer_try_extract_header_byte_by_byte():
+    buffer = ReceiveBuffer()
+    raw = b"Content-Length: 12\r\nContent-Type: text\r\n\r\nbody"
+    for index in range(len(raw)):
+        # fmt: off
+        buffer.append(raw[index:index + 1])
+        # fmt: on
+        header = buffer.try_extract_header()
+        if header is not None:
+            break
+    assert index == raw.index(b"\r\n\r\n") + 3
+    assert header == {"Content-Length": "12", "Content-Type": "text"}
+    assert buffer.content_length == 12
+
+
+def test_receive_buffer_try_extract_header_keeps_body():
+    buffer = ReceiveBuffer()
+    buffer.append(b"Content-Length: 4\r\n\r\nbody")
+    buffer.try_extract_header()
+    assert buffer.header_bytes == b"Content-Length: 4"
+    assert buffer.raw == b"body"
+
+
+def test_receive_buffer_clear_reset_content_length():
+    buffer = ReceiveBuffer()
+    buffer.append(b"Content-Length: 4\r\n\r\n")
+    buffer.try_extract_header()
+    buffer.clear()
+    assert buffer.content_length is None
+    assert buffer.header is None
+
+
+def test_receive_buffer_zero_copy():
+    buffer = ReceiveBuffer(zero_copy=True)
+    buffer.append(b"Content-Length: 10\r\n\r\nfirst")
+    buffer.try_extract_header()
+    assert len(buffer.body) == 10
+    assert buffer.raw == b""
+
+    data = buffer.try_extract_data()
+    assert isinstance(data, memoryview)
+    assert data == b"first"
+    assert buffer.try_extract_data() is None
+
+    # data out of body is leaved in raw.
+    buffer.append(b"secondmore")
+    data = buffer.try_extract_data()
+    assert isinstance(data, memoryview)
+    assert data == b"secon"
+    assert data.obj is buffer.body
+    assert buffer.raw == b"dmore"
+    assert buffer.get_body() == b"firstsecon"
+
+
+def test_receive_buffer_zero_copy_clear():
+    buffer = ReceiveBuffer(zero_copy=True)
+    buffer.append(b"Content-Length: 4\r\n\r\ndata")
+    buffer.try_extract_header()
+    data = buffer.try_extract_data()
+    buffer.clear()
+
+    assert buffer.body is None
+    # the extracted data is still valid after clear.
+    assert data == b"data"
+
+
+def test_receive_buffer_try_extract_data_stops_at_content_length():
+    buffer = ReceiveBuffer()
+    buffer.append(b"Content-Length: 4\r\n\r\ndataContent-Length: 2\r\n\r\nok")
+    buffer.try_extract_header()
+
+    assert buffer.try_extract_data() == b"data"
+    assert buffer.try_extract_data() is None
+    assert buffer.get_body() == b"data"
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_receive_buffer_next_message(zero_copy):
+    buffer = ReceiveBuffer(zero_copy=zero_copy)
+    buffer.append(b"Content-Length: 4\r\n\r\ndataContent-Length: 2\r\n\r\no")
+    assert buffer.try_extract_header() == {"Content-Length": "4"}
+    assert buffer.try_extract_data() == b"data"
+
+    buffer.next_message()
+    assert buffer.header is None
+    assert buffer.try_extract_header() == {"Content-Length": "2"}
+    assert buffer.try_extract_data() == b"o"
+    buffer.append(b"kContent-Length")
+    assert buffer.try_extract_data() == b"k"
+    assert buffer.get_body() == b"ok"
+
+    buffer.next_message()
+    assert buffer.raw == b"Content-Length"
+    assert buffer.try_extract_header() is None
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_receive_buffer_take_body(zero_copy):
+    buffer = ReceiveBuffer(zero_copy=zero_copy)
+    buffer.append(b"Content-Length: 4\r\n\r\ndataContent-Length: 2")
+    buffer.try_extract_header()
+    body = buffer.take_body()
+    assert isinstance(body, memoryview if zero_copy else bytes)
+    buffer.next_message()
+    # body is still valid after going to next message.
+    assert body == b"data"
+    assert buffer.raw == b"Content-Length: 2"
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_receive_buffer_spill_large_body(zero_copy):
+    buffer = ReceiveBuffer(zero_copy=zero_copy, spill_threshold=4)
+    buffer.append(b"Content-Length: 6\r\n\r\nda")
+    buffer.try_extract_header()
+    assert buffer.spilled
+    assert isinstance(buffer.body, mmap.mmap)
+    assert buffer.try_extract_data() == b"da"
+    buffer.append(b"taxyContent")
+    assert buffer.try_extract_data() == b"taxy"
+    assert buffer.body_complete()
+    body = buffer.get_body()
+    assert isinstance(body, memoryview)
+    assert body == b"dataxy"
+
+    # small body is not spilled.
+    buffer.next_message()
+    buffer.append(b"-Length: 2\r\n\r\nok")
+    buffer.try_extract_header()
+    assert not buffer.spilled
+    assert not isinstance(buffer.body, mmap.mmap)
+    assert buffer.get_body() == b"ok"
+    assert body == b"dataxy"
+
+
+def test_receive_buffer_max_message_size():
+    buffer = ReceiveBuffer(zero_copy=True, max_message_size=10)
+    buffer.append(b"Content-Length: 10\r\n\r\n")
+    assert buffer.try_extract_header() == {"Content-Length": "10"}
+    buffer.clear()
+    buffer.append(b"Content-Length: 1000000000000\r\n\r\n")
+    with pytest.raises(LspProtocolError):
+        buffer.try_extract_header()
+    assert buffer.body is None
@@ -0,0 +1,129 @@
+from .._cache import ResponseCache
+from .._jsonrpc import JsonRpcConnection, Notification, Response
+from .._scheduler import RequestScheduler
+
+URI = "file:///a.py"
+
+
+def _open(uri=URI, version=1):
+    item = {"uri": uri, "languageId": "python", "version": version, "text": ""}
+    return Notification.make("textDocument/didOpen", {"textDocument": item})
+
+
+def _change(uri=URI, version=2):
+    params = {
+        "textDocument": {"uri": uri, "version": version},
+        "contentChanges": [{"text": "x"}],
+    }
+    return Notification.make("textDocument/didChange", params)
+
+
+def _hover(line, character, uri=URI, **others):
+    params = {
+        "textDocument": {"uri": uri},
+        "position": {"line": line, "character": character},
+    }
+    params.update(others)
+    return params
+
+
+def _send(client, notification):
+    return client.send_notification(notification["method"], notification["params"])
+
+
+def test_key_is_normalized():
+    cache = ResponseCache()
+    assert cache.key("textDocument/hover", _hover(1, 2)) is None
+    cache.handle(_open())
+    key = cache.key("textDocument/hover", _hover(1, 2))
+    assert key is not None
+    reordered = {
+        "position": {"character": 2, "line": 1},
+        "workDoneToken": "token",
+        "textDocument": {"uri": URI},
+    }
+    assert cache.key("textDocument/hover", reordered) == key
+    assert cache.key("textDocument/hover", _hover(1, 3)) != key
+    assert cache.key("textDocument/definition", _hover(1, 2)) is None
+
+
+def test_hits_and_invalidation():
+    cache = ResponseCache()
+    cache.handle(_open())
+    cache.handle(_open("file:///b.py"))
+    key = cache.key("textDocument/hover", _hover(1, 2))
+    other_key = cache.key("textDocument/hover", _hover(1, 2, "file:///b.py"))
+    assert cache.get(key) is None
+    assert cache.put(key, b'{"contents": "int"}')
+    assert cache.put(other_key, b"null")
+    assert cache.get(key) == b'{"contents": "int"}'
+    assert cache.get(other_key) == b"null"
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.handle(_change())
+    assert key not in cache
+    assert other_key in cache
+    new_key = cache.key("textDocument/hover", _hover(1, 2))
+    assert new_key != key
+    # results of old versions are not saved.
+    assert not cache.put(key, b'{"contents": "int"}')
+
+    params = {"textDocument": {"uri": "file:///b.py"}}
+    cache.handle(Notification.make("textDocument/didClose", params))
+    assert len(cache) == 0
+    assert cache.size == 0
+    assert cache.key("textDocument/hover", _hover(1, 2, "file:///b.py")) is None
+
+
+def test_eviction():
+    cache = ResponseCache(max_entries=3, max_bytes=100)
+    cache.handle(_open())
+    keys = [cache.key("textDocument/hover", _hover(line, 0)) for line in range(5)]
+    for key in keys[:3]:
+        cache.put(key, b"123")
+    cache.get(keys[0])
+    cache.put(keys[3], b"123")
+    # the least recently used one is evicted.
+    assert [key in cache for key in keys] == [True, False, True, True, False]
+    assert cache.evictions == 1
+
+    assert cache.put(keys[4], b"1" * 92)
+    assert [key in cache for key in keys] == [True, False, False, True, True]
+    assert cache.size == 3 + 3 + 92
+    # too large to be cached.
+    assert not cache.put(keys[0], b"1" * 101)
+    assert keys[4] in cache
+
+
+def test_scheduler_answers_cached_requests():
+    client = JsonRpcConnection("client")
+    cache = ResponseCache()
+    scheduler = RequestScheduler(JsonRpcConnection("server"), cache=cache)
+    data = _send(client, _open())
+    first, frame = client.send_request("textDocument/hover", _hover(1, 2))
+    data += frame
+    second, frame = client.send_request("textDocument/hover", _hover(1, 2))
+    data += frame
+    scheduler.receive(data)
+
+    assert scheduler.next_message()["method"] == "textDocument/didOpen"
+    request = scheduler.next_message()
+    assert request["id"] == first
+    scheduler.respond(first, {"contents": "int"})
+    # the second one is answered from cache.
+    assert scheduler.next_message() is None
+    responses = client.receive_and_drain(b"".join(scheduler.data_to_send()))
+    assert [(type(event), event["id"]) for event in responses] == [
+        (Response, first),
+        (Response, second),
+    ]
+    assert responses[1]["result"] == {"contents": "int"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    third, data = client.send_request("textDocument/hover", _hover(1, 2))
+    scheduler.receive(_send(client, _change()) + data)
+    scheduler.next_message()
+    assert scheduler.next_message()["id"] == third
+    scheduler.respond_error(third, -32603, "failed")
+    # errors are not cached.
+    assert len(cache) == 0
@@ -0,0 +1,160 @@
+import pytest
+
+from .._coalesce import CoalescingQueue, Debouncer, merge_changes
+from .._jsonrpc import JsonRpcConnection, Notification, Request
+from .._scheduler import RequestScheduler, PriorityQueue
+
+
+def _insert(line, character, text):
+    position = {"line": line, "character": character}
+    return {"range": {"start": position, "end": position}, "text": text}
+
+
+def _did_change(uri, version, *changes):
+    return {
+        "textDocument": {"uri": uri, "version": version},
+        "contentChanges": list(changes),
+    }
+
+
+@pytest.fixture
+def client():
+    return JsonRpcConnection("client")
+
+
+def test_merge_typing():
+    merged = merge_changes(
+        [
+            _did_change("a", 1, _insert(0, 4, "pr")),
+            _did_change("a", 2, _insert(0, 6, "in")),
+            _did_change("a", 3, _insert(0, 8, "t(\n")),
+            _did_change("a", 4, _insert(1, 0, "    x")),
+        ]
+    )
+    assert merged == _did_change("a", 4, _insert(0, 4, "print(\n    x"))
+
+
+def test_merge_in_version_order():
+    merged = merge_changes(
+        [
+            _did_change("a", 3, _insert(0, 2, "c")),
+            _did_change("a", 2, _insert(0, 1, "b")),
+        ]
+    )
+    assert merged == _did_change("a", 3, _insert(0, 1, "bc"))
+
+
+def test_merge_utf16_positions():
+    merged = merge_changes(
+        [
+            _did_change("a", 1, _insert(0, 0, "\U0001f600")),
+            _did_change("a", 2, _insert(0, 2, "a")),
+            _did_change("a", 3, _insert(0, 2, "b")),
+        ]
+    )
+    assert merged["contentChanges"] == [
+        _insert(0, 0, "\U0001f600a"),
+        _insert(0, 2, "b"),
+    ]
+
+
+def test_merge_full_text_drops_previous_changes():
+    deletion = {
+        "range": {
+            "start": {"line": 0, "character": 0},
+            "end": {"line": 0, "character": 3},
+        },
+        "rangeLength": 3,
+        "text": "",
+    }
+    merged = merge_changes(
+        [
+            _did_change("a", 1, _insert(0, 0, "x")),
+            _did_change("a", 2, {"text": "full"}, _insert(0, 4, "!")),
+            _did_change("a", 3, deletion),
+        ]
+    )
+    assert merged == _did_change("a", 3, {"text": "full"}, _insert(0, 4, "!"), deletion)
+
+
+def test_coalescing_queue(client: JsonRpcConnection):
+    queue = CoalescingQueue()
+    scheduler = RequestScheduler(JsonRpcConnection("server"), queue)
+    data = b""
+    for version in range(1, 21):
+        data += client.send_notification(
+            "textDocument/didChange",
+            _did_change("file:///a.py", version, _insert(0, version - 1, "x")),
+        )
+        data += client.send_notification(
+            "textDocument/didChange",
+            _did_change("file:///b.py", version, {"text": str(version)}),
+        )
+        if version == 10:
+            data += client.send_request("textDocument/completion")[1]
+    scheduler.receive(data)
+    assert queue.coalesced == 36
+    assert len(scheduler) == 5
+
+    first, second, request, third, fourth = iter(scheduler.next_message, None)
+    assert isinstance(first, Notification)
+    assert first["params"] == _did_change("file:///a.py", 10, _insert(0, 0, "x" * 10))
+    assert second["params"] == _did_change("file:///b.py", 10, {"text": "10"})
+    # the request sees the document it's sent against.
+    assert isinstance(request, Request)
+    assert third["params"] == _did_change("file:///a.py", 20, _insert(0, 10, "x" * 10))
+    assert fourth["params"] == _did_change("file:///b.py", 20, {"text": "20"})
+
+    # changes after the merged one is dispatched are queued again.
+    scheduler.receive(
+        client.send_notification(
+            "textDocument/didChange", _did_change("file:///a.py", 21, {"text": ""})
+        )
+    )
+    assert scheduler.next_message()["params"]["textDocument"]["version"] == 21
+
+
+def test_coalescing_stops_at_other_sync_notifications(client: JsonRpcConnection):
+    scheduler = RequestScheduler(
+        JsonRpcConnection("server"), CoalescingQueue(PriorityQueue())
+    )
+    uri = "file:///a.py"
+    data = b""
+    for version in range(1, 5):
+        data += client.send_notification(
+            "textDocument/didChange", _did_change(uri, version, {"text": str(version)})
+        )
+        if version == 2:
+            data += client.send_notification(
+                "textDocument/didSave", {"textDocument": {"uri": uri}}
+            )
+    scheduler.receive(data)
+    assert [
+        (message["method"], message["params"]["textDocument"].get("version"))
+        for message in iter(scheduler.next_message, None)
+    ] == [
+        ("textDocument/didChange", 2),
+        ("textDocument/didSave", None),
+        ("textDocument/didChange", 4),
+    ]
+
+
+def test_debouncer():
+    now = [0.0]
+    debouncer = Debouncer(0.5, clock=lambda: now[0])
+    assert debouncer.timeout() is None
+    debouncer.touch("a")
+    now[0] = 0.2
+    debouncer.touch("b")
+    debouncer.touch("a")
+    assert debouncer.timeout() == pytest.approx(0.5)
+    now[0] = 0.6
+    assert debouncer.due() == []
+    now[0] = 0.7
+    assert debouncer.due() == ["b", "a"]
+    assert len(debouncer) == 0
+
+    debouncer.touch("c")
+    debouncer.cancel("c")
+    now[0] = 2.0
+    assert debouncer.due() == []
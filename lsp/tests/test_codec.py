@@ -0,0 +1,51 @@
+import json
+from datetime import date
+
+import pytest
+
+from .._codec import Codec, JsonCodec, get_codec, available_codecs
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_codec_round_trip(name):
+    codec = get_codec(name)
+    assert codec.name == name
+    obj = {"method": "textDocument/didOpen", "params": {"text": "中文\n", "v": [1, 2]}}
+    data = codec.encode(obj)
+    assert isinstance(data, bytes)
+    assert json.loads(data.decode("utf-8")) == obj
+
+    assert codec.decode(data) == obj
+    assert codec.decode(bytearray(data)) == obj
+    assert codec.decode(memoryview(bytearray(data))) == obj
+
+
+def test_json_codec_with_encoder():
+    class _Encoder(json.JSONEncoder):
+        def default(self, o):
+            if isinstance(o, date):
+                return f"{o.year}-{o.month}-{o.day}"
+
+    codec = JsonCodec(_Encoder)
+    assert codec.encode({"date": date(2010, 1, 1)}) == b'{"date": "2010-1-1"}'
+
+
+def test_json_codec_is_always_available():
+    assert available_codecs()[-1] == "json"
+    assert isinstance(get_codec("json"), JsonCodec)
+
+
+def test_get_fastest_codec():
+    assert get_codec().name == available_codecs()[0]
+
+
+def test_get_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("not-exists")
+
+
+def test_codec_not_implemented():
+    with pytest.raises(NotImplementedError):
+        Codec().encode({})
+    with pytest.raises(NotImplementedError):
+        Codec().decode(b"{}")
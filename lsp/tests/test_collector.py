@@ -83,3 +83,18 @@ def test_collector_length_support():
     assert len(collector) == 0
     collector.append(b"test")
     assert len(collector) == 4
+
+
+def test_collector_append_without_keep_data():
+    collector = FixedLengthCollector(keep_data=False)
+    collector.set_length(10)
+    collector.append(b"test")
+
+    assert collector.data == b""
+    assert collector.remain == 6
+    assert len(collector) == 4
+
+    collector.append(b"x" * 6)
+    assert collector.full()
+    with pytest.raises(RuntimeError):
+        collector.append(b"x")
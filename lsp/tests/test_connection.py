@@ -12,8 +12,12 @@ from .._events import (
     MessageEnd,
     ResponseReceived,
     RequestReceived,
+    MessageReceived,
+    MessageSent,
+    MessageComplete,
 )
 from .._connection import Connection, NEED_DATA
+from .._codec import JsonCodec
 from .._errors import LspProtocolError
 from .._state import IDLE, SEND_BODY, SEND_RESPONSE, DONE, CLOSED
 
@@ -365,3 +369,364 @@ def test_need_data_representation():
 def test_next_event_when_client_doesnt_send_data_yet(client_conn: Connection):
     with pytest.raises(LspProtocolError):
         client_conn.next_event()
+
+
+def test_get_received_data_in_zero_copy_mode():
+    server_conn = Connection("server", zero_copy=True)
+    server_conn.receive(b"Content-Length: 30\r\n\r\n" + b'"' + b"x" * 10)
+    assert isinstance(server_conn.next_event(), RequestReceived)
+    event = server_conn.next_event()
+    assert isinstance(event, DataReceived)
+    assert isinstance(event["data"], memoryview)
+    assert event.to_data() == b'"' + b"x" * 10
+
+    server_conn.receive(b"x" * 18 + b'"')
+    event = server_conn.next_event()
+    assert event["data"] == b"x" * 18 + b'"'
+    assert isinstance(server_conn.next_event(), MessageEnd)
+    assert server_conn.in_collector.data == b""
+
+    header, content = server_conn.get_received_data()
+    assert header == {"Content-Length": "30"}
+    assert content == "x" * 28
+
+    header, content = server_conn.get_received_data(raw=True)
+    assert isinstance(content, memoryview)
+    assert content == b'"' + b"x" * 28 + b'"'
+
+
+def _request_bytes(body: bytes) -> bytes:
+    return f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_server_receive_pipelined_messages(zero_copy):
+    server_conn = Connection("server", zero_copy=zero_copy)
+    bodies = [b'{"method": "didChange"}', b'{"method": "didSave"}', b'{"id": 1}']
+    # all messages arrive in one read.
+    server_conn.receive(b"".join(_request_bytes(body) for body in bodies))
+
+    for body in bodies:
+        assert isinstance(server_conn.next_event(), RequestReceived)
+        assert isinstance(server_conn.next_event(), DataReceived)
+        assert isinstance(server_conn.next_event(), MessageEnd)
+        assert server_conn.get_received_data(raw=True)[1] == body
+        server_conn.send_json({"result": None})
+        server_conn.go_next_circle()
+    assert server_conn.next_event() is NEED_DATA
+
+
+def test_server_next_events_stops_at_message_end():
+    server_conn = Connection("server")
+    assert server_conn.next_events() == []
+    bodies = [b'{"method": "didChange"}', b'{"method": "didSave"}']
+    events = server_conn.receive_and_drain(
+        b"".join(_request_bytes(body) for body in bodies)
+    )
+    assert [type(event) for event in events] == [
+        RequestReceived,
+        DataReceived,
+        MessageEnd,
+    ]
+    assert server_conn.our_state == SEND_RESPONSE
+    assert server_conn.their_state == DONE
+    assert server_conn.get_received_data(raw=True)[1] == bodies[0]
+    server_conn.send_json({"result": None})
+    server_conn.go_next_circle()
+    assert len(server_conn.next_events()) == 3
+    assert server_conn.get_received_data(raw=True)[1] == bodies[1]
+
+
+def test_client_next_events_before_request_sent(client_conn: Connection):
+    with pytest.raises(LspProtocolError):
+        client_conn.next_events()
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_multiplexed_next_events(zero_copy):
+    conn = Connection("server", zero_copy=zero_copy, multiplexed=True)
+    data = _request_bytes(b"[1]") + _request_bytes(b"[2]") + b"Content-Length: 3"
+    events = conn.receive_and_drain(data)
+    assert [type(event) for event in events] == [
+        MessageReceived,
+        DataReceived,
+        MessageEnd,
+        MessageReceived,
+        DataReceived,
+        MessageEnd,
+    ]
+    assert [bytes(events[1]["data"]), bytes(events[4]["data"])] == [b"[1]", b"[2]"]
+
+    events = conn.receive_and_drain(b"\r\n\r\n[3")
+    assert [type(event) for event in events] == [MessageReceived, DataReceived]
+    events = conn.receive_and_drain(b"]")
+    assert [type(event) for event in events] == [DataReceived, MessageEnd]
+    assert conn.their_state == IDLE
+
+
+def _receive_all_json(conn: Connection):
+    results = []
+    while True:
+        event = conn.next_event()
+        if event is NEED_DATA:
+            return results
+        if isinstance(event, MessageEnd):
+            results.append(conn.get_received_data()[1])
+
+
+def test_multiplexed_connection_full_duplex():
+    client_conn = Connection("client", multiplexed=True)
+    server_conn = Connection("server", multiplexed=True)
+
+    # client can send many requests without waiting for response.
+    data = client_conn.send_json({"id": 1, "method": "hover"})
+    data += client_conn.send_json({"id": 2, "method": "completion"})
+    server_conn.receive(data)
+    assert _receive_all_json(server_conn) == [
+        {"id": 1, "method": "hover"},
+        {"id": 2, "method": "completion"},
+    ]
+
+    # server can push notification, and answer requests out of order.
+    data = server_conn.send_json({"method": "window/logMessage"})
+    data += server_conn.send_json({"id": 2, "result": []})
+    data += server_conn.send_json({"id": 1, "result": None})
+    client_conn.receive(data)
+    assert _receive_all_json(client_conn) == [
+        {"method": "window/logMessage"},
+        {"id": 2, "result": []},
+        {"id": 1, "result": None},
+    ]
+    assert client_conn.our_state == IDLE
+    assert client_conn.their_state == IDLE
+
+
+def test_multiplexed_connection_next_event_values():
+    conn = Connection("client", multiplexed=True)
+    assert conn.next_event() is NEED_DATA
+    conn.receive(_request_bytes(b"{}") + b"Content-Length: 2\r\n\r\n[")
+    assert isinstance(conn.next_event(), MessageReceived)
+    assert conn.their_state == SEND_BODY
+    assert isinstance(conn.next_event(), DataReceived)
+    assert isinstance(conn.next_event(), MessageEnd)
+    assert conn.their_state == IDLE
+    assert isinstance(conn.next_event(), MessageReceived)
+    assert isinstance(conn.next_event(), DataReceived)
+    assert conn.next_event() is NEED_DATA
+    conn.receive(b"]")
+    assert isinstance(conn.next_event(), DataReceived)
+    assert isinstance(conn.next_event(), MessageEnd)
+    assert conn.get_received_data() == ({"Content-Length": "2"}, [])
+
+
+def test_multiplexed_connection_send_events():
+    conn = Connection("server", multiplexed=True)
+    for _ in range(2):
+        conn.send(MessageSent({"Content-Length": 2}))
+        assert conn.our_state == SEND_BODY
+        with pytest.raises(LspProtocolError):
+            conn.send_json({"method": "initialized"})
+        conn.send(DataSent({"data": b"{}"}))
+        conn.send(MessageEnd())
+        assert conn.our_state == IDLE
+
+
+def test_multiplexed_connection_go_next_circle():
+    conn = Connection("client", multiplexed=True)
+    with pytest.raises(LspProtocolError):
+        conn.go_next_circle()
+
+
+def test_multiplexed_connection_close():
+    conn = Connection("client", multiplexed=True)
+    conn.close()
+    assert conn.our_state == CLOSED
+    assert conn.their_state == CLOSED
+    with pytest.raises(LspProtocolError):
+        conn.send(MessageSent({"Content-Length": 2}))
+
+
+class _RecordCodec(JsonCodec):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def encode(self, obj):
+        self.calls.append(("encode", obj))
+        return super().encode(obj)
+
+    def decode(self, data):
+        self.calls.append(("decode", bytes(data)))
+        return super().decode(data)
+
+
+def test_connection_with_codec():
+    codec = _RecordCodec()
+    conn = Connection("client", codec=codec)
+    conn.send_json({"method": "didOpen"})
+    assert codec.calls == [("encode", {"method": "didOpen"})]
+
+    conn.receive(_request_bytes(b"[1]"))
+    while not isinstance(conn.next_event(), MessageEnd):
+        pass
+    assert conn.get_received_data() == ({"Content-Length": "3"}, [1])
+    assert codec.calls[-1] == ("decode", b"[1]")
+
+
+def test_send_data_event_with_codec():
+    codec = _RecordCodec()
+    conn = Connection("client", codec=codec)
+    conn.send(RequestSent({"Content-Length": 3}))
+    assert conn.send(DataSent({"data": [1]})) == b"[1]"
+    assert codec.calls == [("encode", [1])]
+
+
+def test_queue_json_and_data_to_send():
+    conn = Connection("server", multiplexed=True)
+    conn.queue_json({"method": "a"})
+    conn.queue_json({"method": "b"})
+    buffers = conn.data_to_send()
+    # header and body are separated buffers, without concatenating.
+    assert len(buffers) == 4
+    assert b"".join(buffers) == conn.send_json({"method": "a"}) + conn.send_json(
+        {"method": "b"}
+    )
+    assert conn.data_to_send() == []
+
+
+def test_queue_json_checks_state(server_conn: Connection):
+    with pytest.raises(LspProtocolError):
+        server_conn.queue_json({"data": "oh-yeah"})
+    assert server_conn.data_to_send() == []
+
+
+def test_send_json_without_content_type():
+    conn = Connection("client", send_content_type=False)
+    assert conn.send_json({"method": "didOpen"}) == (
+        b'Content-Length: 21\r\n\r\n{"method": "didOpen"}'
+    )
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_server_whole_message_mode(zero_copy):
+    server_conn = Connection("server", zero_copy=zero_copy, whole_message=True)
+    bodies = [b'{"method": "didChange"}', b'{"method": "didSave"}']
+    data = b"".join(_request_bytes(body) for body in bodies)
+    server_conn.receive(data[:-1])
+
+    event = server_conn.next_event()
+    assert isinstance(event, MessageComplete)
+    assert event["header"] == {"Content-Length": str(len(bodies[0]))}
+    assert event["data"] == bodies[0]
+    assert server_conn.our_state == SEND_RESPONSE
+    assert server_conn.their_state == DONE
+    assert server_conn.get_received_data() == (
+        event["header"],
+        {"method": "didChange"},
+    )
+    server_conn.send_json({"result": None})
+    server_conn.go_next_circle()
+
+    assert server_conn.next_event() is NEED_DATA
+    server_conn.receive(data[-1:])
+    event = server_conn.next_event()
+    assert isinstance(event, MessageComplete)
+    assert event["data"] == bodies[1]
+
+
+def test_client_whole_message_mode():
+    client_conn = Connection("client", whole_message=True)
+    with pytest.raises(LspProtocolError):
+        client_conn.next_event()
+    client_conn.send_json({"id": 1, "method": "hover"})
+    events = client_conn.receive_and_drain(_request_bytes(b"[]"))
+    assert [type(event) for event in events] == [MessageComplete]
+    assert events[0]["data"] == b"[]"
+    assert client_conn.their_state == DONE
+    # the message is already reported.
+    with pytest.raises(LspProtocolError):
+        client_conn.next_event()
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_multiplexed_whole_message_mode(zero_copy):
+    conn = Connection(
+        "server", zero_copy=zero_copy, multiplexed=True, whole_message=True
+    )
+    data = _request_bytes(b"[1]") + _request_bytes(b"[2]") + b"Content-Length: 3"
+    events = conn.receive_and_drain(data)
+    assert [type(event) for event in events] == [MessageComplete] * 2
+    assert [bytes(event["data"]) for event in events] == [b"[1]", b"[2]"]
+    assert conn.receive_and_drain(b"\r\n\r\n[3") == []
+    events = conn.receive_and_drain(b"]")
+    assert events[0]["data"] == b"[3]"
+    assert conn.their_state == IDLE
+    # nothing left in incoming buffer.
+    assert conn.next_event() is NEED_DATA
+
+
+def test_whole_message_mode_without_content_length():
+    conn = Connection("server", multiplexed=True, whole_message=True)
+    conn.receive(b"Content-Type: utf-8\r\n\r\n")
+    with pytest.raises(LspProtocolError):
+        conn.next_event()
+
+
+def test_connection_spill_large_body():
+    server_conn = Connection("server", spill_threshold=16)
+    body = json.dumps({"method": "didOpen", "text": "x" * 100}).encode("utf-8")
+    events = server_conn.receive_and_drain(_request_bytes(body))
+    assert [type(event) for event in events] == [
+        RequestReceived,
+        DataReceived,
+        MessageEnd,
+    ]
+    assert server_conn.in_collector.data == b""
+    header, data = server_conn.get_received_data(raw=True)
+    assert isinstance(data, memoryview)
+    assert data == body
+    assert server_conn.get_received_data()[1]["method"] == "didOpen"
+
+
+@pytest.mark.parametrize("whole_message", [False, True])
+def test_connection_max_message_size(whole_message):
+    server_conn = Connection(
+        "server", max_message_size=10, whole_message=whole_message
+    )
+    server_conn.receive(b"Content-Length: 11\r\n\r\n" + b"x" * 11)
+    # the message is rejected every time.
+    for _ in range(2):
+        with pytest.raises(LspProtocolError):
+            server_conn.next_event()
+
+
+@pytest.mark.parametrize("length", [b"-5", b"abc", b""])
+def test_connection_invalid_content_length(length):
+    server_conn = Connection("server")
+    server_conn.receive(b"Content-Length: " + length + b"\r\n\r\n")
+    with pytest.raises(LspProtocolError):
+        server_conn.next_event()
+
+
+def test_connection_zero_copy_missing_content_length():
+    server_conn = Connection("server", zero_copy=True)
+    server_conn.receive(b"Content-Type: utf-8\r\n\r\n{}")
+    # the buffer isn't changed, so it's raised again.
+    for _ in range(2):
+        with pytest.raises(LspProtocolError):
+            server_conn.next_event()
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_get_received_data_lazy(zero_copy):
+    server_conn = Connection("server", zero_copy=zero_copy)
+    body = b'{"id": 1, "method": "hover", "params": {"line": 1}}'
+    server_conn.receive(_request_bytes(body) + _request_bytes(b"{}"))
+    server_conn.next_events()
+    header, message = server_conn.get_received_data(lazy=True)
+    assert message["method"] == "hover"
+    assert not message.is_decoded("params")
+    server_conn.send_json({"id": 1, "result": None})
+    server_conn.go_next_circle()
+    # the body is still valid after going to next message.
+    assert message["params"] == {"line": 1}
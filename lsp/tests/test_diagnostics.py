@@ -0,0 +1,90 @@
+from .._diagnostics import DiagnosticsPublisher
+from .._jsonrpc import JsonRpcConnection, Notification
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _diagnostic(message, line=0):
+    position = {"line": line, "character": 0}
+    return {"range": {"start": position, "end": position}, "message": message}
+
+
+def _received(client, publisher):
+    events = client.receive_and_drain(b"".join(publisher.data_to_send()))
+    assert all(isinstance(event, Notification) for event in events)
+    return [event["params"] for event in events]
+
+
+def test_publish_many_documents_together():
+    client = JsonRpcConnection("client")
+    publisher = DiagnosticsPublisher(JsonRpcConnection("server"), clock=Clock())
+    assert publisher.timeout() is None
+    assert publisher.publish("file:///a.py", [_diagnostic("a")], 3)
+    assert publisher.publish("file:///b.py", [])
+    assert len(publisher) == 2
+    assert publisher.timeout() == 0.0
+    assert publisher.flush() == 2
+    assert _received(client, publisher) == [
+        {"uri": "file:///a.py", "version": 3, "diagnostics": [_diagnostic("a")]},
+        {"uri": "file:///b.py", "diagnostics": []},
+    ]
+    assert publisher.published == 2
+
+
+def test_identical_diagnostics_are_skipped():
+    client = JsonRpcConnection("client")
+    clock = Clock()
+    publisher = DiagnosticsPublisher(JsonRpcConnection("server"), clock=clock)
+    publisher.publish("file:///a.py", [_diagnostic("a")], 1)
+    publisher.flush()
+    _received(client, publisher)
+
+    clock.now = 1.0
+    assert not publisher.publish("file:///a.py", [_diagnostic("a")], 2)
+    assert publisher.flush() == 0
+    # a newer set which is the same as the published one wins.
+    publisher.publish("file:///a.py", [_diagnostic("b")], 3)
+    assert not publisher.publish("file:///a.py", [_diagnostic("a")], 4)
+    assert publisher.flush() == 0
+    assert publisher.skipped == 3
+    assert publisher.data_to_send() == []
+
+
+def test_rate_limit():
+    client = JsonRpcConnection("client")
+    clock = Clock()
+    publisher = DiagnosticsPublisher(
+        JsonRpcConnection("server"), interval=0.5, clock=clock
+    )
+    publisher.publish("file:///a.py", [_diagnostic("a")])
+    publisher.flush()
+    _received(client, publisher)
+
+    clock.now = 0.2
+    for line in range(5):
+        publisher.publish("file:///a.py", [_diagnostic("a", line)])
+    publisher.publish("file:///b.py", [_diagnostic("b")])
+    # b.py is due, a.py waits for the interval.
+    assert publisher.flush() == 1
+    assert [params["uri"] for params in _received(client, publisher)] == [
+        "file:///b.py"
+    ]
+    assert publisher.timeout() == 0.3
+
+    clock.now = 0.5
+    assert publisher.timeout() == 0.0
+    assert publisher.flush() == 1
+    # the latest diagnostics win.
+    assert _received(client, publisher) == [
+        {"uri": "file:///a.py", "diagnostics": [_diagnostic("a", 4)]}
+    ]
+    assert publisher.skipped == 4
+
+    publisher.forget("file:///a.py")
+    assert publisher.publish("file:///a.py", [_diagnostic("a", 4)])
@@ -0,0 +1,107 @@
+import pytest
+
+from .._documents import DocumentStore, TextDocument
+from .._jsonrpc import JsonRpcConnection, Notification
+from .._scheduler import RequestScheduler
+
+
+def _change(start, end, text):
+    return {
+        "range": {
+            "start": {"line": start[0], "character": start[1]},
+            "end": {"line": end[0], "character": end[1]},
+        },
+        "text": text,
+    }
+
+
+def test_apply_changes():
+    document = TextDocument("file:///a.py", "def f():\n    pass\n", 1)
+    document.apply_changes(
+        [_change((1, 4), (1, 8), "return 1"), _change((0, 4), (0, 5), "g")], 2
+    )
+    assert document.text == "def g():\n    return 1\n"
+    document.apply_changes([{"text": "x = 1\n"}, _change((1, 0), (1, 0), "y")], 3)
+    assert document.text == "x = 1\ny"
+    assert document.version == 3
+    assert str(document.snapshot(1)) == "def f():\n    pass\n"
+    assert str(document.snapshot(2)) == "def g():\n    return 1\n"
+
+
+def test_apply_changes_with_carriage_returns():
+    document = TextDocument("file:///a.py", "a\rb\r\nc\n", 1)
+    document.apply_changes([_change((1, 0), (1, 1), "x")], 2)
+    assert document.text == "a\rx\r\nc\n"
+    document.apply_changes([_change((2, 0), (2, 1), "y")], 3)
+    assert document.text == "a\rx\r\ny\n"
+    # "\r" before an inserted "\n" becomes one line break with it.
+    document.apply_changes([_change((1, 0), (1, 0), "\n")], 4)
+    assert document.text == "a\r\nx\r\ny\n"
+    document.apply_changes([_change((1, 0), (2, 0), "z")], 5)
+    assert document.text == "a\r\nzy\n"
+
+
+def test_snapshots_are_limited():
+    document = TextDocument("file:///a.py", "", 0, max_snapshots=3)
+    for version in range(1, 6):
+        document.apply_changes([_change((0, 0), (0, 0), "x")], version)
+    assert list(document.snapshots) == [3, 4, 5]
+    assert str(document.snapshot(4)) == "xxxx"
+    with pytest.raises(KeyError):
+        document.snapshot(1)
+
+
+def test_store_with_scheduler():
+    client = JsonRpcConnection("client")
+    store = DocumentStore()
+    scheduler = RequestScheduler(JsonRpcConnection("server"), documents=store)
+    uri = "file:///a.py"
+    data = client.send_notification(
+        "textDocument/didOpen",
+        {
+            "textDocument": {
+                "uri": uri,
+                "languageId": "python",
+                "version": 1,
+                "text": "a\nb\n",
+            }
+        },
+    )
+    data += client.send_notification(
+        "textDocument/didChange",
+        {
+            "textDocument": {"uri": uri, "version": 2},
+            "contentChanges": [_change((1, 1), (1, 1), "c")],
+        },
+    )
+    # documents which are not opened are ignored.
+    data += client.send_notification(
+        "textDocument/didChange",
+        {
+            "textDocument": {"uri": "file:///b.py", "version": 2},
+            "contentChanges": [{"text": ""}],
+        },
+    )
+    scheduler.receive(data)
+    assert len(store) == 0
+
+    scheduler.next_message()
+    assert store[uri].language_id == "python"
+    assert store[uri].text == "a\nb\n"
+    # the change is applied before it's handler sees it.
+    assert scheduler.next_message()["method"] == "textDocument/didChange"
+    assert store[uri].text == "a\nbc\n"
+    assert store[uri].version == 2
+    scheduler.next_message()
+    assert list(store) == [uri]
+
+    params = {"textDocument": {"uri": uri}}
+    scheduler.receive(client.send_notification("textDocument/didClose", params))
+    scheduler.next_message()
+    assert uri not in store
+    assert store.get(uri) is None
+
+
+def test_store_ignores_other_messages():
+    store = DocumentStore()
+    assert not store.handle(Notification({"method": "initialized", "params": {}}))
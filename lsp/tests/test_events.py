@@ -3,6 +3,7 @@ import json
 from unittest import mock
 import pytest
 
+from .. import _events
 from .._events import (
     EventBase,
     RequestReceived,
@@ -150,6 +151,14 @@ def test_header_event_to_data(event_cls):
     assert parsed_data == expect_data
 
 
+@pytest.mark.parametrize(
+    "event_cls", [RequestReceived, RequestSent, ResponseReceived, ResponseSent]
+)
+def test_header_event_to_data_fields_order(event_cls):
+    event = event_cls({"Content-Length": "100", "Content-Type": "text"})
+    assert event.to_data() == b"Content-Length: 100\r\nContent-Type: text\r\n\r\n"
+
+
 @pytest.mark.parametrize("event_cls", [DataReceived, DataSent])
 def test_data_event_to_data(event_cls):
     # data event can be initialized by three ways:
@@ -186,3 +195,64 @@ def test_evnet_donent_implement_to_data():
 def test_empty_data(event_cls):
     event = event_cls()
     assert event.to_data() == b""
+
+
+def test_event_is_slotted():
+    event = RequestSent({"Content-Length": 10})
+    assert not hasattr(event, "__dict__")
+    assert event["Content-Length"] == 10
+    assert getattr(event, "Content-Length") == 10
+    with pytest.raises(AttributeError):
+        event.not_exists
+    with pytest.raises(AttributeError):
+        getattr(event, "Not-Exists")
+
+
+def test_event_ignore_too_much_fields():
+    class Event1(EventBase):
+        _fields = {"content-length"}
+
+    with mock.patch.object(warnings, "warn"):
+        event = Event1({"content-length": 10, "asset": 1})
+    with pytest.raises(AttributeError):
+        event["asset"]
+
+
+def test_event_make():
+    class Event1(EventBase):
+        _fields = {"content-length", "b", "a"}
+        _defaults = [("content-length", 10)]
+
+    # required fields come first in sorted order, then optional fields.
+    event = Event1.make(1, 2)
+    assert (event["a"], event["b"], event["content-length"]) == (1, 2, 10)
+    event = Event1.make(1, 2, 3)
+    assert event["content-length"] == 3
+
+    event = RequestSent.make(30)
+    assert event.to_data() == RequestSent({"Content-Length": 30}).to_data()
+    assert DataReceived.make(b"data").to_data() == b"data"
+    assert MessageEnd.make().to_data() == b""
+
+
+def test_event_make_with_positional():
+    class Event1(EventBase):
+        _fields = {"b", "a"}
+        _positional = ("b", "a")
+
+    event = Event1.make(1, 2)
+    assert (event["a"], event["b"]) == (2, 1)
+
+
+def test_event_without_validation():
+    class Event1(EventBase):
+        _fields = {"content-length", "content-type"}
+
+    _events.set_validation(False)
+    try:
+        with mock.patch.object(warnings, "warn") as stub_warn:
+            event = Event1({"content-length": 10, "asset": 1})
+            stub_warn.assert_not_called()
+    finally:
+        _events.set_validation(True)
+    assert event["content-length"] == 10
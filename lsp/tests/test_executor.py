@@ -0,0 +1,186 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pytest
+
+from .._errors import ResponseError
+from .._executor import PoolDispatcher
+from .._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Response,
+    ErrorResponse,
+)
+from .._scheduler import RequestScheduler
+
+
+def _square(params):
+    return params * params
+
+
+def _fail(params):
+    raise ResponseError(ErrorCodes.InvalidParams, "bad params", params)
+
+
+def _crash(params):
+    raise ValueError("crash")
+
+
+@pytest.fixture
+def client():
+    return JsonRpcConnection("client")
+
+
+@pytest.fixture
+def scheduler():
+    return RequestScheduler(JsonRpcConnection("server"))
+
+
+def _run_all(dispatcher: PoolDispatcher):
+    dispatcher.dispatch()
+    while len(dispatcher):
+        dispatcher.poll(timeout=1)
+
+
+def _replies(client: JsonRpcConnection, scheduler: RequestScheduler):
+    return client.receive_and_drain(b"".join(scheduler.data_to_send()))
+
+
+def test_responses_are_written_as_they_complete(
+    client: JsonRpcConnection, scheduler: RequestScheduler
+):
+    release = threading.Event()
+
+    def slow(params):
+        release.wait(1)
+        return "slow"
+
+    handlers = {"slow": slow, "fast": _square}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        dispatcher = PoolDispatcher(scheduler, handlers, executor)
+        slow_id, data = client.send_request("slow")
+        fast_id, more_data = client.send_request("fast", 3)
+        scheduler.receive(data + more_data)
+        assert dispatcher.dispatch() == 2
+
+        assert dispatcher.poll(timeout=1) == 1
+        (reply,) = _replies(client, scheduler)
+        assert (reply["id"], reply["result"]) == (fast_id, 9)
+
+        release.set()
+        assert dispatcher.poll(timeout=None) == 1
+        (reply,) = _replies(client, scheduler)
+        assert (reply["id"], reply["result"]) == (slow_id, "slow")
+        assert len(dispatcher) == 0
+        assert dispatcher.poll() == 0
+
+
+def test_error_responses(client: JsonRpcConnection, scheduler: RequestScheduler):
+    handlers = {"fail": _fail, "crash": _crash}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        dispatcher = PoolDispatcher(scheduler, handlers, executor)
+        data = b"".join(
+            client.send_request(method, [1])[1]
+            for method in ["fail", "crash", "not-exists"]
+        )
+        scheduler.receive(data + client.send_notification("crash"))
+        _run_all(dispatcher)
+    replies = _replies(client, scheduler)
+    assert all(isinstance(event, ErrorResponse) for event in replies)
+    errors = {event["method"]: event["error"] for event in replies}
+    assert errors["fail"] == {
+        "code": ErrorCodes.InvalidParams,
+        "message": "bad params",
+        "data": [1],
+    }
+    assert errors["crash"]["code"] == ErrorCodes.InternalError
+    assert errors["not-exists"]["code"] == ErrorCodes.MethodNotFound
+
+
+def test_ordered_handlers_are_serialized(
+    client: JsonRpcConnection, scheduler: RequestScheduler
+):
+    lock = threading.Lock()
+    active, versions = [], []
+
+    def did_change(params):
+        with lock:
+            active.append(params["version"])
+            overlap = len(active) > 1
+        time.sleep(0.005)
+        with lock:
+            active.remove(params["version"])
+        versions.append((params["version"], overlap))
+
+    handlers = {"textDocument/didChange": did_change, "square": _square}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dispatcher = PoolDispatcher(scheduler, handlers, executor)
+        data = b""
+        for version in range(5):
+            data += client.send_notification(
+                "textDocument/didChange", {"version": version}
+            )
+            data += client.send_request("square", version)[1]
+        scheduler.receive(data)
+        _run_all(dispatcher)
+    assert versions == [(version, False) for version in range(5)]
+    replies = _replies(client, scheduler)
+    assert sorted(event["result"] for event in replies) == [0, 1, 4, 9, 16]
+
+
+def test_cancel_waiting_requests(
+    client: JsonRpcConnection, scheduler: RequestScheduler
+):
+    release = threading.Event()
+    started = []
+
+    def blocking(params):
+        started.append(params)
+        release.wait(1)
+        return params
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        dispatcher = PoolDispatcher(scheduler, {"block": blocking}, executor)
+        first_id, data = client.send_request("block", 1)
+        second_id, more_data = client.send_request("block", 2)
+        scheduler.receive(data + more_data)
+        dispatcher.dispatch()
+        # the second handler is waiting for the only worker, cancel it.
+        scheduler.receive(
+            client.send_notification("$/cancelRequest", {"id": second_id})
+        )
+        dispatcher.dispatch()
+        release.set()
+        while len(dispatcher):
+            dispatcher.poll(timeout=1)
+    assert started == [1]
+    replies = {event["id"]: event for event in _replies(client, scheduler)}
+    assert isinstance(replies[first_id], Response)
+    assert replies[second_id]["error"]["code"] == ErrorCodes.RequestCancelled
+
+
+def test_wakeup(client: JsonRpcConnection, scheduler: RequestScheduler):
+    woken = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        dispatcher = PoolDispatcher(
+            scheduler, {"square": _square}, executor, wakeup=woken.set
+        )
+        scheduler.receive(client.send_request("square", 2)[1])
+        dispatcher.dispatch()
+        assert woken.wait(1)
+        assert dispatcher.poll() == 1
+
+
+def test_process_pool(client: JsonRpcConnection, scheduler: RequestScheduler):
+    handlers = {"square": _square, "fail": _fail}
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        dispatcher = PoolDispatcher(scheduler, handlers, executor)
+        data = b"".join(client.send_request("square", n)[1] for n in range(4))
+        scheduler.receive(data + client.send_request("fail", {"a": 1})[1])
+        _run_all(dispatcher)
+    replies = _replies(client, scheduler)
+    results = [event["result"] for event in replies if event["method"] == "square"]
+    assert sorted(results) == [0, 1, 4, 9]
+    (error,) = [event["error"] for event in replies if event["method"] == "fail"]
+    assert error["data"] == {"a": 1}
@@ -0,0 +1,27 @@
+from .._frame import FrameEncoder, DEFAULT_CONTENT_TYPE, encode_header
+
+
+def test_frame_encoder_encode_header():
+    encoder = FrameEncoder()
+    assert encoder.encode_header(30) == (
+        b"Content-Length: 30\r\n"
+        b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n\r\n"
+    )
+
+
+def test_frame_encoder_without_content_type():
+    encoder = FrameEncoder(None)
+    assert encoder.encode_header(0) == b"Content-Length: 0\r\n\r\n"
+    assert encoder.encode(b"{}") == b"Content-Length: 2\r\n\r\n{}"
+
+
+def test_frame_encoder_with_custom_content_type():
+    encoder = FrameEncoder("application/json; q=100%")
+    assert encoder.encode(b"[]") == (
+        b"Content-Length: 2\r\nContent-Type: application/json; q=100%\r\n\r\n[]"
+    )
+
+
+def test_encode_header():
+    assert encode_header(10, DEFAULT_CONTENT_TYPE) == FrameEncoder().encode_header(10)
+    assert encode_header("10", None) == b"Content-Length: 10\r\n\r\n"
@@ -0,0 +1,43 @@
+import os
+import socket
+import threading
+
+from .._io import write_vectored, _advance
+
+
+def test_advance():
+    buffers = [memoryview(b"abc"), memoryview(b"de"), memoryview(b"f")]
+    assert _advance(buffers, 0) == [b"abc", b"de", b"f"]
+    assert _advance(buffers, 2) == [b"c", b"de", b"f"]
+    assert _advance(buffers, 3) == [b"de", b"f"]
+    assert _advance(buffers, 4) == [b"e", b"f"]
+    assert _advance(buffers, 6) == []
+
+
+def test_write_vectored_to_socket():
+    buffers = [b"Content-Length: 2\r\n\r\n", b"{}", b"", b"x" * 1000000]
+    expected = b"".join(buffers)
+    received = bytearray()
+
+    def _read():
+        while len(received) < len(expected):
+            received.extend(right.recv(65536))
+
+    left, right = socket.socketpair()
+    with left, right:
+        # the data is bigger than socket buffer, so it's written partially.
+        reader = threading.Thread(target=_read)
+        reader.start()
+        assert write_vectored(left, buffers) == len(expected)
+        reader.join()
+    assert received == expected
+
+
+def test_write_vectored_to_file_descriptor():
+    read_fd, write_fd = os.pipe()
+    try:
+        assert write_vectored(write_fd, [b"ab", b"cd"]) == 4
+        assert os.read(read_fd, 10) == b"abcd"
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
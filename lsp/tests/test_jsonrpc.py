@@ -0,0 +1,250 @@
+import json
+
+import pytest
+
+from .._connection import NEED_DATA
+from .._errors import LspProtocolError
+from .._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Request,
+    Notification,
+    Response,
+    ErrorResponse,
+)
+from .._lazy import LazyMessage
+
+
+@pytest.fixture
+def client():
+    return JsonRpcConnection("client")
+
+
+@pytest.fixture
+def server():
+    return JsonRpcConnection("server")
+
+
+def _frame(message) -> bytes:
+    body = json.dumps(message).encode("utf-8")
+    return f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+
+
+def test_request_and_response(client: JsonRpcConnection, server: JsonRpcConnection):
+    hover_id, data = client.send_request("textDocument/hover", {"line": 1})
+    completion_id, more_data = client.send_request("textDocument/completion")
+    assert hover_id != completion_id
+    assert client.outgoing == {
+        hover_id: "textDocument/hover",
+        completion_id: "textDocument/completion",
+    }
+
+    server.receive(data + more_data)
+    event = server.next_event()
+    assert isinstance(event, Request)
+    assert event["id"] == hover_id
+    assert event["method"] == "textDocument/hover"
+    assert event["params"] == {"line": 1}
+    event = server.next_event()
+    assert isinstance(event, Request)
+    assert event["params"] is None
+    assert server.next_event() is NEED_DATA
+
+    # answer out of order.
+    client.receive(server.send_response(completion_id, []))
+    client.receive(server.send_response(hover_id, {"contents": "doc"}))
+    assert server.incoming == {}
+
+    event = client.next_event()
+    assert isinstance(event, Response)
+    assert event["id"] == completion_id
+    assert event["method"] == "textDocument/completion"
+    assert event["result"] == []
+    event = client.next_event()
+    assert event["id"] == hover_id
+    assert event["result"] == {"contents": "doc"}
+    assert client.outgoing == {}
+
+
+def test_notification(client: JsonRpcConnection, server: JsonRpcConnection):
+    server.receive(client.send_notification("initialized", {}))
+    event = server.next_event()
+    assert isinstance(event, Notification)
+    assert event["method"] == "initialized"
+    assert event["params"] == {}
+    assert server.incoming == {}
+
+
+def test_error_response(client: JsonRpcConnection, server: JsonRpcConnection):
+    request_id, data = client.send_request("shutdown")
+    server.receive(data)
+    server.next_event()
+    client.receive(
+        server.send_error(request_id, ErrorCodes.InternalError, "oops", {"a": 1})
+    )
+
+    event = client.next_event()
+    assert isinstance(event, ErrorResponse)
+    assert event["id"] == request_id
+    assert event["method"] == "shutdown"
+    assert event["error"] == {"code": -32603, "message": "oops", "data": {"a": 1}}
+
+
+def test_error_response_without_id(client: JsonRpcConnection):
+    client.receive(
+        _frame({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": ""}})
+    )
+    event = client.next_event()
+    assert isinstance(event, ErrorResponse)
+    assert event["id"] is None
+    assert event["method"] is None
+
+
+def test_response_of_unknown_request(client: JsonRpcConnection):
+    client.receive(_frame({"jsonrpc": "2.0", "id": 3, "result": None}))
+    with pytest.raises(LspProtocolError):
+        client.next_event()
+
+
+def test_send_response_of_unknown_request(server: JsonRpcConnection):
+    with pytest.raises(LspProtocolError):
+        server.send_response(1, None)
+
+
+@pytest.mark.parametrize(
+    "body", [b"[]", b"{", b'{"jsonrpc": "2.0"}', b'{"jsonrpc": "2.0", "id": 1}']
+)
+def test_invalid_message(server: JsonRpcConnection, body: bytes):
+    server.receive(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    with pytest.raises(LspProtocolError):
+        server.next_event()
+
+
+def test_next_event_with_partial_message(server: JsonRpcConnection):
+    data = _frame({"jsonrpc": "2.0", "method": "exit"})
+    for index in range(len(data) - 1):
+        # fmt: off
+        server.receive(data[index:index + 1])
+        # fmt: on
+        assert server.next_event() is NEED_DATA
+    server.receive(data[-1:])
+    assert isinstance(server.next_event(), Notification)
+    assert server.next_event() is NEED_DATA
+
+
+def test_message_event_to_data():
+    event = Request({"id": 1, "method": "hover"})
+    assert json.loads(event.to_data()) == {"jsonrpc": "2.0", "id": 1, "method": "hover"}
+    event = Response({"id": 1, "result": None})
+    assert json.loads(event.to_data()) == {"jsonrpc": "2.0", "id": 1, "result": None}
+
+
+def test_queue_messages(client: JsonRpcConnection, server: JsonRpcConnection):
+    request_id, data = client.send_request("hover", queue=True)
+    assert data == b""
+    assert client.send_notification("initialized", queue=True) == b""
+    server.receive(b"".join(client.data_to_send()))
+
+    assert isinstance(server.next_event(), Request)
+    assert isinstance(server.next_event(), Notification)
+    assert server.send_response(request_id, None, queue=True) == b""
+    client.receive(b"".join(server.data_to_send()))
+    assert isinstance(client.next_event(), Response)
+
+
+def test_receive_and_drain(client: JsonRpcConnection, server: JsonRpcConnection):
+    request_id, data = client.send_request("hover")
+    data += client.send_notification("initialized")
+    events = server.receive_and_drain(data[:-1])
+    assert [type(event) for event in events] == [Request]
+    assert events[0]["id"] == request_id
+    events = server.receive_and_drain(data[-1:])
+    assert [type(event) for event in events] == [Notification]
+    assert server.next_events() == []
+
+
+def test_next_events_with_invalid_message(server: JsonRpcConnection):
+    server.receive(_frame({"jsonrpc": "2.0", "method": "exit"}) + _frame([]))
+    with pytest.raises(LspProtocolError):
+        server.next_events()
+
+
+def test_max_message_size():
+    server = JsonRpcConnection("server", max_message_size=16)
+    server.receive(_frame({"jsonrpc": "2.0", "method": "didOpen", "params": {}}))
+    with pytest.raises(LspProtocolError):
+        server.next_event()
+
+
+def test_lazy_params(client: JsonRpcConnection):
+    server = JsonRpcConnection("server", lazy=True)
+    _, data = client.send_request("completion", {"position": [1, 2]})
+    server.receive(data + client.send_notification("exit"))
+    request = server.next_event()
+    assert isinstance(request, Request)
+    assert request["method"] == "completion"
+    assert isinstance(request.params, LazyMessage)
+    assert request["params"] == {"position": [1, 2]}
+    assert request.params == {"position": [1, 2]}
+    assert server.next_event()["params"] is None
+
+    client.receive(server.send_response(request["id"], [{"label": "a"}]))
+    client.lazy = True
+    event = client.next_event()
+    assert event["method"] == "completion"
+    assert event["result"] == [{"label": "a"}]
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"jsonrpc": "2.0", "params": {"a": 1}, "method": "x", "meta": {"b": 2}},
+        {"jsonrpc": "2.0", "method": "x", "params": {"a": 1}, "id": 1, "m": [2]},
+        {"params": [1], "meta": {"b": 2}, "method": "x", "jsonrpc": "2.0"},
+    ],
+)
+def test_lazy_members_after_params(message):
+    server = JsonRpcConnection("server", lazy=True)
+    server.receive(_frame(message))
+    event = server.next_event()
+    assert event["method"] == "x"
+    assert event["params"] == message["params"]
+    assert isinstance(event, Request) == ("id" in message)
+
+
+def test_lazy_routing_keeps_params_undecoded(client: JsonRpcConnection):
+    server = JsonRpcConnection("server", lazy=True)
+    params = {"textDocument": {"uri": "file:///a.py", "version": 2}}
+    data = client.send_notification("textDocument/didChange", params)
+    _, request = client.send_request("textDocument/hover", params)
+    server.receive(data + request)
+    notification, request = server.next_event(), server.next_event()
+    assert isinstance(notification, Notification)
+    assert isinstance(request, Request)
+    for event in (notification, request):
+        assert isinstance(event.params, LazyMessage)
+        assert not event.params.is_decoded("params")
+    assert notification["params"] == params
+
+
+def test_lazy_response_keeps_result_undecoded(client: JsonRpcConnection):
+    client.lazy = True
+    request_id, _ = client.send_request("completion")
+    client.receive(_frame({"jsonrpc": "2.0", "id": request_id, "result": [1]}))
+    event = client.next_event()
+    assert isinstance(event, Response)
+    assert isinstance(event.result, LazyMessage)
+    assert event["result"] == [1]
+
+
+def test_send_encoded_response():
+    client, server = JsonRpcConnection("client"), JsonRpcConnection("server")
+    request_id, data = client.send_request("textDocument/hover", {})
+    server.receive(data)
+    server.next_event()
+    data = server.send_encoded_response(request_id, b'{"contents": "int"}')
+    event = client.receive_and_drain(data)[0]
+    assert event["id"] == request_id
+    assert event["result"] == {"contents": "int"}
+    with pytest.raises(LspProtocolError):
+        server.send_encoded_response(request_id, b"null")
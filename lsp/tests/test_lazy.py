@@ -0,0 +1,111 @@
+import json
+import random
+
+import pytest
+
+from .._codec import available_codecs, get_codec
+from .._lazy import LazyMessage
+
+
+@pytest.mark.parametrize("name", available_codecs())
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"jsonrpc": "2.0", "id": 1, "method": "hover", "params": {"a": [1, "}]"]}},
+        {"jsonrpc": "2.0", "id": "x", "result": [{"label": '"{['}]},
+        {"jsonrpc": "2.0", "method": "exit"},
+        {"jsonrpc": "2.0", "id": 2, "result": None},
+        {"jsonrpc": "2.0", "id": 3, "error": {"code": 1, "message": "{"}},
+        {},
+    ],
+)
+def test_lazy_message(name, message):
+    body = json.dumps(message, indent=1).encode("utf-8") + b"\r\n"
+    lazy = LazyMessage(memoryview(bytearray(body)), get_codec(name))
+    assert list(lazy) == list(message)
+    assert {key: lazy[key] for key in lazy} == message
+    assert lazy.to_dict() == message
+
+
+def test_lazy_message_decodes_params_on_access():
+    body = b'{"jsonrpc": "2.0", "id": 1, "method": "hover", "params": {"x": 1}}'
+    lazy = LazyMessage(body)
+    assert lazy["id"] == 1
+    assert lazy["method"] == "hover"
+    assert "params" in lazy
+    assert not lazy.is_decoded("params")
+    assert lazy.deferred("params") is lazy
+    assert lazy.get("params") == {"x": 1}
+    assert lazy.is_decoded("params")
+    assert lazy.deferred("params") == {"x": 1}
+    assert lazy.get("result", 3) == 3
+    with pytest.raises(KeyError):
+        lazy["result"]
+
+
+def test_lazy_message_escaped_keys():
+    lazy = LazyMessage(b'{"a\\"b": 1, "\\u0070arams": [2]}')
+    assert lazy['a"b'] == 1
+    assert not lazy.is_decoded("params")
+    assert lazy["params"] == [2]
+
+
+def test_lazy_message_with_members_after_params():
+    body = b'{"method": "hover", "params": [1], "id": 1}'
+    lazy = LazyMessage(body)
+    # the whole message is decoded, so id is not missed.
+    assert lazy.is_decoded("params")
+    assert lazy.to_dict() == {"method": "hover", "params": [1], "id": 1}
+
+    # which can't be told by closing brackets, and it's found when decoding.
+    body = b'{"id": 1, "result": {"a": 1}, "x": {}}'
+    lazy = LazyMessage(body)
+    assert lazy["result"] == {"a": 1}
+    assert lazy.to_dict() == {"id": 1, "result": {"a": 1}, "x": {}}
+
+    # looking up members which are not scanned finds them too, the lazy member is
+    # skipped but not decoded.
+    lazy = LazyMessage(body)
+    assert not lazy.scanned("x")
+    assert "x" in lazy
+    assert not lazy.is_decoded("result")
+    assert list(lazy) == ["id", "result", "x"]
+    lazy = LazyMessage(body)
+    assert lazy["x"] == {}
+    assert not lazy.is_decoded("result")
+    assert lazy["result"] == {"a": 1}
+    assert list(LazyMessage(body)) == ["id", "result", "x"]
+    assert "y" not in LazyMessage(body)
+
+
+def test_lazy_message_member_order():
+    rng = random.Random(0)
+    members = [
+        ("jsonrpc", "2.0"),
+        ("id", 1),
+        ("method", "x"),
+        ("params", {"a": [1]}),
+        ("meta", {"b": 2}),
+        ("tail", [3]),
+    ]
+    for _ in range(300):
+        message = dict(rng.sample(members, rng.randrange(1, len(members) + 1)))
+        body = json.dumps(message).encode("utf-8")
+        for key, _ in members:
+            assert (key in LazyMessage(body)) == (key in message)
+            assert LazyMessage(body).get(key) == message.get(key)
+
+
+@pytest.mark.parametrize(
+    "body", [b"[]", b'{"a" 1}', b'{"a": 1', b'{"a": "x}', b'{"a": [1}', b"{1: 2}"]
+)
+def test_lazy_message_invalid_body(body):
+    with pytest.raises(ValueError):
+        LazyMessage(body).to_dict()
+
+
+def test_lazy_message_invalid_params():
+    lazy = LazyMessage(b'{"id": 1, "params": {"x": }}')
+    assert lazy["id"] == 1
+    with pytest.raises(ValueError):
+        lazy["params"]
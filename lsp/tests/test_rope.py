@@ -0,0 +1,218 @@
+import random
+import re
+
+import pytest
+
+from .._rope import Rope, LEAF_MAX
+
+
+def _check_balanced(node) -> None:
+    if node is None or node.text is not None:
+        return
+    assert abs(node.left.height - node.right.height) <= 1
+    assert node.length == node.left.length + node.right.length
+    assert node.newlines == node.left.newlines + node.right.newlines
+    _check_balanced(node.left)
+    _check_balanced(node.right)
+
+
+def test_empty_rope():
+    rope = Rope()
+    assert len(rope) == 0
+    assert str(rope) == ""
+    assert rope.line_count == 1
+    assert rope.offset_at(3, 3) == 0
+    assert str(rope.insert(0, "abc")) == "abc"
+
+
+def test_random_edits():
+    rng = random.Random(0)
+    text = "".join(rng.choice("abc \n") for _ in range(5 * LEAF_MAX))
+    rope = Rope(text)
+    versions = [(rope, text)]
+    for _ in range(500):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.choice([0, 1, 10, 3 * LEAF_MAX]))
+        new_text = "".join(rng.choice("xyz\n") for _ in range(rng.choice([0, 1, 3000])))
+        text = text[:start] + new_text + text[end:]
+        rope = rope.replace(start, end, new_text)
+        versions.append((rope, text))
+    _check_balanced(rope._root)
+    # old versions are not changed.
+    for old_rope, old_text in versions[::50]:
+        assert str(old_rope) == old_text
+        assert len(old_rope) == len(old_text)
+        assert old_rope.line_count == old_text.count("\n") + 1
+
+
+def test_slice():
+    text = "".join(str(index % 10) for index in range(3 * LEAF_MAX))
+    rope = Rope(text)
+    assert rope[:] == text
+    start, end = LEAF_MAX - 5, 2 * LEAF_MAX + 5
+    assert rope[start:end] == text[start:end]
+    assert rope[-3:] == text[-3:]
+    assert rope[5] == text[5]
+    with pytest.raises(IndexError):
+        rope[len(text)]
+    with pytest.raises(ValueError):
+        rope[::2]
+
+
+def test_invalid_replace():
+    with pytest.raises(ValueError):
+        Rope("abc").replace(2, 1, "")
+    with pytest.raises(ValueError):
+        Rope("abc").replace(0, 4, "")
+
+
+def test_lines():
+    lines = [f"line {index}" for index in range(2000)]
+    rope = Rope("\r\n".join(lines))
+    assert rope.line_count == 2000
+    for index in [0, 1, 999, 1999]:
+        assert rope.line(index) == lines[index]
+    assert rope.line_start(1) == len(lines[0]) + 2
+    assert rope.line_start(5000) == len(rope)
+
+
+def test_lone_carriage_return():
+    rope = Rope("a\rb\r\nc\n\rd")
+    assert rope.line_count == 5
+    assert [rope.line(index) for index in range(5)] == ["a", "b", "c", "", "d"]
+    assert [rope.line_start(index) for index in range(5)] == [0, 2, 5, 7, 8]
+    assert rope.offset_at(1, 100) == 3
+    assert rope.offset_at(4, 0) == 8
+    assert rope.position_at(2) == (1, 0)
+    # the position between "\r\n" is on the line before it.
+    assert rope.position_at(4) == (1, 2)
+    assert rope.positions_at([1, 4, 5, 8]) == [(0, 1), (1, 2), (2, 0), (4, 0)]
+
+
+def _check_pairs(rope) -> None:
+    chunks = list(rope.chunks())
+    for before, after in zip(chunks, chunks[1:]):
+        assert not (before.endswith("\r") and after.startswith("\n"))
+
+
+def test_carriage_return_pairs_are_not_split():
+    text = "a" * (LEAF_MAX - 1) + "\r\n" + "b" * LEAF_MAX
+    rope = Rope(text)
+    _check_pairs(rope)
+    assert rope.line_count == 2
+    assert rope.line(0) == "a" * (LEAF_MAX - 1)
+    assert rope.position_at(LEAF_MAX + 1) == (1, 0)
+
+    # edits which join "\r" and "\n" together.
+    rope = Rope(text.replace("\r\n", "\rx\n"))
+    assert rope.line_count == 3
+    joined = rope.delete(LEAF_MAX, LEAF_MAX + 1)
+    assert str(joined) == text
+    assert joined.line_count == 2
+    _check_pairs(joined)
+    for start, end, new_text in [(1, 1, "\r"), (0, 1, "\r"), (1, 1, "x\r")]:
+        rope = Rope("a\nb").replace(start, end, new_text)
+        _check_pairs(rope)
+        assert rope.line_count == 2
+
+    rng = random.Random(2)
+    alphabet = "ab\r\n"
+    text = "".join(rng.choice(alphabet) for _ in range(3 * LEAF_MAX))
+    rope = Rope(text)
+    for _ in range(200):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.choice([0, 1, 2, LEAF_MAX]))
+        new_text = "".join(rng.choice(alphabet) for _ in range(rng.choice([0, 1, 3])))
+        text = text[:start] + new_text + text[end:]
+        rope = rope.replace(start, end, new_text)
+        assert rope.line_count == len(re.findall("\r\n|\r|\n", text)) + 1
+    _check_pairs(rope)
+    _check_balanced(rope._root)
+    offsets = list(range(len(text) + 1))
+    expected = [_reference_position(text, offset) for offset in offsets]
+    assert rope.positions_at(offsets) == expected
+    assert [rope.position_at(offset) for offset in offsets] == expected
+
+
+def test_offset_at():
+    rope = Rope("ab\n\U0001f600cd\r\nx")
+    assert rope.offset_at(0, 1) == 1
+    # clamped to the end of line.
+    assert rope.offset_at(0, 100) == 2
+    # the emoji takes two UTF-16 code units.
+    assert rope.offset_at(1, 2) == 4
+    assert rope.offset_at(1, 3) == 5
+    assert rope.offset_at(1, 100) == 6
+    assert rope.offset_at(2, 0) == 8
+    assert rope.offset_at(3, 0) == 9
+
+
+def _reference_position(text, offset):
+    breaks = [
+        match.end()
+        for match in re.finditer("\r\n|\r|\n", text)
+        if match.end() <= offset
+    ]
+    line_start = breaks[-1] if breaks else 0
+    units = len(text[line_start:offset].encode("utf-16-le")) // 2
+    return len(breaks), units
+
+
+def test_position_and_byte_offsets():
+    text = "ab\n\U0001f600cé\r\nx"
+    rope = Rope(text)
+    assert [rope.position_at(offset) for offset in range(len(text) + 1)] == [
+        (0, 0),
+        (0, 1),
+        (0, 2),
+        (1, 0),
+        (1, 2),
+        (1, 3),
+        (1, 4),
+        (1, 5),
+        (2, 0),
+        (2, 1),
+    ]
+    assert rope.position_at(100) == (2, 1)
+    assert rope.byte_offset(4) == 7
+    assert rope.byte_offset(6) == 10
+    assert rope.offset_of_byte(10) == 6
+    # the middle of a character is rounded down.
+    assert rope.offset_of_byte(5) == 3
+    assert rope.utf16_offset(5) == 6
+    assert rope.offsets_at([(1, 3), (1, 1), (0, 9), (5, 0)]) == [5, 3, 2, 9]
+
+
+def test_conversions_after_edits():
+    rng = random.Random(1)
+    alphabet = "ab \n\ré中\U0001f600"
+    text = "".join(rng.choice(alphabet) for _ in range(4 * LEAF_MAX))
+    rope = Rope(text)
+    for _ in range(50):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.randrange(100))
+        new_text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(100)))
+        text = text[:start] + new_text + text[end:]
+        rope = rope.replace(start, end, new_text)
+
+    offsets = sorted(rng.randrange(len(text) + 1) for _ in range(500))
+    expected = [_reference_position(text, offset) for offset in offsets]
+    assert [rope.position_at(offset) for offset in offsets] == expected
+    assert rope.positions_at(offsets) == expected
+    assert rope.positions_at(offsets[::-1]) == expected[::-1]
+    # positions are converted back, except positions between "\r\n".
+    # fmt: off
+    pairs = [
+        (offset, position)
+        for offset, position in zip(offsets, expected)
+        if text[offset - 1:offset + 1] != "\r\n"
+    ]
+    # fmt: on
+    assert rope.offsets_at([position for _, position in pairs]) == [
+        offset for offset, _ in pairs
+    ]
+    for offset in offsets[::10]:
+        size = len(text[:offset].encode("utf-8"))
+        assert rope.byte_offset(offset) == size
+        assert rope.offset_of_byte(size) == offset
+        assert rope.utf16_offset(offset) == len(text[:offset].encode("utf-16-le")) // 2
@@ -0,0 +1,265 @@
+import pytest
+
+from .._jsonrpc import (
+    JsonRpcConnection,
+    ErrorCodes,
+    Request,
+    Notification,
+    Response,
+    ErrorResponse,
+)
+from .._scheduler import (
+    RequestScheduler,
+    FifoQueue,
+    PriorityQueue,
+    PRIORITY_SYNC,
+    PRIORITY_LOW,
+)
+
+
+@pytest.fixture
+def client():
+    return JsonRpcConnection("client")
+
+
+@pytest.fixture
+def scheduler():
+    return RequestScheduler(JsonRpcConnection("server"))
+
+
+def _send_requests(client: JsonRpcConnection, count: int):
+    ids, data = [], b""
+    for index in range(count):
+        request_id, frame = client.send_request("completion", {"index": index})
+        ids.append(request_id)
+        data += frame
+    return ids, data
+
+
+def _cancel(client: JsonRpcConnection, request_id) -> bytes:
+    return client.send_notification("$/cancelRequest", {"id": request_id})
+
+
+def _replies(client: JsonRpcConnection, scheduler: RequestScheduler):
+    return client.receive_and_drain(b"".join(scheduler.data_to_send()))
+
+
+def test_fifo_order(client: JsonRpcConnection, scheduler: RequestScheduler):
+    ids, data = _send_requests(client, 2)
+    data += client.send_notification("initialized")
+    assert scheduler.receive(data) == []
+    assert len(scheduler) == 3
+
+    first = scheduler.next_message()
+    assert isinstance(first, Request) and first["id"] == ids[0]
+    assert scheduler.next_message()["id"] == ids[1]
+    assert isinstance(scheduler.next_message(), Notification)
+    assert scheduler.next_message() is None
+    assert set(scheduler.in_flight) == set(ids)
+
+    scheduler.respond(ids[1], 1)
+    scheduler.respond_error(ids[0], ErrorCodes.InternalError, "oops")
+    replies = _replies(client, scheduler)
+    assert [type(event) for event in replies] == [Response, ErrorResponse]
+    assert scheduler.in_flight == {}
+
+
+def test_cancel_queued_request(client: JsonRpcConnection, scheduler: RequestScheduler):
+    ids, data = _send_requests(client, 3)
+    scheduler.receive(data + _cancel(client, ids[0]) + _cancel(client, ids[1]))
+    assert scheduler.dropped == 2
+    assert len(scheduler) == 1
+
+    # cancelled requests are answered at once, before they start.
+    replies = _replies(client, scheduler)
+    assert [event["id"] for event in replies] == ids[:2]
+    assert all(
+        event["error"]["code"] == ErrorCodes.RequestCancelled for event in replies
+    )
+
+    # and they're never dispatched.
+    assert scheduler.next_message()["id"] == ids[2]
+    assert scheduler.next_message() is None
+    assert len(scheduler) == 0
+
+
+def test_cancel_in_flight_request(
+    client: JsonRpcConnection, scheduler: RequestScheduler
+):
+    ids, data = _send_requests(client, 1)
+    scheduler.receive(data)
+    request = scheduler.next_message()
+    assert not scheduler.is_cancelled(request["id"])
+
+    scheduler.receive(_cancel(client, request["id"]))
+    assert scheduler.is_cancelled(request["id"])
+    assert scheduler.data_to_send() == []
+
+    # result of cancelled request is replaced by error.
+    scheduler.respond(request["id"], {"items": []})
+    (reply,) = _replies(client, scheduler)
+    assert isinstance(reply, ErrorResponse)
+    assert reply["error"]["code"] == ErrorCodes.RequestCancelled
+    assert not scheduler.is_cancelled(request["id"])
+
+
+@pytest.mark.parametrize("params", [None, [], {}, {"id": 100}])
+def test_cancel_unknown_request(
+    client: JsonRpcConnection, scheduler: RequestScheduler, params
+):
+    ids, data = _send_requests(client, 1)
+    scheduler.receive(data)
+    scheduler.receive(client.send_notification("$/cancelRequest", params))
+    assert scheduler.dropped == 0
+    assert scheduler.data_to_send() == []
+    assert scheduler.next_message()["id"] == ids[0]
+
+
+def test_cancel_answered_request(
+    client: JsonRpcConnection, scheduler: RequestScheduler
+):
+    ids, data = _send_requests(client, 1)
+    scheduler.receive(data)
+    scheduler.respond(scheduler.next_message()["id"], None)
+    scheduler.receive(_cancel(client, ids[0]))
+    assert [type(event) for event in _replies(client, scheduler)] == [Response]
+    assert not scheduler.is_cancelled(ids[0])
+
+
+def test_responses_are_not_scheduled(client: JsonRpcConnection):
+    server = JsonRpcConnection("server")
+    scheduler = RequestScheduler(server, FifoQueue())
+    request_id, data = server.send_request("workspace/configuration")
+    client.receive(data)
+    client.next_event()
+    responses = scheduler.receive(client.send_response(request_id, [{}]))
+    assert [type(event) for event in responses] == [Response]
+    assert len(scheduler) == 0
+
+
+def _methods(scheduler: RequestScheduler):
+    methods = []
+    message = scheduler.next_message()
+    while message is not None:
+        methods.append(message["method"])
+        message = scheduler.next_message()
+    return methods
+
+
+def test_priority_queue(client: JsonRpcConnection):
+    scheduler = RequestScheduler(JsonRpcConnection("server"), PriorityQueue())
+    data = b""
+    for method in [
+        "workspace/symbol",
+        "textDocument/definition",
+        "textDocument/didChange",
+        "textDocument/references",
+        "textDocument/completion",
+        "textDocument/didSave",
+        "textDocument/hover",
+    ]:
+        if method.startswith("textDocument/did"):
+            data += client.send_notification(method, {})
+        else:
+            data += client.send_request(method, {})[1]
+    scheduler.receive(data)
+    # text synchronization notifications without a document are barriers of all
+    # messages.
+    assert _methods(scheduler) == [
+        "textDocument/definition",
+        "workspace/symbol",
+        "textDocument/didChange",
+        "textDocument/completion",
+        "textDocument/references",
+        "textDocument/didSave",
+        "textDocument/hover",
+    ]
+
+
+def test_priority_queue_keeps_text_sync_order(client: JsonRpcConnection):
+    scheduler = RequestScheduler(
+        JsonRpcConnection("server"), PriorityQueue({"textDocument/hover": -1})
+    )
+    data = b""
+    for version in range(5):
+        data += client.send_notification("textDocument/didChange", {"v": version})
+        data += client.send_request("textDocument/hover", {})[1]
+    scheduler.receive(data)
+    assert [
+        message["params"]["v"]
+        for message in iter(scheduler.next_message, None)
+        if message["method"] == "textDocument/didChange"
+    ] == list(range(5))
+
+
+def test_priority_queue_requests_see_their_version(client: JsonRpcConnection):
+    scheduler = RequestScheduler(JsonRpcConnection("server"), PriorityQueue())
+    data = client.send_request("textDocument/references", {"v": 1})[1]
+    data += client.send_request("textDocument/hover", {"v": 1})[1]
+    data += client.send_notification("textDocument/didChange", {"v": 2})
+    data += client.send_request("textDocument/hover", {"v": 2})[1]
+    scheduler.receive(data)
+    assert [
+        (message["method"], message["params"]["v"])
+        for message in iter(scheduler.next_message, None)
+    ] == [
+        ("textDocument/hover", 1),
+        ("textDocument/references", 1),
+        ("textDocument/didChange", 2),
+        ("textDocument/hover", 2),
+    ]
+
+
+def test_priority_queue_barriers_of_documents(client: JsonRpcConnection):
+    scheduler = RequestScheduler(JsonRpcConnection("server"), PriorityQueue())
+    data = b""
+    for method, uri in [
+        ("textDocument/references", "a"),
+        ("textDocument/didChange", "a"),
+        ("textDocument/completion", "a"),
+        ("workspace/symbol", None),
+        ("textDocument/hover", "b"),
+        ("textDocument/didChange", "b"),
+        ("textDocument/hover", "b"),
+    ]:
+        params = {} if uri is None else {"textDocument": {"uri": uri}}
+        if method.startswith("textDocument/did"):
+            data += client.send_notification(method, params)
+        else:
+            data += client.send_request(method, params)[1]
+    scheduler.receive(data)
+    assert [
+        (message["method"], message["params"].get("textDocument", {}).get("uri"))
+        for message in iter(scheduler.next_message, None)
+    ] == [
+        # requests of other documents go before the blocked change of a.
+        ("textDocument/hover", "b"),
+        ("textDocument/references", "a"),
+        ("textDocument/didChange", "a"),
+        # changes keep their order, and requests wait for their document only.
+        ("textDocument/didChange", "b"),
+        ("textDocument/completion", "a"),
+        ("textDocument/hover", "b"),
+        ("workspace/symbol", None),
+    ]
+
+
+def test_priority_queue_custom_priorities(client: JsonRpcConnection):
+    queue = PriorityQueue({"custom/slow": PRIORITY_LOW, "custom/fast": 0}, default=5)
+    scheduler = RequestScheduler(JsonRpcConnection("server"), queue)
+    ids = []
+    for method in ["unknown", "custom/slow", "custom/fast"]:
+        request_id, data = client.send_request(method)
+        ids.append(request_id)
+        scheduler.receive(data)
+    # cancelled requests are skipped by priority queue too.
+    scheduler.receive(_cancel(client, ids[1]))
+    assert len(scheduler) == 2
+    assert _methods(scheduler) == ["custom/fast", "unknown"]
+
+
+def test_priority_of_sync_methods_cant_be_changed():
+    with pytest.raises(ValueError):
+        PriorityQueue({"textDocument/didChange": PRIORITY_LOW})
+    queue = PriorityQueue({"textDocument/didChange": PRIORITY_SYNC})
+    assert queue.priorities["textDocument/didChange"] == PRIORITY_SYNC
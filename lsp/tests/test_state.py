@@ -1,8 +1,29 @@
 import pytest
 
-from .._state import make_state, next_state, IDLE, SEND_BODY, SEND_RESPONSE
+from .._state import (
+    make_state,
+    next_state,
+    next_stream_state,
+    state_table,
+    stream_table,
+    transition,
+    TransitionTable,
+    EVENT_COUNT,
+    IDLE,
+    SEND_BODY,
+    SEND_RESPONSE,
+    DONE,
+)
 from .._role import Role
-from .._events import RequestSent, RequestReceived
+from .._events import (
+    RequestSent,
+    RequestReceived,
+    MessageSent,
+    DataSent,
+    DataReceived,
+    MessageEnd,
+    Close,
+)
 from .._errors import LspProtocolError
 
 
@@ -47,3 +68,44 @@ def test_next_state_when_current_state_is_invalid():
 def test_next_state_when_event_is_invalid():
     with pytest.raises(LspProtocolError):
         next_state(Role.CLIENT, SEND_BODY, RequestSent({"Content-Length": 10}))
+
+
+def test_next_stream_state():
+    assert SEND_BODY == next_stream_state(IDLE, MessageSent({"Content-Length": 10}))
+    assert SEND_BODY == next_stream_state(SEND_BODY, DataSent)
+    # stream goes back to IDLE after message end.
+    assert IDLE == next_stream_state(SEND_BODY, MessageEnd)
+
+    with pytest.raises(LspProtocolError):
+        next_stream_state(DONE, MessageSent)
+    with pytest.raises(LspProtocolError):
+        next_stream_state(IDLE, MessageEnd)
+
+
+def test_events_have_unique_codes():
+    codes = [
+        event._code
+        for event in [RequestSent, RequestReceived, MessageSent, DataSent, Close]
+    ]
+    assert len(set(codes)) == len(codes)
+    assert all(0 < code < EVENT_COUNT for code in codes)
+
+
+def test_transition_table():
+    table = state_table(Role.CLIENT)
+    assert isinstance(table, TransitionTable)
+    assert transition(table, IDLE, RequestSent) is SEND_BODY
+    assert transition(table, SEND_BODY, DataSent({"data": b""})) is SEND_BODY
+    assert transition(table, SEND_BODY, MessageEnd) is DONE
+    assert transition(stream_table, SEND_BODY, MessageEnd) is IDLE
+
+
+def test_transition_when_state_or_event_is_invalid():
+    table = state_table(Role.SERVER)
+    with pytest.raises(LspProtocolError, match="is invalid"):
+        transition(table, make_state("unknown"), RequestReceived)
+    with pytest.raises(LspProtocolError, match="The event is invalid"):
+        transition(table, IDLE, DataReceived)
+    # subclass of event which is not in state machine has code 0.
+    with pytest.raises(LspProtocolError):
+        transition(table, IDLE, type("MyEvent", (RequestReceived,), {}))
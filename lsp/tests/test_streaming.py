@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from .._connection import Connection
+from .._events import DataReceived
+from .._streaming import StreamingDecoder
+
+MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 3,
+    "method": 'text"Document\\/hover',
+    "params": {
+        "items": [1, {"label": '}]"{[中文'}, [], -12.5e3, [[True]]],
+        "none": None,
+        "number": 123456,
+    },
+    "ok": False,
+}
+
+
+@pytest.mark.parametrize("max_depth", [1, 2, 3, 5])
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_streaming_decoder_chunks(chunk_size, max_depth):
+    data = json.dumps(MESSAGE, ensure_ascii=False).encode("utf-8")
+    decoder = StreamingDecoder(max_depth)
+    decoded = []
+    for index in range(0, len(data), chunk_size):
+        assert not decoder.done
+        # fmt: off
+        decoded.extend(decoder.feed(data[index:index + chunk_size]))
+        # fmt: on
+    assert decoder.done
+    assert decoded == list(MESSAGE)
+    assert decoder.result() == MESSAGE
+
+
+def test_streaming_decoder_fields_are_available_early():
+    decoder = StreamingDecoder()
+    assert decoder.feed(b'{"id": 1, "method": "didOpen", "params": {"te') == [
+        "id",
+        "method",
+    ]
+    assert decoder.fields == {"id": 1, "method": "didOpen"}
+    with pytest.raises(ValueError):
+        decoder.result()
+    assert decoder.feed(b'xt": "abc"}}\r\n') == ["params"]
+    assert decoder.result()["params"] == {"text": "abc"}
+
+
+def test_streaming_decoder_waits_for_number():
+    decoder = StreamingDecoder()
+    assert decoder.feed(b'{"id": 1') == []
+    assert decoder.feed(b'2.') == []
+    assert decoder.feed(b"5}") == ["id"]
+    assert decoder.result() == {"id": 12.5}
+
+
+def test_streaming_decoder_decodes_elements_early():
+    decoder = StreamingDecoder()
+    decoder.feed(b'{"params": {"changes": [{"text": "a"}, {"text": "b"}, {"te')
+    # only the incomplete element is left.
+    assert decoder._pieces == ['{"te']
+    decoder.feed(b'xt": "c"}]}}')
+    assert decoder.result() == {
+        "params": {"changes": [{"text": "a"}, {"text": "b"}, {"text": "c"}]}
+    }
+
+
+def test_streaming_decoder_empty_object():
+    decoder = StreamingDecoder()
+    assert decoder.feed(b" {  }") == []
+    assert decoder.result() == {}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"[1]",
+        b'{"a" 1}',
+        b'{"a": x, "b": 1234567890}',
+        b'{"a": 1]',
+        b'{"a": 1} {}',
+        b'{"a": [1}',
+        b"{1: 2}",
+        b'{"a": 1 "b": 2}',
+        b'{"a": "\xff"}',
+        b'{"a": [1,]',
+        b'{"a": [1,]}',
+        b'{"a": 1,}',
+        b'{"a": }',
+    ],
+)
+def test_streaming_decoder_invalid_object(body):
+    with pytest.raises(ValueError):
+        StreamingDecoder().feed(body)
+
+
+def test_streaming_decoder_with_data_received_events():
+    body = json.dumps(MESSAGE).encode("utf-8")
+    conn = Connection("server", zero_copy=True)
+    decoder = StreamingDecoder()
+    header = f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+    conn.receive(header + body[:20])
+    for data in [body[20:40], body[40:]]:
+        for event in conn.next_events():
+            if isinstance(event, DataReceived):
+                decoder.feed(event["data"])
+        conn.receive(data)
+    assert "id" in decoder.fields
+    for event in conn.next_events():
+        if isinstance(event, DataReceived):
+            decoder.feed(event["data"])
+    assert decoder.result() == MESSAGE
@@ -0,0 +1,83 @@
+import json
+import random
+from array import array
+
+import pytest
+
+from .._jsonrpc import JsonRpcConnection, Notification, Response
+from .._scheduler import RequestScheduler
+from .._tokens import SemanticTokensEncoder, diff_tokens
+from .. import _tokens
+
+
+def _apply(old, start, delete_count, data):
+    result = list(old)
+    # fmt: off
+    result[start:start + delete_count] = data
+    # fmt: on
+    return result
+
+
+@pytest.mark.parametrize("chunk", [4, 4096])
+def test_diff_tokens(monkeypatch, chunk):
+    monkeypatch.setattr(_tokens, "_CHUNK", chunk)
+    rng = random.Random(chunk)
+    for _ in range(500):
+        old = array("I", (rng.randrange(3) for _ in range(rng.randrange(60))))
+        new = array("I", old)
+        for _ in range(rng.randrange(3)):
+            start = rng.randrange(len(new) + 1)
+            end = min(len(new), start + rng.randrange(5))
+            new[start:end] = array("I", (rng.randrange(3) for _ in range(4)))
+        start, delete_count, data = diff_tokens(old, new)
+        assert _apply(old, start, delete_count, data) == list(new)
+        # the common prefix and suffix are not in the edit.
+        assert old[:start] == new[:start]
+        if start < min(len(old), len(new)):
+            assert old[start] != new[start]
+        if delete_count and data:
+            assert old[start + delete_count - 1] != data[-1]
+
+
+def test_diff_equal_tokens():
+    tokens = array("I", range(10))
+    assert diff_tokens(tokens, array("I", tokens)) == (10, 0, array("I"))
+    assert diff_tokens(array("I"), tokens) == (0, 0, tokens)
+
+
+def test_full_and_delta():
+    encoder = SemanticTokensEncoder()
+    first = json.loads(encoder.full("file:///a.py", [0, 0, 3, 1, 0, 1, 4, 2, 0, 0]))
+    assert first["data"] == [0, 0, 3, 1, 0, 1, 4, 2, 0, 0]
+
+    tokens = [0, 0, 3, 1, 0, 2, 4, 2, 0, 0]
+    delta = json.loads(encoder.delta("file:///a.py", first["resultId"], tokens))
+    assert delta["edits"] == [{"start": 5, "deleteCount": 1, "data": [2]}]
+    assert delta["resultId"] != first["resultId"]
+
+    unchanged = json.loads(encoder.delta("file:///a.py", delta["resultId"], tokens))
+    assert unchanged["edits"] == []
+
+    # unknown result id is answered with all tokens.
+    full = json.loads(encoder.delta("file:///a.py", first["resultId"], tokens))
+    assert full["data"] == tokens
+    assert encoder.results["file:///a.py"][0] == full["resultId"]
+
+    params = {"textDocument": {"uri": "file:///a.py"}}
+    assert encoder.handle(Notification.make("textDocument/didClose", params))
+    assert "file:///a.py" not in encoder
+    assert len(encoder) == 0
+
+
+def test_respond_encoded():
+    client = JsonRpcConnection("client")
+    scheduler = RequestScheduler(JsonRpcConnection("server"))
+    encoder = SemanticTokensEncoder()
+    params = {"textDocument": {"uri": "file:///a.py"}}
+    request_id, data = client.send_request("textDocument/semanticTokens/full", params)
+    scheduler.receive(data)
+    scheduler.next_message()
+    scheduler.respond_encoded(request_id, encoder.full("file:///a.py", [0, 1, 2, 3, 4]))
+    (response,) = client.receive_and_drain(b"".join(scheduler.data_to_send()))
+    assert isinstance(response, Response)
+    assert response["result"] == {"resultId": "1", "data": [0, 1, 2, 3, 4]}